@@ -3,7 +3,6 @@ import logging.handlers
 import os
 import random
 import time
-import schedule
 import sys
 import threading
 from datetime import datetime, timedelta, timezone
@@ -164,6 +163,131 @@ def setup_logging():
     return root_logger
 
 
+# ==========================================
+# HTTP Client
+# ==========================================
+
+class HttpClient:
+    """
+    全局 HTTP 客户端：按代理配置复用 requests.Session 连接池，所有工作线程共享。
+    同一主机（验证码 CDN、推送接口等）的后续请求复用已建立的 TCP/TLS 连接，
+    stats() 统计请求数与新建连接数，用于确认握手次数。
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, max_sessions=16):
+        """
+        :param pool_connections: 每个 Session 缓存的主机连接池数
+        :param pool_maxsize: 每个主机连接池保留的最大连接数（应不小于并发线程数）
+        :param max_sessions: 最多保留的 Session 数（按代理区分），超出时关闭最久未用的
+        """
+        from collections import OrderedDict
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_sessions = max(1, max_sessions)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self._closed_connections = 0
+
+    def session(self, proxy=None):
+        """
+        获取指定代理配置的 Session
+        :param proxy: 代理地址 ip:port，为 None 时直连（仍遵循 HTTP_PROXY 等环境变量）
+        """
+        import http.cookiejar
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        evicted = []
+        with self._lock:
+            session = self._sessions.get(proxy)
+            if session is not None:
+                self._sessions.move_to_end(proxy)
+                return session
+            session = requests.Session()
+            # Session 被所有账号共享，不保存响应下发的 Cookie，避免账号之间串号
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            if proxy:
+                session.proxies = {"http": f"http://{proxy}", "https": f"http://{proxy}"}
+            self._sessions[proxy] = session
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1])
+            for old_session in evicted:
+                self._closed_connections += self._count_connections(old_session)
+        for old_session in evicted:
+            old_session.close()
+        return session
+
+    def request(self, method, url, proxy=None, **kwargs):
+        """发起请求，参数同 requests.request"""
+        session = self.session(proxy)
+        with self._lock:
+            self.requests += 1
+        return session.request(method, url, **kwargs)
+
+    def get(self, url, proxy=None, **kwargs):
+        return self.request("GET", url, proxy=proxy, **kwargs)
+
+    def post(self, url, proxy=None, **kwargs):
+        return self.request("POST", url, proxy=proxy, **kwargs)
+
+    @staticmethod
+    def _count_connections(session):
+        """统计 Session 内各主机连接池累计新建的连接数"""
+        total = 0
+        # http:// 与 https:// 挂载同一个适配器，按对象去重
+        adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+        for adapter in adapters.values():
+            managers = [adapter.poolmanager] + list(getattr(adapter, "proxy_manager", {}).values())
+            for manager in managers:
+                if manager is None:
+                    continue
+                pools = manager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is not None:
+                        total += getattr(pool, "num_connections", 0)
+        return total
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            connections = self._closed_connections
+            requests_count = self.requests
+        connections += sum(self._count_connections(session) for session in sessions)
+        return {
+            "sessions": len(sessions),
+            "requests": requests_count,
+            "connections": connections,
+            "reused": max(0, requests_count - connections),
+        }
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """获取全局 HTTP 客户端（每个主机保留的连接数由 HTTP_POOL_MAXSIZE 控制，默认 10）"""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = HttpClient(pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "10")))
+    return _http_client
+
+
 # ==========================================
 # Notification System
 # ==========================================
@@ -236,22 +360,22 @@ class PushPlusProvider(NotificationProvider):
         self.token = token
 
     def send(self, title, context):
-        import requests
+        http = get_http_client()
         url = 'http://www.pushplus.plus/send'
 
         # 第一轮：按会员限额（10 万字）选择内容
         content = self.select_content(context)
-        success = self._do_send(requests, url, title, content)
+        success = self._do_send(http, url, title, content)
 
         if not success:
             # 第二轮：降级到实名限额（2 万字）重试
             logging.info("PushPlus: 推送失败，降级到实名用户限额 (2万字) 重试")
             content = self.select_content(context, max_bytes_override=self.FALLBACK_MAX_BYTES)
-            success = self._do_send(requests, url, title, content)
+            success = self._do_send(http, url, title, content)
 
         return success
 
-    def _do_send(self, requests, url, title, content):
+    def _do_send(self, http, url, title, content):
         """执行实际的推送请求"""
         data = {
             "token": self.token,
@@ -261,7 +385,7 @@ class PushPlusProvider(NotificationProvider):
         }
         try:
             logging.info(f"Sending PushPlus notification: {title} ({len(content.encode('utf-8'))} bytes)")
-            response = requests.post(url, json=data, timeout=30)
+            response = http.post(url, json=data, timeout=30)
             result = response.json()
             if result.get('code') == 200:
                 logging.info("PushPlus notification sent successfully")
@@ -293,7 +417,6 @@ class WXPusherProvider(NotificationProvider):
             self.topic_ids = []
 
     def send(self, title, context):
-        import requests
         content = self.select_content(context)
         url = 'https://wxpusher.zjiecode.com/api/send/message'
         data = {
@@ -310,7 +433,7 @@ class WXPusherProvider(NotificationProvider):
                 target_desc += (" & " if target_desc else "") + f"Topics: {len(self.topic_ids)}"
                 
             logging.info(f"Sending WXPusher notification to {target_desc}: {title} ({len(content.encode('utf-8'))} bytes)")
-            response = requests.post(url, json=data, timeout=30)
+            response = get_http_client().post(url, json=data, timeout=30)
             result = response.json()
             if result.get('code') == 1000: # WXPusher success code is 1000
                 logging.info("WXPusher notification sent successfully")
@@ -332,7 +455,6 @@ class DingTalkProvider(NotificationProvider):
         self.secret = secret
 
     def send(self, title, context):
-        import requests
         import time
         import hmac
         import hashlib
@@ -367,7 +489,7 @@ class DingTalkProvider(NotificationProvider):
         
         try:
             logging.info(f"Sending DingTalk notification: {title} ({len(md_text.encode('utf-8'))} bytes)")
-            response = requests.post(url, params=params, json=data, timeout=30)
+            response = get_http_client().post(url, params=params, json=data, timeout=30)
             result = response.json()
             if result.get('errcode') == 0:
                 logging.info("DingTalk notification sent successfully")
@@ -447,6 +569,23 @@ class NotificationManager:
         for provider in self.providers:
             provider.send(title, context)
 
+    async def send_all_async(self, title, context):
+        """并发推送到所有渠道（asyncio 引擎使用），单个渠道慢或失败不影响其他渠道"""
+        import asyncio
+
+        if not self.providers:
+            logging.info("No notification providers configured.")
+            return
+
+        logging.info(f"Sending notifications to {len(self.providers)} providers concurrently...")
+        results = await asyncio.gather(
+            *(asyncio.to_thread(provider.send, title, context) for provider in self.providers),
+            return_exceptions=True,
+        )
+        for provider, result in zip(self.providers, results):
+            if isinstance(result, Exception):
+                logging.error(f"{type(provider).__name__} notification raised: {result}")
+
 
 def cleanup_old_logs(log_dir, days=7):
     """清理超过指定天数的日志文件"""
@@ -456,7 +595,7 @@ def cleanup_old_logs(log_dir, days=7):
         
         for filename in os.listdir(log_dir):
             file_path = os.path.join(log_dir, filename)
-            if os.path.isfile(file_path) and filename.startswith('rainyun.log.'):
+            if os.path.isfile(file_path) and (filename.startswith('rainyun.log.') or filename.startswith('timeline_')):
                 file_time = os.path.getmtime(file_path)
                 if file_time < cutoff:
                     os.remove(file_path)
@@ -845,10 +984,75 @@ def generate_fingerprint_script(account_id: str):
     return fingerprint_script
 
 
+# 指纹脚本生成逻辑变更时递增，使已持久化的脚本失效
+FINGERPRINT_SCRIPT_VERSION = 1
+
+_stealth_source = None
+_injection_bundles = {}
+_injection_lock = threading.Lock()
+
+
+def load_stealth_source():
+    """读取 stealth.min.js（约 180 KB），每个进程只读取一次"""
+    global _stealth_source
+    if _stealth_source is None:
+        with _injection_lock:
+            if _stealth_source is None:
+                with open("stealth.min.js", mode="r") as f:
+                    _stealth_source = f.read()
+    return _stealth_source
+
+
+def load_fingerprint_script(account_id: str):
+    """
+    获取账号的指纹脚本：优先读取 temp/fingerprints 下的持久化结果，不存在时生成并保存。
+    指纹脚本完全由账号决定，持久化后无需每次重新生成。
+    """
+    import hashlib
+
+    account_hash = hashlib.md5(account_id.encode()).hexdigest()[:16]
+    directory = os.path.join("temp", "fingerprints")
+    path = os.path.join(directory, f"{account_hash}.v{FINGERPRINT_SCRIPT_VERSION}.js")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        pass
+
+    script = generate_fingerprint_script(account_id)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(script)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.debug(f"保存指纹脚本失败: {e}")
+    return script
+
+
+def get_injection_bundle(account_id: str):
+    """
+    获取账号的注入脚本包：stealth.min.js 与账号指纹脚本合并为一段源码，
+    只需一次 Page.addScriptToEvaluateOnNewDocument 调用。结果按账号在进程内缓存。
+
+    :param account_id: 账号标识（如用户名）
+    """
+    bundle = _injection_bundles.get(account_id)
+    if bundle is None:
+        stealth_js = load_stealth_source()
+        fingerprint_js = load_fingerprint_script(account_id)
+        # 补一个分号，防止 stealth.min.js 末尾缺少分号时与后续 IIFE 连写成函数调用
+        bundle = f"{stealth_js}\n;\n{fingerprint_js}"
+        with _injection_lock:
+            bundle = _injection_bundles.setdefault(account_id, bundle)
+    return bundle
+
+
 def get_proxy_ip():
     """
     从代理接口获取代理IP
-    每个账号单独调用一次，获取独立的代理IP
+    每次调用获取一个独立的代理IP，可作为 race_proxies 的候选并发拉取
     """
     import requests
     import json
@@ -865,7 +1069,7 @@ def get_proxy_ip():
         time.sleep(delay)
         
         logger.info(f"正在从代理接口获取IP...")
-        response = requests.get(proxy_api_url, timeout=10)
+        response = get_http_client().get(proxy_api_url, timeout=10)
         
         if response.status_code != 200:
             logger.error(f"代理接口请求失败，状态码: {response.status_code}")
@@ -952,7 +1156,7 @@ def check_rainyun_blocked(timeout=8):
     """
     import requests
     try:
-        resp = requests.get("https://app.rainyun.com/", timeout=timeout, allow_redirects=False)
+        resp = get_http_client().get("https://app.rainyun.com/", timeout=timeout, allow_redirects=False)
         if resp.status_code in (200, 301, 302):
             return False
         logger.warning(f"直连 app.rainyun.com 返回异常状态码 {resp.status_code}，疑似被拦截")
@@ -965,33 +1169,113 @@ def check_rainyun_blocked(timeout=8):
         return True
 
 
-def validate_proxy(proxy, timeout=5, max_response_time=3):
+class ReachabilityService:
+    """
+    直连可达性探测服务：所有账号共享一次 check_rainyun_blocked 的结果。
+    结果在 TTL 内有效（schedule 模式下每隔 TTL 重新探测），
+    并发调用方等待正在进行的探测而不重复发起，被拦截环境只付出一次超时。
+    """
+
+    def __init__(self, ttl=1800):
+        """
+        :param ttl: 探测结果有效期（秒）
+        """
+        self.ttl = ttl
+        # _lock 只保护结果的读写；_probe_lock 串行化探测，探测期间 snapshot() 不被阻塞
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._blocked = None
+        self._checked_at = 0.0
+        self._probe_seconds = 0.0
+        self.probes = 0
+        self.hits = 0
+
+    def is_blocked(self):
+        """
+        :return: True 表示被拦截（需要代理），False 表示可直连
+        """
+        cached = self._cached()
+        if cached is not None:
+            return cached
+        with self._probe_lock:
+            # 等待期间其他线程可能已完成探测
+            cached = self._cached()
+            if cached is not None:
+                return cached
+            start = time.time()
+            blocked = check_rainyun_blocked()
+            checked_at = time.time()
+            with self._lock:
+                self._blocked = blocked
+                self._checked_at = checked_at
+                self._probe_seconds = checked_at - start
+                self.probes += 1
+            logger.info(
+                f"网络探测: 直连 app.rainyun.com {'被拦截，将使用国内代理' if blocked else '正常'}"
+                f"（耗时 {checked_at - start:.1f}s，{self.ttl} 秒内复用该结果）"
+            )
+            return blocked
+
+    def _cached(self):
+        """有效期内的探测结果（并计一次命中），过期或未探测时返回 None"""
+        with self._lock:
+            if self._blocked is not None and time.time() - self._checked_at < self.ttl:
+                self.hits += 1
+                return self._blocked
+            return None
+
+    def snapshot(self):
+        """最近一次探测结果，未探测时返回 None"""
+        with self._lock:
+            if self._blocked is None:
+                return None
+            return {
+                "blocked": self._blocked,
+                "probe_seconds": round(self._probe_seconds, 3),
+                "checked_at": self._checked_at,
+                "probes": self.probes,
+                "hits": self.hits,
+            }
+
+
+_reachability = None
+_reachability_lock = threading.Lock()
+
+
+def get_reachability_service():
+    """获取全局直连可达性探测服务（结果有效期由 REACHABILITY_TTL 控制，默认 1800 秒）"""
+    global _reachability
+    if _reachability is None:
+        with _reachability_lock:
+            if _reachability is None:
+                _reachability = ReachabilityService(ttl=int(os.getenv("REACHABILITY_TTL", "1800")))
+    return _reachability
+
+
+def measure_proxy(proxy, timeout=5, max_response_time=3):
     """
-    测试代理是否可用且响应足够快。
+    测试代理是否可用且响应足够快，返回实测响应时间。
     仅能连通不够——浏览器会话需要加载多个资源，慢代理会导致页面加载不完整、
     Cookie 无法正确送达服务器，进而被误判为"Cookie 失效"。
     :param proxy: 代理地址，格式为 ip:port
     :param timeout: 请求超时时间（秒）
     :param max_response_time: 最大允许响应时间（秒），超过则认为代理过慢
-    :return: True 可用，False 不可用
+    :return: 响应时间（秒），不可用时返回 None
     """
     import requests
 
     if not proxy:
-        return False
+        return None
 
     try:
-        test_proxies = {
-            "http": f"http://{proxy}",
-            "https": f"http://{proxy}"
-        }
-
         # 使用 app.rainyun.com 测试代理连通性（这是实际被海外 IP 拦截的目标域名）
+        # 延迟探测不走共享连接池：复用已建立的连接会低估浏览器新建连接时的实际延迟
         logger.info(f"正在验证代理 {proxy} 的可用性...")
         start_time = time.time()
         response = requests.get(
             "https://app.rainyun.com/",
-            proxies=test_proxies,
+            proxies={"http": f"http://{proxy}", "https": f"http://{proxy}"},
+            headers={"Connection": "close"},
             timeout=timeout
         )
         elapsed = time.time() - start_time
@@ -999,32 +1283,82 @@ def validate_proxy(proxy, timeout=5, max_response_time=3):
         if response.status_code == 200:
             if elapsed > max_response_time:
                 logger.warning(f"代理 {proxy} 响应过慢（{elapsed:.1f}s > {max_response_time}s），放弃使用")
-                return False
+                return None
             logger.info(f"代理 {proxy} 验证成功（响应时间 {elapsed:.1f}s）")
-            return True
+            return elapsed
         else:
             logger.warning(f"代理验证失败，状态码: {response.status_code}")
-            return False
+            return None
 
     except requests.Timeout:
         logger.warning(f"代理 {proxy} 验证超时")
-        return False
+        return None
     except Exception as e:
         logger.warning(f"代理 {proxy} 验证失败: {e}")
-        return False
+        return None
 
 
-def get_freeproxy_ip():
+def validate_proxy(proxy, timeout=5, max_response_time=3):
+    """
+    测试代理是否可用且响应足够快
+    :return: True 可用，False 不可用
+    """
+    return measure_proxy(proxy, timeout=timeout, max_response_time=max_response_time) is not None
+
+
+def race_proxies(candidates, timeout=5, max_response_time=3, on_result=None, max_workers=4):
+    """
+    并发验证多个候选代理，返回最先满足响应时间要求的一个。
+    代理获取耗时取决于最快的可用代理，而不是逐个失败的耗时之和。
+    取消是尽力而为的：只有排队中尚未开始的候选会被取消，已开始的验证会继续运行到各自超时。
+    :param candidates: 候选列表，元素为代理地址，或返回代理地址的无参函数（如 get_proxy_ip，拉取与验证一并并发）
+    :param on_result: 每个完成的验证回调 on_result(proxy, latency)，latency 为 None 表示不可用
+    :param max_workers: 同时验证的候选数量上限，超出的候选排队，找到可用代理后不再开始
+    :return: (代理地址, 响应时间)，全部不可用时返回 (None, None)
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    if not candidates:
+        return None, None
+
+    def probe(candidate):
+        proxy = candidate() if callable(candidate) else candidate
+        if not proxy:
+            return None, None
+        latency = measure_proxy(proxy, timeout=timeout, max_response_time=max_response_time)
+        if on_result is not None:
+            on_result(proxy, latency)
+        return proxy, latency
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(candidates))))
+    try:
+        futures = [executor.submit(probe, candidate) for candidate in candidates]
+        for future in as_completed(futures):
+            try:
+                proxy, latency = future.result()
+            except Exception as e:
+                logger.warning(f"代理验证异常: {e}")
+                continue
+            if latency is not None:
+                return proxy, latency
+        return None, None
+    finally:
+        # 取消排队中的候选；不等待已开始的验证（requests 请求无法中断，超时后自行结束）
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def crawl_freeproxies(need=1):
     """
     使用改进版 freeproxy 抓取国内免费代理，以 app.rainyun.com 为探针并发验证，
-    找到可用代理即停止。仅用于 Actions 海外环境绕过 IP 拦截。
-    :return: 代理地址字符串 "ip:port"，无可用代理时返回 None
+    凑够 need 个可用代理即停止。仅用于海外环境绕过 IP 拦截。
+    :param need: 需要的可用代理数量
+    :return: 代理地址列表 ["ip:port", ...]，无可用代理时返回空列表
     """
     try:
         from freeproxy.freeproxy import ProxiedSessionClient
     except ImportError:
         logger.error("未安装代理库 freeproxy，请运行 pip install -r requirements.txt")
-        return None
+        return []
 
     try:
         import urllib3
@@ -1038,7 +1372,7 @@ def get_freeproxy_ip():
         "IP89ProxiedSession", "TheSpeedXProxiedSession", "ProxyScrapeProxiedSession",
     ]
 
-    logger.info("正在抓取国内免费代理（以 app.rainyun.com 为探针，找到即停）...")
+    logger.info(f"正在抓取国内免费代理（以 app.rainyun.com 为探针，凑够 {need} 个即停）...")
 
     try:
         client = ProxiedSessionClient(
@@ -1065,7 +1399,7 @@ def get_freeproxy_ip():
 
         working = client.fetch_working_streaming(
             test_url="https://app.rainyun.com/",
-            need=1,
+            need=need,
             source_timeout=15,
             validate_timeout=5,
             validate_workers=64,
@@ -1074,86 +1408,781 @@ def get_freeproxy_ip():
         )
     except Exception as e:
         logger.error(f"抓取国内代理失败: {e}")
-        return None
+        return []
 
     if not working:
         logger.warning("未找到可用的国内代理")
-        return None
+        return []
 
     # fetch_working_streaming 返回 requests 格式字典，提取 ip:port 给 Selenium 使用
-    proxy_dict = working[0]
-    proxy_url = proxy_dict.get("http") or proxy_dict.get("https") or ""
-    proxy_str = proxy_url.replace("http://", "").replace("https://", "").strip("/")
-    logger.info(f"获取到可用国内代理: {proxy_str}")
-    return proxy_str if proxy_str else None
+    proxies = []
+    for proxy_dict in working:
+        proxy_url = proxy_dict.get("http") or proxy_dict.get("https") or ""
+        proxy_str = proxy_url.replace("http://", "").replace("https://", "").strip("/")
+        if proxy_str and proxy_str not in proxies:
+            proxies.append(proxy_str)
+    logger.info(f"获取到 {len(proxies)} 个可用国内代理: {', '.join(proxies)}")
+    return proxies
 
 
-# SVG图标
+class ProxyReputationStore:
+    """
+    代理信誉本地存储（追加写的 JSON Lines），跨运行记住哪些国内代理可用。
+    每行是某个代理的最新快照：最近成功时间、最近几次延迟、连续失败次数；
+    刚抓取、尚未实际使用的代理只记录发现时间（last_seen），不计为成功。
+    加载时每个代理取最后一行，按存活时间与连续失败淘汰后压缩重写。
+    """
 
-# 图标 (Base64)
-BASE64_ICONS = {
-    # 金色硬币
-    'coin': 'data:image/svg+xml;base64,PHN2ZyBjbGFzcz0iaWNvbiIgdmlld0JveD0iMCAwIDExMTQgMTAyNCIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIiB3aWR0aD0iMjAwIiBoZWlnaHQ9IjIwMCI+PHBhdGggZD0iTTgwNy41MTEgNDAwLjY2NmE1MTIgNTEyIDAgMCAwLTYwLjE1LTUzLjg3M2MtMy4wNzItMi4zNDUtNS40MjctMy45ODMtOC4xNS01Ljk4IDM4LjA2Ni0xMy4wNzcgNjQuNy00NC4zOCA2NC43LTgxLjQzNCAwLTQ5LjktNDcuMzctODguMDgtMTAzLjYxOC04OC4wOGE5OS40IDk5LjQgMCAwIDAtMzUuNTU4IDYuNDk4IDc5IDc5IDAgMCAwLTExLjc3MSA1LjU5MWMtMS45NjYuODMtNi4xNi0uMDk3LTcuMzEyLTEuNTNsLS4wNS4wMzVjLTQuMjkxLTYuNDMtMTAuNzYzLTE0LjQwMi0yMC4xNjgtMjIuNTY5LTE3LjktMTUuNTU0LTM5LjA5Mi0yNS4xNS02My4yOTQtMjUuMTVzLTQ1LjM4NCA5LjU5Ni02My4yODggMjUuMTVjLTkuMTkgNy45NzctMTUuNDk4IDE1LjcxMy0xOS44MDQgMjIuMDc4bC0uMDI2LS4wMmMtMS42MjggMS45Mi01Ljg1MiAyLjkyOC03LjMyMiAyLjIyMWE3OC40IDc4LjQgMCAwIDAtMTIuMTQ0LTUuODExIDk5LjUgOTkuNSAwIDAgMC0zNS41NjQtNi41MDJjLTU2LjI0OCAwLTEwMy42MTMgMzguMTg1LTEwMy42MTMgODguMDc5IDAgMzEuNjgzIDE5LjU0MyA1OS4xMDUgNDguOTU3IDc0LjYyNGE0OTUgNDk1IDAgMCAwLTkuNDA1IDYuODQgNDY4IDQ2OCAwIDAgMC02MC4wNTggNTMuMzE1QzI0NC4yNjUgNDUyLjk1NiAyMTAuNSA1MjAuMjEyIDIxMC41IDU5NC44NzJjMCAyMDcuMDIyIDE1NC4yOCAzMDUuNDggMzQwLjEzMSAzMDUuNDggNzcuODkxIDAgMTU0LjAzLTE1LjU0IDIxNS42NC01Mi4yMTkgODMuNTk5LTQ5Ljc5MiAxMzEuMTUzLTEzMy40MjcgMTMxLjE1My0yNTMuMjYtLjAxNS03MC4xNjUtMzMuOTk2LTEzNS4zNDgtODkuOTEyLTE5NC4yMDdNNjQ2LjU2NCA2MDEuNDNjMTAuNTk4IDAgMTkuMTg0IDguNzkxIDE5LjE4NCAxOS42MTUgMCAxMC44MjktOC41OSAxOS42MjUtMTkuMTg0IDE5LjYyNUg1NjkuODF2NTYuNDg5YzAgOC4yODktOC41OTEgMTUuMDA2LTE5LjE4NSAxNS4wMDYtMTAuNTk4IDAtMTkuMTg0LTYuNzE3LTE5LjE4NC0xNS4wMDZ2LTU2LjQ5aC03Ni43NTRjLTEwLjU5OSAwLTE5LjE4NS04Ljc5LTE5LjE4NS0xOS42MnM4LjU5MS0xOS42MTQgMTkuMTg1LTE5LjYxNGg3Ni43NTRWNTgxLjgyaC03Ni43NTRjLTEwLjU5OSAwLTE5LjE4NS04Ljc4NS0xOS4xODUtMTkuNjE0czguNTkxLTE5LjYxNSAxOS4xODUtMTkuNjE1aDc4LjM5N2wtNzIuNzgtNzQuMzk5YTE5LjkxNyAxOS45MTcgMCAwIDEgMC0yNy43MzUgMTguODkzIDE4Ljg5MyAwIDAgMSAyNy4xMzUgMGw2My4xODYgNjQuNTg0IDYzLjE4Ni02NC41ODRhMTguOTAzIDE4LjkwMyAwIDAgMSAyNi43MjEtLjQyNWwuNDIuNDI1YTE5LjkyNyAxOS45MjcgMCAwIDEgMCAyNy43MzVsLTcyLjc4IDc0LjM5OWg3OC40MDJjMTAuNTk4IDAgMTkuMTggOC43OCAxOS4xOCAxOS42MTVzLTguNTg3IDE5LjYxNC0xOS4xOCAxOS42MTRoLTc2Ljc1OXYxOS42MXoiIGZpbGw9IiNmNTllMGIiLz48L3N2Zz4='
-}
+    # 每个代理保留的最近延迟样本数（取中位数）
+    LATENCY_SAMPLES = 5
 
+    def __init__(self, path, max_age=172800, max_streak=2):
+        """
+        :param path: 存储文件路径
+        :param max_age: 最近一次成功距今超过该时间（秒）即淘汰
+        :param max_streak: 连续失败达到该次数即淘汰
+        """
+        self.path = path
+        self.max_age = max_age
+        self.max_streak = max(1, max_streak)
+        self._records = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _expired(self, record, now):
+        # 未验证的代理以发现时间计算存活时间
+        last_active = record.get("last_success") or record.get("last_seen")
+        return (
+            last_active is None
+            or now - last_active > self.max_age
+            or record.get("streak", 0) >= self.max_streak
+        )
 
-def get_screenshot_html(screenshot_path):
+    def load(self):
+        """读取存储并淘汰过期/连续失败的代理，随后压缩重写文件"""
+        import json
+
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            records = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        for line in f:
+                            line = line.strip()
+                            if not line:
+                                continue
+                            try:
+                                record = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue
+                            if isinstance(record, dict) and record.get("proxy"):
+                                records[record["proxy"]] = record
+                except OSError as e:
+                    logger.warning(f"读取代理信誉存储失败: {e}")
+            now = time.time()
+            self._records = {proxy: record for proxy, record in records.items() if not self._expired(record, now)}
+            evicted = len(records) - len(self._records)
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "w", encoding="utf-8") as f:
+                    for record in self._records.values():
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning(f"压缩代理信誉存储失败: {e}")
+            if records:
+                logger.info(f"代理信誉存储: 载入 {len(self._records)} 个代理，淘汰 {evicted} 个")
+
+    def _append(self, record):
+        import json
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"写入代理信誉存储失败: {e}")
+
+    def record_seen(self, proxy):
+        """记录新抓取、尚未经过实际验证或签到的代理（不影响最近成功时间）"""
+        with self._lock:
+            record = self._records.setdefault(proxy, {"proxy": proxy, "latencies": []})
+            record["last_seen"] = time.time()
+            self._append(record)
+
+    def record_success(self, proxy, latency=None):
+        with self._lock:
+            record = self._records.setdefault(proxy, {"proxy": proxy, "latencies": []})
+            record["last_success"] = time.time()
+            record["streak"] = 0
+            if latency is not None:
+                record["latencies"] = (record.get("latencies", []) + [round(latency, 3)])[-self.LATENCY_SAMPLES:]
+            self._append(record)
+
+    def record_failure(self, proxy):
+        with self._lock:
+            record = self._records.get(proxy)
+            if record is None:
+                return
+            record["streak"] = record.get("streak", 0) + 1
+            self._append(record)
+            if record["streak"] >= self.max_streak:
+                del self._records[proxy]
+
+    def candidates(self, limit):
+        """最近可用的代理，已验证的优先，再按连续失败、延迟中位数、最近成功时间排序"""
+        import statistics
+
+        with self._lock:
+            now = time.time()
+            records = [record for record in self._records.values() if not self._expired(record, now)]
+
+        def sort_key(record):
+            samples = record.get("latencies") or []
+            latency = statistics.median(samples) if samples else float("inf")
+            last_success = record.get("last_success")
+            return last_success is None, record.get("streak", 0), latency, -(last_success or 0)
+
+        return [record["proxy"] for record in sorted(records, key=sort_key)[:limit]]
+
+
+class ProxyPool:
     """
-    将截图文件转换为 Base64 嵌入的 HTML img 标签
-    :param screenshot_path: 截图文件路径
-    :return: HTML img 标签或空字符串
+    进程级国内代理池：一次抓取、批量验证，多个账号及重试轮次共享。
+    每个代理记录延迟 EWMA、成功/失败次数与过期时间（TTL），
+    租用时优先选择连续失败少、当前占用少、延迟低的代理；
+    被判定为代理失败的会降级，连续失败达到上限即淘汰。
     """
-    if not screenshot_path or not os.path.exists(screenshot_path):
-        return ""
-    
-    try:
-        import base64
-        with open(screenshot_path, "rb") as img_file:
-            img_data = base64.b64encode(img_file.read()).decode('utf-8')
-        
-        # 根据文件扩展名确定 MIME 类型
-        mime_type = "image/jpeg" if screenshot_path.lower().endswith(('.jpg', '.jpeg')) else "image/png"
-        
-        # 获取文件大小
-        file_size = os.path.getsize(screenshot_path) / 1024  # KB
-        
-        return f'''
-            <div style="margin-top: 12px; border-top: 1px solid var(--border); padding-top: 12px;">
-                <div style="font-size: 12px; color: var(--text-sub); margin-bottom: 8px;">📸 截图 ({file_size:.1f}KB)</div>
-                <img src="data:{mime_type};base64,{img_data}" style="max-width: 100%; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);" alt="签到截图"/>
-            </div>
-        '''
-    except Exception as e:
-        logger.debug(f"生成截图 HTML 时出错: {e}")
-        return ""
 
+    # 延迟 EWMA 的平滑系数
+    LATENCY_ALPHA = 0.3
+    # 距上次确认可用超过该时间（秒）的代理，租用前重新验证
+    RECHECK_INTERVAL = 120
+    # 无空闲代理时，单个代理最多同时被几个账号共用
+    MAX_SHARED_LEASES = 2
+    # 池中代理都被占用时，等待其他账号归还的最长时间（秒），超时后才共用或重新抓取
+    RELEASE_WAIT = 30
+
+    def __init__(self, size=4, ttl=600, max_failures=2, store=None):
+        """
+        :param size: 每次抓取的目标代理数
+        :param ttl: 代理入池后的有效期（秒），过期即淘汰
+        :param max_failures: 连续失败达到该次数即淘汰
+        :param store: 代理信誉存储（ProxyReputationStore），为 None 时不跨运行记忆
+        """
+        self.size = max(1, size)
+        self.ttl = ttl
+        self.max_failures = max(1, max_failures)
+        self.store = store
+        self._entries = {}
+        self._lock = threading.Lock()
+        # 有代理被归还或新代理入池时通知等待中的租用方
+        self._released = threading.Condition(self._lock)
+        # 补充锁：多个账号同时发现池空时只触发一次补充，其余等待结果
+        self._crawl_lock = threading.Lock()
+        self._refills = 0
+        self._restored = store is None
+        self.crawls = 0
+        self.restored = 0
+        self.leases = 0
+        # 无空闲代理、只能共用已占用代理（或租用失败）的次数
+        self.misses = 0
+
+    def reserve(self, concurrency):
+        """
+        按调度引擎同时持有代理的最大账号数调整抓取目标，使一次抓取即可覆盖整个运行
+        :param concurrency: 同时持有代理的最大账号数
+        """
+        with self._lock:
+            self.size = max(self.size, concurrency)
+
+    def _new_entry(self, latency=None):
+        now = time.time()
+        return {
+            "latency": latency,
+            "success": 0,
+            "failure": 0,
+            "streak": 0,
+            "leased": 0,
+            "expires_at": now + self.ttl,
+            "checked_at": now,
+        }
+
+    def _update_latency(self, entry, latency):
+        if latency is None:
+            return
+        if entry["latency"] is None:
+            entry["latency"] = latency
+        else:
+            entry["latency"] += self.LATENCY_ALPHA * (latency - entry["latency"])
+
+    def _prune(self):
+        """淘汰已过期的代理（需持有 self._lock）"""
+        now = time.time()
+        for proxy in [p for p, entry in self._entries.items() if entry["expires_at"] <= now]:
+            logger.debug(f"代理池: {proxy} 已过期，移出代理池")
+            del self._entries[proxy]
+
+    def _ranked(self):
+        """按健康度排序的候选代理，未被占用的优先（需持有 self._lock）"""
+        self._prune()
+        return sorted(
+            self._entries.items(),
+            key=lambda item: (
+                item[1]["leased"] > 0,
+                item[1]["streak"],
+                item[1]["leased"],
+                item[1]["latency"] if item[1]["latency"] is not None else float("inf"),
+                item[1]["failure"] - item[1]["success"],
+            ),
+        )
+
+    def _restore(self):
+        """从信誉存储取出上次运行可用的代理并发重新验证，返回验证通过的数量"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.store.load()
+        candidates = self.store.candidates(self.size * 2)
+        if not candidates:
+            return 0
+        logger.info(f"代理池: 重新验证 {len(candidates)} 个上次可用的代理...")
+        with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+            latencies = list(executor.map(measure_proxy, candidates))
+        restored = 0
+        with self._lock:
+            for proxy, latency in zip(candidates, latencies):
+                if latency is None:
+                    continue
+                self._entries.setdefault(proxy, self._new_entry(latency))
+                restored += 1
+            self._released.notify_all()
+        for proxy, latency in zip(candidates, latencies):
+            if latency is None:
+                self.store.record_failure(proxy)
+            else:
+                self.store.record_success(proxy, latency)
+        logger.info(f"代理池: 复用上次可用代理 {restored}/{len(candidates)} 个")
+        return restored
+
+    def _refill(self):
+        """
+        补充代理：首次优先复用信誉存储中的代理，仍不足时抓取并批量验证新代理。
+        其他线程正在补充时等待其完成而不重复抓取。
+        """
+        with self._lock:
+            before = self._refills
+        with self._crawl_lock:
+            with self._lock:
+                if self._refills != before:
+                    return
+            if not self._restored:
+                self._restored = True
+                self.restored = self._restore()
+            if not self.restored or self._refills > 0:
+                proxies = crawl_freeproxies(need=self.size)
+                self.crawls += 1
+                with self._lock:
+                    for proxy in proxies:
+                        if proxy not in self._entries:
+                            self._entries[proxy] = self._new_entry()
+                    self._released.notify_all()
+                if self.store is not None:
+                    # 只记为已发现：成功要等实际验证或签到通过后再记录
+                    for proxy in proxies:
+                        self.store.record_seen(proxy)
+            with self._lock:
+                self._refills += 1
+
+    def _take(self, max_leased=0):
+        """
+        取出当前最优的代理并占用（是否需要重新验证由调用方判断）
+        :param max_leased: 只考虑占用数不超过该值的代理，0 表示只取空闲代理
+        """
+        with self._lock:
+            for proxy, entry in self._ranked():
+                if entry["leased"] > max_leased:
+                    continue
+                entry["leased"] += 1
+                return proxy, entry
+        return None, None
+
+    def lease(self, log=None):
+        """
+        租用一个可用代理。池中代理都被占用时先等待其他账号归还，再有限度地共用，
+        仍无可用代理时才补充（抓取），避免同一次运行中反复抓取。
+        最优代理需要重新验证时，与其他待验证的空闲代理一起并发竞速，取最先通过的。
+        :return: 代理地址 "ip:port"，无可用代理时返回 None
+        """
+        log = log or logger
+        proxy = self._lease_ranked(log)
+        if proxy is None and self._wait_for_release():
+            proxy = self._lease_ranked(log)
+        if proxy is None:
+            proxy = self._lease_shared(log)
+        if proxy is None:
+            self._refill()
+            proxy = self._lease_ranked(log) or self._lease_shared(log)
+        if proxy is None:
+            with self._lock:
+                self.misses += 1
+        return proxy
+
+    def _wait_for_release(self):
+        """
+        池中有代理但都被占用时，等待其中一个被归还
+        :return: 是否等到了空闲代理；池为空（需要补充）时立即返回 False
+        """
+        with self._released:
+            self._prune()
+            if not self._entries:
+                return False
+            return self._released.wait_for(
+                lambda: any(entry["leased"] == 0 for entry in self._entries.values()),
+                timeout=self.RELEASE_WAIT,
+            )
+
+    def _lease_shared(self, log):
+        """无空闲代理时有限度地共用已占用的代理，并计一次未命中"""
+        proxy = self._lease_ranked(log, max_leased=self.MAX_SHARED_LEASES - 1)
+        if proxy is not None:
+            with self._lock:
+                self.misses += 1
+            log.warning(f"代理池: 无空闲代理，与其他账号共用 {proxy}")
+        return proxy
+
+    def _lease_ranked(self, log, max_leased=0):
+        """
+        按健康度租用池中的代理，超过 RECHECK_INTERVAL 未确认的先重新验证
+        :param max_leased: 只考虑占用数不超过该值的代理，0 表示只取空闲代理
+        :return: 代理地址，池中没有符合条件的代理时返回 None
+        """
+        while True:
+            proxy, entry = self._take(max_leased)
+            if proxy is None:
+                return None
+            if time.time() - entry["checked_at"] < self.RECHECK_INTERVAL:
+                with self._lock:
+                    self.leases += 1
+                log.info(f"代理池: 租用 {proxy}（延迟 {self._format_latency(entry)}，"
+                         f"成功 {entry['success']} / 失败 {entry['failure']}）")
+                return proxy
+            self.release(proxy)
+            candidates = [proxy] + self._stale_idle(exclude=proxy, limit=self.size - 1)
+            winner, latency = race_proxies(candidates, on_result=self._record_probe)
+            if winner is not None:
+                self._acquire(winner)
+                log.info(f"代理池: 租用 {winner}（重新验证通过，响应时间 {latency:.1f}s）")
+                return winner
+
+    def _stale_idle(self, exclude, limit):
+        """需要重新验证的空闲代理，按健康度排序"""
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self._lock:
+            return [
+                proxy for proxy, entry in self._ranked()
+                if proxy != exclude and entry["leased"] == 0
+                and now - entry["checked_at"] >= self.RECHECK_INTERVAL
+            ][:limit]
+
+    def _acquire(self, proxy):
+        with self._lock:
+            entry = self._entries.get(proxy)
+            if entry is not None:
+                entry["leased"] += 1
+            self.leases += 1
+
+    def _record_probe(self, proxy, latency):
+        """记录一次验证结果：更新延迟或计一次失败，并写入信誉存储"""
+        if self.store is not None:
+            if latency is None:
+                self.store.record_failure(proxy)
+            else:
+                self.store.record_success(proxy, latency)
+        with self._lock:
+            entry = self._entries.get(proxy)
+            if latency is None:
+                if entry is not None:
+                    self._record_failure(proxy, entry)
+                return
+            if entry is None:
+                self._entries[proxy] = self._new_entry(latency)
+                self._released.notify_all()
+            else:
+                self._update_latency(entry, latency)
+                entry["checked_at"] = time.time()
+
+    def check(self, proxy, lease=True):
+        """
+        验证代理并更新其延迟；不在池中的代理验证通过后加入代理池
+        :param lease: 验证通过后是否占用该代理（重试复用上次代理时使用）
+        :return: True 可用，False 不可用
+        """
+        latency = measure_proxy(proxy)
+        self._record_probe(proxy, latency)
+        if latency is None:
+            return False
+        if lease:
+            self._acquire(proxy)
+        return True
+
+    def release(self, proxy):
+        """归还代理占用（不改变健康度）"""
+        with self._lock:
+            entry = self._entries.get(proxy)
+            if entry is not None and entry["leased"] > 0:
+                entry["leased"] -= 1
+                self._released.notify_all()
+
+    def report_success(self, proxy):
+        """代理成功支撑了一次浏览器会话"""
+        with self._lock:
+            entry = self._entries.get(proxy)
+            if entry is None:
+                return
+            entry["leased"] = max(0, entry["leased"] - 1)
+            self._released.notify_all()
+            entry["success"] += 1
+            entry["streak"] = 0
+            entry["checked_at"] = time.time()
+        if self.store is not None:
+            self.store.record_success(proxy)
+
+    def report_failure(self, proxy):
+        """代理导致签到失败（proxy_failed）：降级，连续失败达到上限则淘汰"""
+        with self._lock:
+            entry = self._entries.get(proxy)
+            if entry is None:
+                return
+            entry["leased"] = max(0, entry["leased"] - 1)
+            self._released.notify_all()
+            self._record_failure(proxy, entry)
+        if self.store is not None:
+            self.store.record_failure(proxy)
+
+    def _record_failure(self, proxy, entry):
+        entry["failure"] += 1
+        entry["streak"] += 1
+        if entry["streak"] >= self.max_failures:
+            logger.info(f"代理池: {proxy} 连续失败 {entry['streak']} 次，移出代理池")
+            del self._entries[proxy]
+        else:
+            logger.info(f"代理池: {proxy} 失败 {entry['streak']} 次，降低优先级")
+
+    @staticmethod
+    def _format_latency(entry):
+        return "未知" if entry["latency"] is None else f"{entry['latency']:.1f}s"
+
+    def stats(self):
+        with self._lock:
+            self._prune()
+            return {
+                "crawls": self.crawls,
+                "restored": self.restored,
+                "leases": self.leases,
+                "misses": self.misses,
+                "available": len(self._entries),
+            }
 
 
-def generate_html_report(results, screenshot_mode='all'):
+_proxy_pool = None
+_proxy_pool_lock = threading.Lock()
+
+
+def get_proxy_pool():
     """
-    生成 HTML 签到报告
-    :param results: 签到结果列表
-    :param screenshot_mode: 截图模式 - 'all'(所有), 'failed_only'(仅失败), 'none'(无截图)
+    获取全局国内代理池（最小抓取数、TTL、淘汰阈值由 PROXY_POOL_SIZE / PROXY_POOL_TTL / PROXY_POOL_MAX_FAILURES 控制，
+    运行时按调度引擎的在途账号数调大抓取数），
+    代理信誉保存在 temp/proxies/reputation.jsonl，保留时长由 PROXY_STORE_MAX_AGE 控制（0 禁用）
     """
-    now_str = now_local().strftime('%Y-%m-%d %H:%M:%S')
-    success_count = len([r for r in results if r['status']])
-    total_count = len(results)
-    
-    # 基础样式
-    style_block = """
-    <style>
-        :root {
-            --bg-body: #f9fafb;
-            --bg-card: #ffffff;
-            --text-main: #111827;
-            --text-sub: #6b7280;
-            --border: #e5e7eb;
-            --bg-success: #ecfdf5;
-            --text-success: #059669;
-            --bg-error: #fef2f2;
-            --text-error: #dc2626;
-            --bg-footer: #f3f4f6;
-            --text-footer: #9ca3af;
+    global _proxy_pool
+    if _proxy_pool is None:
+        with _proxy_pool_lock:
+            if _proxy_pool is None:
+                max_failures = int(os.getenv("PROXY_POOL_MAX_FAILURES", "2"))
+                store = None
+                store_max_age = int(os.getenv("PROXY_STORE_MAX_AGE", "172800"))
+                if store_max_age > 0:
+                    store = ProxyReputationStore(
+                        os.path.join("temp", "proxies", "reputation.jsonl"),
+                        max_age=store_max_age,
+                        max_streak=max_failures,
+                    )
+                _proxy_pool = ProxyPool(
+                    size=int(os.getenv("PROXY_POOL_SIZE", "4")),
+                    ttl=int(os.getenv("PROXY_POOL_TTL", "600")),
+                    max_failures=max_failures,
+                    store=store,
+                )
+    return _proxy_pool
+
+
+def get_freeproxy_ip():
+    """
+    从全局代理池租用一个国内免费代理，池空时才抓取。仅用于海外环境绕过 IP 拦截。
+    :return: 代理地址字符串 "ip:port"，无可用代理时返回 None
+    """
+    return get_proxy_pool().lease()
+
+
+def release_proxy_lease(proxy):
+    """归还账号占用的代理池代理（签到异常或被取消、没有结果可反馈时），非代理池代理忽略"""
+    if proxy:
+        get_proxy_pool().release(proxy)
+
+
+# ==========================================
+# Timeline
+# ==========================================
+
+# 签到流程各阶段的显示名称（按流程顺序排列，报告中的耗时表也按此顺序输出）
+TIMELINE_PHASES = {
+    "reachability": "网络探测",
+    "proxy_fetch": "获取代理",
+    "proxy_validate": "验证代理",
+    "api_check": "接口检查",
+    "browser_init": "启动浏览器",
+    "stealth_inject": "注入脚本",
+    "queued": "排队等待",
+    "load_cookies": "加载 Cookie",
+    "earn_page": "打开积分页",
+    "login": "密码登录",
+    "captcha": "验证码",
+    "button_poll": "等待签到完成",
+    "screenshot": "截图",
+    "teardown": "关闭浏览器",
+}
+
+
+class TimelineSpan:
+    """时间线上的一个阶段，可作为上下文管理器使用，也可手动调用 end()"""
+
+    def __init__(self, timeline, name, attrs):
+        self.timeline = timeline
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration = None
+        self.status = "ok"
+
+    def end(self, status="ok"):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.start
+            self.status = status
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end("error" if exc_type else "ok")
+        return False
+
+    def to_dict(self):
+        data = {
+            "name": self.name,
+            "offset": round(self.start - self.timeline.origin, 3),
+            "duration": round(self.duration or 0.0, 3),
+            "status": self.status,
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        return data
+
+
+class Timeline:
+    """
+    单个账号一次签到的阶段耗时记录，结果作为 result['timeline'] 返回，
+    并以 JSON Lines 追加写入 logs/timeline_<日期>.jsonl
+    """
+
+    _write_lock = threading.Lock()
+
+    def __init__(self, account):
+        self.account = account
+        self.started_at = now_local().isoformat(timespec="seconds")
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.total = None
+        # 资源拦截统计（collect_resource_stats），未启用时为 None
+        self.resources = None
+
+    def span(self, name, **attrs):
+        span = TimelineSpan(self, name, attrs)
+        self.spans.append(span)
+        return span
+
+    def timed(self, name, func, *args, **kwargs):
+        with self.span(name):
+            return func(*args, **kwargs)
+
+    def finish(self):
+        """结束时间线，未结束的阶段标记为 aborted（异常提前返回时）"""
+        for span in self.spans:
+            if span.duration is None:
+                span.end("aborted")
+        self.total = time.perf_counter() - self.origin
+        return self
+
+    def phase_totals(self):
+        totals = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + (span.duration or 0.0)
+        return totals
+
+    def to_dict(self):
+        return {
+            "account": self.account,
+            "started_at": self.started_at,
+            "total": round(self.total or 0.0, 3),
+            "phases": {name: round(seconds, 3) for name, seconds in self.phase_totals().items()},
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+    def write_trace(self, result=None, log_dir="logs"):
+        import json
+
+        record = self.to_dict()
+        if result is not None:
+            record["status"] = result.get("status")
+            record["retries"] = result.get("retries", 0)
+        if self.resources is not None:
+            record["resources"] = self.resources
+        path = os.path.join(log_dir, f"timeline_{now_local().strftime('%Y-%m-%d')}.jsonl")
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            with self._write_lock:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.warning(f"写入阶段耗时记录失败: {e}")
+        return record
+
+
+def summarize_timelines(results):
+    """
+    汇总各账号的阶段耗时
+    :return: [(阶段显示名, 平均秒数, 最大秒数, 账号数)]，按流程顺序排列，无数据时返回空列表
+    """
+    per_phase = {}
+    for res in results:
+        timeline = (res or {}).get('timeline') or {}
+        for name, seconds in timeline.get('phases', {}).items():
+            per_phase.setdefault(name, []).append(seconds)
+        if timeline.get('total') is not None:
+            per_phase.setdefault("total", []).append(timeline['total'])
+
+    order = list(TIMELINE_PHASES) + sorted(name for name in per_phase if name not in TIMELINE_PHASES and name != "total") + ["total"]
+    rows = []
+    for name in order:
+        values = per_phase.get(name)
+        if not values:
+            continue
+        label = TIMELINE_PHASES.get(name, "合计" if name == "total" else name)
+        rows.append((label, sum(values) / len(values), max(values), len(values)))
+    return rows
+
+
+def describe_network(results):
+    """
+    报告中的网络探测说明（本次运行共享的直连可达性探测结果）
+    :return: 说明文字，未探测时返回 None
+    """
+    snapshots = [res['network'] for res in results if res and res.get('network')]
+    if not snapshots:
+        return None
+    network = max(snapshots, key=lambda item: (item['checked_at'], item['hits']))
+    verdict = "直连被拦截，已使用国内代理" if network['blocked'] else "直连正常"
+    return (
+        f"{verdict}（探测 {network['probes']} 次，耗时 {network['probe_seconds']:.1f}s，"
+        f"复用缓存 {network['hits']} 次）"
+    )
+
+
+def describe_browser_pool(pool_stats):
+    """
+    报告中的浏览器池说明
+    :param pool_stats: BrowserPool.stats() 的结果，未启用浏览器池时为 None
+    :return: 说明文字，未启用或没有借出记录时返回 None
+    """
+    if not pool_stats or not (pool_stats['hits'] or pool_stats['misses']):
+        return None
+    return (
+        f"命中 {pool_stats['hits']} 次，未命中（冷启动） {pool_stats['misses']} 次，"
+        f"回收 {pool_stats['recycled']} 次"
+    )
+
+
+# SVG图标
+
+# 图标 (Base64)
+BASE64_ICONS = {
+    # 金色硬币
+    'coin': 'data:image/svg+xml;base64,PHN2ZyBjbGFzcz0iaWNvbiIgdmlld0JveD0iMCAwIDExMTQgMTAyNCIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIiB3aWR0aD0iMjAwIiBoZWlnaHQ9IjIwMCI+PHBhdGggZD0iTTgwNy41MTEgNDAwLjY2NmE1MTIgNTEyIDAgMCAwLTYwLjE1LTUzLjg3M2MtMy4wNzItMi4zNDUtNS40MjctMy45ODMtOC4xNS01Ljk4IDM4LjA2Ni0xMy4wNzcgNjQuNy00NC4zOCA2NC43LTgxLjQzNCAwLTQ5LjktNDcuMzctODguMDgtMTAzLjYxOC04OC4wOGE5OS40IDk5LjQgMCAwIDAtMzUuNTU4IDYuNDk4IDc5IDc5IDAgMCAwLTExLjc3MSA1LjU5MWMtMS45NjYuODMtNi4xNi0uMDk3LTcuMzEyLTEuNTNsLS4wNS4wMzVjLTQuMjkxLTYuNDMtMTAuNzYzLTE0LjQwMi0yMC4xNjgtMjIuNTY5LTE3LjktMTUuNTU0LTM5LjA5Mi0yNS4xNS02My4yOTQtMjUuMTVzLTQ1LjM4NCA5LjU5Ni02My4yODggMjUuMTVjLTkuMTkgNy45NzctMTUuNDk4IDE1LjcxMy0xOS44MDQgMjIuMDc4bC0uMDI2LS4wMmMtMS42MjggMS45Mi01Ljg1MiAyLjkyOC03LjMyMiAyLjIyMWE3OC40IDc4LjQgMCAwIDAtMTIuMTQ0LTUuODExIDk5LjUgOTkuNSAwIDAgMC0zNS41NjQtNi41MDJjLTU2LjI0OCAwLTEwMy42MTMgMzguMTg1LTEwMy42MTMgODguMDc5IDAgMzEuNjgzIDE5LjU0MyA1OS4xMDUgNDguOTU3IDc0LjYyNGE0OTUgNDk1IDAgMCAwLTkuNDA1IDYuODQgNDY4IDQ2OCAwIDAgMC02MC4wNTggNTMuMzE1QzI0NC4yNjUgNDUyLjk1NiAyMTAuNSA1MjAuMjEyIDIxMC41IDU5NC44NzJjMCAyMDcuMDIyIDE1NC4yOCAzMDUuNDggMzQwLjEzMSAzMDUuNDggNzcuODkxIDAgMTU0LjAzLTE1LjU0IDIxNS42NC01Mi4yMTkgODMuNTk5LTQ5Ljc5MiAxMzEuMTUzLTEzMy40MjcgMTMxLjE1My0yNTMuMjYtLjAxNS03MC4xNjUtMzMuOTk2LTEzNS4zNDgtODkuOTEyLTE5NC4yMDdNNjQ2LjU2NCA2MDEuNDNjMTAuNTk4IDAgMTkuMTg0IDguNzkxIDE5LjE4NCAxOS42MTUgMCAxMC44MjktOC41OSAxOS42MjUtMTkuMTg0IDE5LjYyNUg1NjkuODF2NTYuNDg5YzAgOC4yODktOC41OTEgMTUuMDA2LTE5LjE4NSAxNS4wMDYtMTAuNTk4IDAtMTkuMTg0LTYuNzE3LTE5LjE4NC0xNS4wMDZ2LTU2LjQ5aC03Ni43NTRjLTEwLjU5OSAwLTE5LjE4NS04Ljc5LTE5LjE4NS0xOS42MnM4LjU5MS0xOS42MTQgMTkuMTg1LTE5LjYxNGg3Ni43NTRWNTgxLjgyaC03Ni43NTRjLTEwLjU5OSAwLTE5LjE4NS04Ljc4NS0xOS4xODUtMTkuNjE0czguNTkxLTE5LjYxNSAxOS4xODUtMTkuNjE1aDc4LjM5N2wtNzIuNzgtNzQuMzk5YTE5LjkxNyAxOS45MTcgMCAwIDEgMC0yNy43MzUgMTguODkzIDE4Ljg5MyAwIDAgMSAyNy4xMzUgMGw2My4xODYgNjQuNTg0IDYzLjE4Ni02NC41ODRhMTguOTAzIDE4LjkwMyAwIDAgMSAyNi43MjEtLjQyNWwuNDIuNDI1YTE5LjkyNyAxOS45MjcgMCAwIDEgMCAyNy43MzVsLTcyLjc4IDc0LjM5OWg3OC40MDJjMTAuNTk4IDAgMTkuMTggOC43OCAxOS4xOCAxOS42MTVzLTguNTg3IDE5LjYxNC0xOS4xOCAxOS42MTRoLTc2Ljc1OXYxOS42MXoiIGZpbGw9IiNmNTllMGIiLz48L3N2Zz4='
+}
+
+
+def get_screenshot_html(screenshot_path):
+    """
+    将截图文件转换为 Base64 嵌入的 HTML img 标签
+    :param screenshot_path: 截图文件路径
+    :return: HTML img 标签或空字符串
+    """
+    if not screenshot_path or not os.path.exists(screenshot_path):
+        return ""
+    
+    try:
+        import base64
+        with open(screenshot_path, "rb") as img_file:
+            img_data = base64.b64encode(img_file.read()).decode('utf-8')
+        
+        # 根据文件扩展名确定 MIME 类型
+        mime_type = "image/jpeg" if screenshot_path.lower().endswith(('.jpg', '.jpeg')) else "image/png"
+        
+        # 获取文件大小
+        file_size = os.path.getsize(screenshot_path) / 1024  # KB
+        
+        return f'''
+            <div style="margin-top: 12px; border-top: 1px solid var(--border); padding-top: 12px;">
+                <div style="font-size: 12px; color: var(--text-sub); margin-bottom: 8px;">📸 截图 ({file_size:.1f}KB)</div>
+                <img src="data:{mime_type};base64,{img_data}" style="max-width: 100%; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);" alt="签到截图"/>
+            </div>
+        '''
+    except Exception as e:
+        logger.debug(f"生成截图 HTML 时出错: {e}")
+        return ""
+
+
+
+def generate_html_report(results, screenshot_mode='all', pool_stats=None):
+    """
+    生成 HTML 签到报告
+    :param results: 签到结果列表
+    :param screenshot_mode: 截图模式 - 'all'(所有), 'failed_only'(仅失败), 'none'(无截图)
+    :param pool_stats: 浏览器池统计（BrowserPool.stats()），为 None 时不展示
+    """
+    now_str = now_local().strftime('%Y-%m-%d %H:%M:%S')
+    success_count = len([r for r in results if r['status']])
+    total_count = len(results)
+    
+    # 基础样式
+    style_block = """
+    <style>
+        :root {
+            --bg-body: #f9fafb;
+            --bg-card: #ffffff;
+            --text-main: #111827;
+            --text-sub: #6b7280;
+            --border: #e5e7eb;
+            --bg-success: #ecfdf5;
+            --text-success: #059669;
+            --bg-error: #fef2f2;
+            --text-error: #dc2626;
+            --bg-footer: #f3f4f6;
+            --text-footer: #9ca3af;
         }
         @media (prefers-color-scheme: dark) {
             :root {
@@ -1258,6 +2287,42 @@ def generate_html_report(results, screenshot_mode='all'):
             {get_screenshot_html(res.get('screenshot')) if screenshot_mode == 'all' or (screenshot_mode == 'failed_only' and not res['status']) else ''}
         </div>
         """
+
+    network_text = describe_network(results)
+    if network_text:
+        html += f"""
+        <div class="card" style="font-size: 13px; color: var(--text-main);">
+            <span style="font-weight: 600;">🌐 网络探测</span>
+            <span style="color: var(--text-sub);">{network_text}</span>
+        </div>
+        """
+
+    pool_text = describe_browser_pool(pool_stats)
+    if pool_text:
+        html += f"""
+        <div class="card" style="font-size: 13px; color: var(--text-main);">
+            <span style="font-weight: 600;">🧭 浏览器池</span>
+            <span style="color: var(--text-sub);">{pool_text}</span>
+        </div>
+        """
+
+    timeline_rows = summarize_timelines(results)
+    if timeline_rows:
+        rows_html = "".join(
+            f'<tr><td style="padding: 4px 0;">{label}</td>'
+            f'<td style="text-align: right;">{avg:.1f}s</td>'
+            f'<td style="text-align: right;">{peak:.1f}s</td></tr>'
+            for label, avg, peak, _ in timeline_rows
+        )
+        html += f"""
+        <div class="card" style="font-size: 13px; color: var(--text-main);">
+            <div style="font-weight: 600; margin-bottom: 8px;">⏱️ 阶段耗时</div>
+            <table style="width: 100%; border-collapse: collapse;">
+                <tr style="color: var(--text-sub);"><td>阶段</td><td style="text-align: right;">平均</td><td style="text-align: right;">最大</td></tr>
+                {rows_html}
+            </table>
+        </div>
+        """
         
     html += """
         </div>
@@ -1269,11 +2334,12 @@ def generate_html_report(results, screenshot_mode='all'):
     return html
 
 
-def generate_markdown_report(results, compact=False):
+def generate_markdown_report(results, compact=False, pool_stats=None):
     """
     生成 Markdown 签到报告
     :param results: 签到结果列表
     :param compact: 精简模式 - 成功账号只保留一行，失败账号保留完整信息
+    :param pool_stats: 浏览器池统计（BrowserPool.stats()），为 None 时不展示
     """
     now_str = now_local().strftime('%Y-%m-%d %H:%M:%S')
     success_count = len([r for r in results if r['status']])
@@ -1302,7 +2368,27 @@ def generate_markdown_report(results, compact=False):
             md += f"- **消息**: {res['msg']}\n"
             if res.get('retries', 0) > 0:
                 md += f"- **重试**: {res['retries']}\n"
+            if res.get('timeline'):
+                md += f"- **耗时**: {res['timeline']['total']:.1f}s\n"
             md += "\n"
+
+    network_text = describe_network(results)
+    if network_text:
+        md += f"**网络探测**: {network_text}\n\n"
+
+    pool_text = describe_browser_pool(pool_stats)
+    if pool_text:
+        md += f"**浏览器池**: {pool_text}\n\n"
+
+    timeline_rows = summarize_timelines(results)
+    if timeline_rows and not compact:
+        md += "---\n"
+        md += "**阶段耗时**\n\n"
+        md += "| 阶段 | 平均 | 最大 |\n"
+        md += "| --- | --- | --- |\n"
+        for label, avg, peak, _ in timeline_rows:
+            md += f"| {label} | {avg:.1f}s | {peak:.1f}s |\n"
+        md += "\n"
         
     md += "---\n"
     md += "Powered by Rainyun-Qiandao"
@@ -1370,7 +2456,6 @@ def generate_summary_report(results, fmt='html'):
 
 def send_pushplus_notification(token, title, content):
     """发送 PushPlus 通知"""
-    import requests
     url = 'http://www.pushplus.plus/send'
     data = {
         "token": token,
@@ -1380,7 +2465,7 @@ def send_pushplus_notification(token, title, content):
     }
     try:
         logging.info(f"Sending PushPlus notification: {title}")
-        response = requests.post(url, json=data, timeout=10)
+        response = get_http_client().post(url, json=data, timeout=10)
         result = response.json()
         if result.get('code') == 200:
             logging.info("PushPlus notification sent successfully")
@@ -1473,7 +2558,6 @@ def compress_screenshot(input_path, output_path, max_width=800, quality=35):
 
 def compress_with_tinypng(input_path, output_path, api_key):
     """使用 TinyPNG API 压缩（每月免费 500 次，单张最大 5MB）"""
-    import requests
     import base64
     
     try:
@@ -1485,7 +2569,8 @@ def compress_with_tinypng(input_path, output_path, api_key):
             image_data = f.read()
         
         auth = base64.b64encode(f"api:{api_key}".encode()).decode()
-        resp = requests.post(
+        http = get_http_client()
+        resp = http.post(
             "https://api.tinify.com/shrink",
             headers={"Authorization": f"Basic {auth}"},
             data=image_data,
@@ -1501,7 +2586,7 @@ def compress_with_tinypng(input_path, output_path, api_key):
         if not compressed_url:
             return None
         
-        img_resp = requests.get(compressed_url, timeout=30)
+        img_resp = http.get(compressed_url, timeout=30)
         if img_resp.status_code != 200:
             return None
         
@@ -1588,11 +2673,51 @@ def parse_accounts():
     return accounts
 
 
+# 失败类型及显示名
+FAILURE_CLASSES = {
+    "proxy": "代理失败",
+    "captcha": "验证码失败",
+    "credentials": "账号或密码错误",
+    "other": "其他错误",
+}
+
+# 各失败类型的首次重试退避时间（秒），之后每次重试翻倍，上限 RETRY_BACKOFF_MAX。
+# 代理失败会换代理重试，无需久等；验证码失败稍等片刻避免连续触发风控。
+RETRY_BACKOFF = {
+    "proxy": 5,
+    "captcha": 20,
+    "other": 30,
+}
+RETRY_BACKOFF_MAX = 300
+
+
+def classify_failure(result, error=None):
+    """
+    判断签到失败的类型：由 _run_checkin 按失败发生的阶段写入 result['failure']，
+    未标注时按是否代理失败区分
+    :return: FAILURE_CLASSES 中的键
+    """
+    if result is None:
+        return "other"
+    if result.get('failure') in FAILURE_CLASSES:
+        return result['failure']
+    if result.get('proxy_failed'):
+        return "proxy"
+    return "other"
+
+
+def retry_backoff(failure, attempt):
+    """
+    计算重试前的退避时间：按失败类型指数退避，并加入随机抖动避免多个账号同时重试
+    :param attempt: 第几次重试（从 1 开始）
+    """
+    delay = min(RETRY_BACKOFF.get(failure, RETRY_BACKOFF["other"]) * 2 ** (attempt - 1), RETRY_BACKOFF_MAX)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
 def run_all_accounts():
     """执行所有账号的签到任务"""
 
-    import concurrent.futures
-
     # 从环境变量获取最大重试次数，默认为2
     max_retries = int(os.getenv("CHECKIN_MAX_RETRIES", "2"))
     # 并发相关配置
@@ -1611,84 +2736,96 @@ def run_all_accounts():
             'index': i + 1
         }
     
-    # 待执行的账号列表
-    pending_accounts = list(accounts)
-    current_attempt = 0
-    
-    while pending_accounts and current_attempt <= max_retries:
-        if current_attempt == 0:
-            logger.info(f"========== 开始执行签到任务（共 {len(pending_accounts)} 个账号，并发数: {max_workers}） ==========")
+    # 浏览器池跨账号、跨重试复用已启动的浏览器
+    browser_pool = create_browser_pool(max_workers)
+    proxy_pool = get_proxy_pool()
+    http_before = get_http_client().stats()
+    wait_stats.reset()
+    pipeline = create_checkin_pipeline(max_workers, browser_pool, stagger_delay)
+    # 代理池按流水线的在途账号数抓取，避免池被占满后反复抓取
+    proxy_pool.reserve(pipeline.max_leases)
+
+    logger.info(f"========== 开始执行签到任务（共 {len(accounts)} 个账号，并发数: {max_workers}） ==========")
+    jobs = []
+    for username, password in accounts:
+        logger.info(f"========== 排入账号 {results[username]['index']}/{len(accounts)} ==========")
+        jobs.append((username, password, None))
+
+    # 流水线执行：代理获取与浏览器预热提前进行，签到阶段按 MAX_DELAY 错峰限速；
+    # 失败的账号按失败类型退避后立即重新排入同一条流水线，不等待其他账号
+    for username, result, error in pipeline.run(jobs):
+        account_idx = results[username]['index']
+        if error is not None:
+            logger.error(f"❌ 账号 {account_idx} 执行异常: {error}")
         else:
-            logger.info(f"========== 第 {current_attempt} 次重试（共 {len(pending_accounts)} 个失败账号） ==========")
-        
-        failed_accounts = []
-        future_to_account = {}
-        
-        # 使用线程池并发执行
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交任务
-            for i, (username, password) in enumerate(pending_accounts):
-                if i > 0 and stagger_delay > 0:
-                     # 最小延时为 5 秒
-                     lower_bound = 5
-                     upper_bound = max(5, stagger_delay)
-                     actual_delay = random.randint(lower_bound, upper_bound)
-                     logger.info(f"随机等待 {actual_delay} 秒后启动下一个账号任务...")
-                     time.sleep(actual_delay)
-                
-                account_idx = results[username]['index']
-                retry_info = f"（第 {results[username]['retry_count'] + 1} 次尝试）" if results[username]['retry_count'] > 0 else ""
-                logger.info(f"========== 启动账号 {account_idx}/{len(accounts)} {retry_info} ==========")
-
-                # 重试时复用上次代理，避免换 IP 导致 Cookie 失效。
-                # 但如果上次失败是代理问题（proxy_failed），则不复用——慢代理通过了 validate_proxy
-                # 却无法支撑浏览器会话，复用只会重复同样的失败。
-                reuse_proxy = None
-                if results[username]['result'] and results[username]['result'].get('proxy'):
-                    if not results[username]['result'].get('proxy_failed'):
-                        reuse_proxy = results[username]['result']['proxy']
-                    else:
-                        logger.info(f"上次失败由代理引起，不复用旧代理，重新抓取")
-
-                future = executor.submit(run_checkin, username, password, reuse_proxy)
-                future_to_account[future] = username
+            results[username]['result'] = result
+            if result.get('proxy'):
+                # 反馈给代理池：代理失败则降级（连续失败淘汰），否则记一次成功
+                if result.get('proxy_failed'):
+                    proxy_pool.report_failure(result['proxy'])
+                else:
+                    proxy_pool.report_success(result['proxy'])
+            if browser_pool is not None and result.get('proxy_failed'):
+                # 失败代理对应的浏览器不再复用
+                browser_pool.discard_proxy(result.get('proxy'))
 
-            # 获取结果
-            for future in concurrent.futures.as_completed(future_to_account):
-                username = future_to_account[future]
-                account_idx = results[username]['index']
-                
-                try:
-                    result = future.result()
-                    results[username]['result'] = result
-                    
-                    if result['status']:
-                        logger.info(f"✅ 账号 {account_idx} 签到成功")
-                    else:
-                        logger.error(f"❌ 账号 {account_idx} 签到失败: {result['msg']}")
-                        results[username]['retry_count'] += 1
-                        # 还没达到最大重试次数，加入待重试列表
-                        if results[username]['retry_count'] <= max_retries:
-                            # 注意：这里不能直接 append 到 failed_accounts，因为主线程在等待所有 future 完成
-                            # 但在这里 append 是安全的，因为 failed_accounts 是局部变量，且只在当前 while 循环迭代中使用
-                            failed_accounts.append((username, results[username]['password']))
-                except Exception as e:
-                    logger.error(f"❌ 账号 {account_idx} 执行异常: {e}")
-                    results[username]['retry_count'] += 1
-                    if results[username]['retry_count'] <= max_retries:
-                        failed_accounts.append((username, results[username]['password']))
+            if result['status']:
+                logger.info(f"✅ 账号 {account_idx} 签到成功")
+                continue
+            logger.error(f"❌ 账号 {account_idx} 签到失败: {result['msg']}")
+
+        results[username]['retry_count'] += 1
+        failure = classify_failure(result, error)
+        if failure == "credentials":
+            logger.warning(f"账号 {account_idx} {FAILURE_CLASSES[failure]}，重试无意义，不再重试")
+            continue
+        if results[username]['retry_count'] > max_retries:
+            continue
+
+        # 重试时复用上次代理，避免换 IP 导致 Cookie 失效。
+        # 但如果上次失败是代理问题（proxy_failed），则不复用——慢代理通过了 validate_proxy
+        # 却无法支撑浏览器会话，复用只会重复同样的失败；改从代理池租用其他代理。
+        reuse_proxy = None
+        if result and result.get('proxy'):
+            if not result.get('proxy_failed'):
+                reuse_proxy = result['proxy']
+            else:
+                logger.info(f"上次失败由代理引起，不复用旧代理，改用代理池中的其他代理")
+        delay = retry_backoff(failure, results[username]['retry_count'])
+        logger.info(
+            f"========== 账号 {account_idx}/{len(accounts)} 失败类型: {FAILURE_CLASSES[failure]}，"
+            f"{delay:.0f} 秒后进行第 {results[username]['retry_count']} 次重试 =========="
+        )
+        pipeline.requeue((username, results[username]['password'], reuse_proxy), delay)
 
-        # 更新待执行列表为失败账号
-        pending_accounts = failed_accounts
-        current_attempt += 1
-        
-        # 如果还有待重试的账号，增加重试间隔
-        if pending_accounts:
-            retry_wait = 60  # 固定重试等待 60 秒
-            logger.info(f"等待 {retry_wait} 秒后开始重试 {len(pending_accounts)} 个失败账号...")
-            time.sleep(retry_wait)
+    pool_stats = None
+    if browser_pool is not None:
+        pool_stats = browser_pool.stats()
+        logger.info(f"浏览器池统计: {describe_browser_pool(pool_stats) or '无借出记录'}")
+        browser_pool.shutdown()
+        try:
+            unload_selenium_modules()
+            logger.debug("已卸载Selenium模块")
+        except:
+            pass
     
 
+    shutdown_captcha_process_pool()
+
+    proxy_stats = proxy_pool.stats()
+    if proxy_stats['crawls'] or proxy_stats['restored']:
+        logger.info(
+            f"代理池统计: 抓取 {proxy_stats['crawls']} 次, 复用上次可用代理 {proxy_stats['restored']} 个, "
+            f"租用 {proxy_stats['leases']} 次, 无空闲代理 {proxy_stats['misses']} 次, "
+            f"剩余可用 {proxy_stats['available']} 个"
+        )
+
+    if wait_stats.waits:
+        logger.info(
+            f"条件等待统计: 共 {wait_stats.waits} 次，较原固定 sleep 节省约 {wait_stats.saved:.1f} 秒"
+            f"（{wait_stats.timeouts} 次达到等待上限）"
+        )
+
     # 汇总最终结果
     final_results = [results[username]['result'] for username, _ in accounts]
     success_count = len([r for r in final_results if r and r['status']])
@@ -1761,11 +2898,11 @@ def run_all_accounts():
             
             # 一次性生成 7 份内容，由各 Provider 按自身限制自动选择
             context = {
-                'html_email':        generate_html_report(final_results, screenshot_mode='all'), # 邮件无限制，强制全带截图
-                'html_full':         generate_html_report(final_results, screenshot_mode=screenshot_mode),
-                'html_lite':         generate_html_report(final_results, screenshot_mode='none'),
-                'markdown_full':     generate_markdown_report(final_results, compact=False),
-                'markdown_lite':     generate_markdown_report(final_results, compact=True),
+                'html_email':        generate_html_report(final_results, screenshot_mode='all', pool_stats=pool_stats), # 邮件无限制，强制全带截图
+                'html_full':         generate_html_report(final_results, screenshot_mode=screenshot_mode, pool_stats=pool_stats),
+                'html_lite':         generate_html_report(final_results, screenshot_mode='none', pool_stats=pool_stats),
+                'markdown_full':     generate_markdown_report(final_results, compact=False, pool_stats=pool_stats),
+                'markdown_lite':     generate_markdown_report(final_results, compact=True, pool_stats=pool_stats),
                 'summary_html':      generate_summary_report(final_results, fmt='html'),
                 'summary_markdown':  generate_summary_report(final_results, fmt='markdown'),
             }
@@ -1776,7 +2913,20 @@ def run_all_accounts():
                 logger.info(f"内容版本 {key}: {byte_size} bytes ({byte_size/1024:.1f} KB)")
             
             title = f"雨云签到: {success_count}/{len(accounts)} 成功"
-            notification_manager.send_all(title, context)
+            if isinstance(pipeline, AsyncCheckinPipeline):
+                import asyncio
+                asyncio.run(notification_manager.send_all_async(title, context))
+            else:
+                notification_manager.send_all(title, context)
+
+    http_stats = get_http_client().stats()
+    http_requests = http_stats['requests'] - http_before['requests']
+    if http_requests:
+        http_connections = http_stats['connections'] - http_before['connections']
+        logger.info(
+            f"HTTP 连接统计: 请求 {http_requests} 次, 新建连接 {http_connections} 次, "
+            f"复用连接 {max(0, http_requests - http_connections)} 次"
+        )
     
     # 任务结束后再次清理
     logger.info("任务完成，执行最终清理...")
@@ -1785,6 +2935,152 @@ def run_all_accounts():
     return success_count > 0
 
 
+# ==========================================
+# Smart Wait
+# ==========================================
+
+# 各类条件等待的默认上限（秒），可通过 WAIT_<类型>_MAX 环境变量覆盖
+WAIT_CEILING_DEFAULTS = {
+    "page": 3.0,       # 页面就绪：readyState + DOM 静默 + 资源请求静默
+    "captcha": 6.0,    # 验证码提交结果 / 换图完成
+    "modal": 2.0,      # 弹窗关闭
+    "button": 3.0,     # 签到按钮状态轮询的单次等待
+    "teardown": 2.0,   # ChromeDriver 进程退出
+}
+
+# 页面静默判定：readyState 为 complete，且 DOM 结构与资源请求数在 quiet_ms 内均无变化
+_PAGE_SETTLED_SCRIPT = """
+const quietMs = arguments[0];
+const ceilingMs = arguments[1];
+const done = arguments[arguments.length - 1];
+const start = performance.now();
+let last = start;
+let resources = performance.getEntriesByType('resource').length;
+const observer = new MutationObserver(() => { last = performance.now(); });
+observer.observe(document, {childList: true, subtree: true});
+(function check() {
+    const now = performance.now();
+    const count = performance.getEntriesByType('resource').length;
+    if (count !== resources) {
+        resources = count;
+        last = now;
+    }
+    if (document.readyState === 'complete' && now - last >= quietMs) {
+        observer.disconnect();
+        done(true);
+    } else if (now - start >= ceilingMs) {
+        observer.disconnect();
+        done(false);
+    } else {
+        setTimeout(check, 50);
+    }
+})();
+"""
+
+
+class WaitStats:
+    """条件等待统计：与被替换的固定 sleep 相比节省的时间（线程安全，按运行汇总）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.waits = 0
+            self.timeouts = 0
+            self.saved = 0.0
+
+    def record(self, kind, budget, elapsed, satisfied):
+        with self._lock:
+            self.waits += 1
+            self.saved += budget - elapsed
+            if not satisfied:
+                self.timeouts += 1
+        logger.debug(f"条件等待 [{kind}] 耗时 {elapsed:.2f}s（原固定等待 {budget:.1f}s，{'已满足' if satisfied else '达到上限'}）")
+
+
+wait_stats = WaitStats()
+
+
+def get_wait_ceiling(kind):
+    """读取条件等待上限（秒），环境变量 WAIT_<KIND>_MAX"""
+    default = WAIT_CEILING_DEFAULTS.get(kind, 5.0)
+    try:
+        return float(os.getenv(f"WAIT_{kind.upper()}_MAX", str(default)))
+    except ValueError:
+        return default
+
+
+def smart_wait(driver, condition, kind, budget, poll=0.1):
+    """
+    条件等待：condition(driver) 为真时立即返回，最长等待 WAIT_<KIND>_MAX 秒
+    :param budget: 被替换的固定 sleep 秒数，用于统计节省的时间
+    :return: condition 最后一次的返回值（超时为假值）
+    """
+    start = time.perf_counter()
+    deadline = start + get_wait_ceiling(kind)
+    while True:
+        try:
+            result = condition(driver)
+        except Exception:
+            result = False
+        if result or time.perf_counter() >= deadline:
+            break
+        time.sleep(poll)
+    wait_stats.record(kind, budget, time.perf_counter() - start, bool(result))
+    return result
+
+
+def element_gone(element):
+    """条件：元素已隐藏或已从 DOM 中移除"""
+    def condition(_):
+        try:
+            return not element.is_displayed()
+        except Exception:
+            return True
+    return condition
+
+
+def wait_page_settled(driver, budget, quiet_ms=500):
+    """
+    等待页面就绪：readyState 为 complete 且 DOM（MutationObserver）与资源请求均静默 quiet_ms
+    :param budget: 被替换的固定 sleep 秒数，等待上限不超过它，保证不比原来的 sleep 更慢
+    :return: 是否在上限内静默
+    """
+    ceiling = min(get_wait_ceiling("page"), budget)
+    start = time.perf_counter()
+    try:
+        previous_timeout = driver.timeouts.script
+    except Exception:
+        previous_timeout = None
+    try:
+        driver.set_script_timeout(ceiling + 5)
+        settled = bool(driver.execute_async_script(_PAGE_SETTLED_SCRIPT, quiet_ms, int(ceiling * 1000)))
+    except Exception:
+        # 等待期间发生跳转会使脚本上下文失效，退化为只检查 readyState
+        remaining = max(0.0, ceiling - (time.perf_counter() - start))
+        deadline = time.perf_counter() + remaining
+        settled = False
+        while time.perf_counter() < deadline:
+            try:
+                if driver.execute_script("return document.readyState") == "complete":
+                    settled = True
+                    break
+            except Exception:
+                pass
+            time.sleep(0.1)
+    finally:
+        # 恢复原脚本超时，避免影响之后的 execute_async_script 调用
+        if previous_timeout is not None:
+            try:
+                driver.set_script_timeout(previous_timeout)
+            except Exception:
+                pass
+    wait_stats.record("page", budget, time.perf_counter() - start, settled)
+    return settled
+
+
 def init_selenium(account_id: str, proxy: str = None):
     """
     初始化 Selenium WebDriver
@@ -1819,6 +3115,10 @@ def init_selenium(account_id: str, proxy: str = None):
     
     # 设置窗口大小（避免因窗口太小导致元素重叠或误点击）
     ops.add_argument("--window-size=1920,1080")
+
+    # 启用资源拦截时记录网络事件，用于统计被拦截的请求与节省的流量
+    if get_resource_block_profile() != "off":
+        ops.set_capability("goog:loggingPrefs", {"performance": "ALL"})
     
     if linux:
         ops.add_argument("--headless")
@@ -1851,44 +3151,534 @@ def init_selenium(account_id: str, proxy: str = None):
         return driver
 
 
-def download_image(url, filename, user_agent=None):
-    # 延迟导入requests模块
-    import requests
-    
-    os.makedirs("temp", exist_ok=True)
-    
-    headers = {}
-    if user_agent:
-        headers['User-Agent'] = user_agent
-        
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            path = os.path.join("temp", filename)
-            with open(path, "wb") as f:
-                f.write(response.content)
-            return True
-        else:
-            logger.error(f"下载图片失败！状态码: {response.status_code}")
-            return False
-    except Exception as e:
-        logger.error(f"下载图片异常: {e}")
-        return False
+def add_script_on_new_document(driver, source):
+    """
+    通过 CDP 注入在每个新文档加载前执行的脚本，并记录脚本标识，
+    以便浏览器被浏览器池复用前能够移除上一个账号注入的脚本。
+    """
+    result = driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+        "source": source
+    })
+    identifier = (result or {}).get("identifier")
+    if identifier:
+        script_ids = getattr(driver, "_rainyun_script_ids", None)
+        if script_ids is None:
+            script_ids = []
+            driver._rainyun_script_ids = script_ids
+        script_ids.append(identifier)
+    return identifier
+
+
+# 资源拦截配置：通过 Network.setBlockedURLs 丢弃与签到无关的资源，减少慢代理下的页面加载量。
+# 规则只匹配字体、第三方统计和雨云自身域名下的图片/媒体，验证码 iframe 及其图片
+#（turing.captcha.qcloud.com / captcha.gtimg.com）不会被任何规则命中。
+_BLOCK_FONTS = ["*.woff*", "*.ttf*", "*.otf*", "*.eot*", "*fonts.googleapis.com/*", "*fonts.gstatic.com/*"]
+_BLOCK_ANALYTICS = [
+    "*google-analytics.com/*", "*googletagmanager.com/*", "*doubleclick.net/*",
+    "*hm.baidu.com/*", "*cnzz.com/*", "*clarity.ms/*", "*sentry-cdn.com/*", "*ingest.sentry.io/*",
+]
+# 图片/媒体规则以完整的站点前缀开头，不会命中第三方 URL 查询参数中出现的雨云地址
+_BLOCK_MEDIA = [
+    f"https://{host}/*.{ext}*"
+    for host in ("app.rainyun.com", "www.rainyun.com")
+    for ext in ("png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "mp4", "webm")
+]
+RESOURCE_BLOCK_PROFILES = {
+    "off": [],
+    "light": _BLOCK_FONTS + _BLOCK_ANALYTICS,
+    "media": _BLOCK_FONTS + _BLOCK_ANALYTICS + _BLOCK_MEDIA,
+}
+# 记录到的资源大小上限（条）
+RESOURCE_SIZE_CACHE_MAX = 500
 
+_resource_sizes = None
+_resource_sizes_lock = threading.Lock()
+# 本进程是否已安排过采样（首次运行尚无大小记录时，保证至少采样一个账号）
+_resource_sampled = False
 
-def get_url_from_style(style):
-    import re
-    return re.search(r'url\(["\']?(.*?)["\']?\)', style).group(1)
 
+def get_resource_block_profile():
+    """资源拦截档位（RESOURCE_BLOCK_PROFILE）：off（默认）/ light（字体与第三方统计）/ media（另加雨云站内图片与媒体）"""
+    profile = os.getenv("RESOURCE_BLOCK_PROFILE", "off").strip().lower()
+    return profile if profile in RESOURCE_BLOCK_PROFILES else "off"
 
-def get_width_from_style(style):
-    import re
-    return re.search(r'width:\s*([\d.]+)px', style).group(1)
 
+def _should_sample_resources(patterns):
+    """
+    是否让本账号不拦截、只记录可拦截资源的实际大小（采样）。
+    被拦截的资源无法得知大小，节省流量只能依据采样时记录的大小估算：
+    尚无该档位资源的大小记录时采样一次，之后按 RESOURCE_BLOCK_SAMPLE_RATE（默认0.1）随机采样以更新记录。
+    """
+    from fnmatch import fnmatchcase
 
-def get_height_from_style(style):
-    import re
-    return re.search(r'height:\s*([\d.]+)px', style).group(1)
+    global _resource_sampled
+    with _resource_sizes_lock:
+        known = any(
+            fnmatchcase(url, pattern) for url in _load_resource_sizes() for pattern in patterns
+        )
+        if not known and not _resource_sampled:
+            _resource_sampled = True
+            return True
+    return random.random() < float(os.getenv("RESOURCE_BLOCK_SAMPLE_RATE", "0.1"))
+
+
+def apply_resource_blocking(driver, log=None):
+    """
+    为当前标签页设置资源拦截规则（浏览器池重置会换新标签页，因此每个账号都需重新设置），
+    并清空上一个账号残留的网络日志，使统计只覆盖本账号。
+    采样的账号不拦截任何资源，只记录可拦截资源的大小（见 _should_sample_resources）。
+    :return: 是否已启用拦截（采样时返回 False）
+    """
+    patterns = RESOURCE_BLOCK_PROFILES[get_resource_block_profile()]
+    if not patterns:
+        return False
+    log = log or logger
+    try:
+        driver.get_log("performance")
+    except Exception:
+        pass
+    sampling = _should_sample_resources(patterns)
+    driver._rainyun_resource_sampling = sampling
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": [] if sampling else patterns})
+    except Exception as e:
+        log.warning(f"设置资源拦截失败，将加载全部资源: {e}")
+        return False
+    if sampling:
+        log.info("本账号为资源采样：不拦截资源，记录可拦截资源的实际大小用于估算节省流量")
+        return False
+    return True
+
+
+def _resource_sizes_path():
+    return os.path.join("temp", "resource_sizes.json")
+
+
+def _load_resource_sizes():
+    """读取资源大小记录（URL 去掉查询参数 -> 字节数），用于估算被拦截资源节省的流量"""
+    import json
+
+    global _resource_sizes
+    if _resource_sizes is None:
+        try:
+            with open(_resource_sizes_path(), "r", encoding="utf-8") as f:
+                _resource_sizes = dict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            _resource_sizes = {}
+    return _resource_sizes
+
+
+def _save_resource_sizes():
+    import json
+
+    path = _resource_sizes_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_resource_sizes, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.debug(f"保存资源大小记录失败: {e}")
+
+
+def collect_resource_stats(driver):
+    """
+    从浏览器网络日志统计本账号的资源加载情况。
+    节省流量为估算值：按采样账号实际加载时记录的大小（encodedDataLength）计算，未采样到的资源计入 unmeasured。
+    采样账号的 blocked / saved_bytes 为"若拦截"时的请求数与流量。
+    :return: {"profile", "sampled", "blocked", "loaded_bytes", "saved_bytes", "unmeasured"}，未启用拦截或读取失败时返回 None
+    """
+    import json
+    from fnmatch import fnmatchcase
+
+    profile = get_resource_block_profile()
+    if profile == "off":
+        return None
+    try:
+        entries = driver.get_log("performance")
+    except Exception as e:
+        logger.debug(f"读取浏览器网络日志失败: {e}")
+        return None
+
+    sampling = getattr(driver, "_rainyun_resource_sampling", False)
+    # 所有档位的规则：加载成功的可拦截资源记录大小，供之后估算
+    blockable = set(pattern for patterns in RESOURCE_BLOCK_PROFILES.values() for pattern in patterns)
+    profile_patterns = RESOURCE_BLOCK_PROFILES[profile]
+    urls = {}
+    blocked_urls = []
+    loaded_bytes = 0
+    learned = {}
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        method = message.get("method")
+        params = message.get("params") or {}
+        if method == "Network.requestWillBeSent":
+            urls[params.get("requestId")] = params.get("request", {}).get("url", "")
+        elif method == "Network.loadingFinished":
+            size = int(params.get("encodedDataLength") or 0)
+            loaded_bytes += size
+            url = urls.get(params.get("requestId"), "")
+            if size and any(fnmatchcase(url, pattern) for pattern in blockable):
+                learned[url.split("?", 1)[0]] = size
+                if sampling and any(fnmatchcase(url, pattern) for pattern in profile_patterns):
+                    blocked_urls.append(url)
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            blocked_urls.append(urls.get(params.get("requestId"), ""))
+
+    saved_bytes = 0
+    unmeasured = 0
+    with _resource_sizes_lock:
+        sizes = _load_resource_sizes()
+        if learned:
+            sizes.update(learned)
+        for url in blocked_urls:
+            size = sizes.get(url.split("?", 1)[0])
+            if size:
+                saved_bytes += size
+            else:
+                unmeasured += 1
+        if learned:
+            while len(sizes) > RESOURCE_SIZE_CACHE_MAX:
+                sizes.pop(next(iter(sizes)))
+            _save_resource_sizes()
+
+    return {
+        "profile": profile,
+        "sampled": sampling,
+        "blocked": len(blocked_urls),
+        "loaded_bytes": loaded_bytes,
+        "saved_bytes": saved_bytes,
+        "unmeasured": unmeasured,
+    }
+
+
+def quit_driver(driver, log=None):
+    """关闭 WebDriver，并强制清理 ChromeDriver 及其衍生的 Chrome 进程"""
+    import subprocess
+
+    log = log or logger
+    try:
+        log.info("正在关闭 WebDriver...")
+
+        # 首先尝试正常关闭
+        try:
+            driver.quit()
+            log.info("WebDriver 已安全关闭")
+        except Exception as e:
+            log.error(f"关闭 WebDriver 时出错: {e}")
+
+        # 等待 ChromeDriver 进程自行退出（进程结束即返回，替代固定等待）
+        process = getattr(getattr(driver, 'service', None), 'process', None)
+        if process is not None:
+            start = time.perf_counter()
+            try:
+                process.wait(timeout=get_wait_ceiling("teardown"))
+            except subprocess.TimeoutExpired:
+                pass
+            wait_stats.record("teardown", 1.0, time.perf_counter() - start, process.poll() is not None)
+
+        # 强制终止 ChromeDriver 进程及其子进程
+        try:
+            if hasattr(driver, 'service') and driver.service.process:
+                process = driver.service.process
+                pid = process.pid
+
+                # 1. 先尝试杀掉该 ChromeDriver 衍生的子进程 (Chrome 浏览器)
+                # 避免僵尸 Chrome 进程残留
+                if os.name == 'posix' and pid:
+                    try:
+                        # pkill -P <pid> 仅杀掉指定父进程的子进程
+                        log.info(f"正在清理 PID {pid} 的衍生进程...")
+                        subprocess.run(['pkill', '-9', '-P', str(pid)],
+                                     stderr=subprocess.DEVNULL)
+                    except Exception:
+                        pass
+
+                # 2. 再杀掉 ChromeDriver 本身
+                if process.poll() is None:  # 进程仍在运行
+                    process.terminate()
+                    try:
+                        process.wait(timeout=2)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                        process.wait()
+                    log.info(f"已终止 ChromeDriver 进程 (PID: {pid})")
+        except Exception as e:
+            log.debug(f"清理 ChromeDriver 进程时出错: {e}")
+    except Exception as e:
+        log.error(f"WebDriver 清理过程出现异常: {e}")
+
+
+class BrowserPool:
+    """
+    浏览器池：按 (代理, User-Agent) 复用已启动的 Chrome/ChromeDriver，避免每个账号冷启动一次浏览器。
+    - 归还时换新标签页、清空 Cookie/站点存储并移除上个账号注入的脚本，下一个账号拿到的是干净会话
+    - 单个浏览器使用次数达到上限、重置失败或失去响应时直接回收，下次按需重建
+    - 空闲浏览器总数受 max_idle 限制，超出时关闭最早归还的浏览器
+    """
+    # 复用前需要清空存储的站点（Cookie 统一由 Network.clearBrowserCookies 清理）
+    RESET_ORIGINS = (
+        "https://app.rainyun.com",
+        "https://api.v2.rainyun.com",
+        "https://turing.captcha.qcloud.com",
+    )
+
+    def __init__(self, max_idle=3, max_uses=10):
+        self.max_idle = max(0, int(max_idle))
+        self.max_uses = max(1, int(max_uses))
+        self._lock = threading.Lock()
+        self._idle = []  # [(key, driver)]，按归还顺序排列
+        self.hits = 0
+        self.misses = 0
+        self.recycled = 0
+
+    @staticmethod
+    def make_key(account_id, proxy=None):
+        """浏览器启动参数中只有代理和 User-Agent 与账号相关，二者相同即可复用"""
+        return (proxy or "", get_random_user_agent(account_id))
+
+    def acquire(self, account_id, proxy=None, log=None):
+        """获取一个可用的浏览器：优先复用同 key 的空闲浏览器，否则冷启动"""
+        log = log or logger
+        key = self.make_key(account_id, proxy)
+        while True:
+            driver = None
+            with self._lock:
+                for i in range(len(self._idle) - 1, -1, -1):
+                    if self._idle[i][0] == key:
+                        driver = self._idle.pop(i)[1]
+                        break
+            if driver is None:
+                break
+            if self._is_alive(driver):
+                with self._lock:
+                    self.hits += 1
+                log.info(f"浏览器池命中，复用已启动的浏览器（第 {driver._rainyun_uses + 1} 次使用）")
+                return driver
+            log.warning("浏览器池中的浏览器已失去响应，回收后重新获取")
+            self._recycle(driver, log)
+
+        with self._lock:
+            self.misses += 1
+        driver = init_selenium(account_id, proxy=proxy)
+        driver._rainyun_pool_key = key
+        driver._rainyun_uses = 0
+        driver._rainyun_script_ids = []
+        return driver
+
+    def release(self, driver, log=None):
+        """归还浏览器：重置会话后放回池中，无法复用时直接关闭"""
+        log = log or logger
+        driver._rainyun_uses = getattr(driver, "_rainyun_uses", 0) + 1
+        key = getattr(driver, "_rainyun_pool_key", None)
+
+        if key is None or self.max_idle <= 0:
+            quit_driver(driver, log)
+            return
+        if driver._rainyun_uses >= self.max_uses:
+            log.info(f"浏览器已使用 {driver._rainyun_uses} 次，达到上限，回收")
+            self._recycle(driver, log)
+            return
+        if not self._reset(driver, log):
+            log.warning("浏览器会话重置失败（可能已崩溃），回收")
+            self._recycle(driver, log)
+            return
+
+        evicted = []
+        with self._lock:
+            self._idle.append((key, driver))
+            while len(self._idle) > self.max_idle:
+                evicted.append(self._idle.pop(0)[1])
+        for old_driver in evicted:
+            self._recycle(old_driver, log)
+        log.info("浏览器已重置并放回浏览器池")
+
+    def discard_proxy(self, proxy, log=None):
+        """关闭使用指定代理的所有空闲浏览器（代理被判定失败后不应再被复用）"""
+        if not proxy:
+            return
+        with self._lock:
+            matched = [driver for key, driver in self._idle if key[0] == proxy]
+            self._idle = [(key, driver) for key, driver in self._idle if key[0] != proxy]
+        for driver in matched:
+            self._recycle(driver, log)
+
+    def shutdown(self, log=None):
+        """关闭池中所有空闲浏览器"""
+        with self._lock:
+            drivers = [driver for _, driver in self._idle]
+            self._idle = []
+        for driver in drivers:
+            quit_driver(driver, log)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "recycled": self.recycled,
+                "idle": len(self._idle),
+            }
+
+    def _recycle(self, driver, log=None):
+        with self._lock:
+            self.recycled += 1
+        quit_driver(driver, log)
+
+    @staticmethod
+    def _is_alive(driver):
+        try:
+            return bool(driver.window_handles)
+        except Exception:
+            return False
+
+    def _reset(self, driver, log):
+        try:
+            driver.switch_to.default_content()
+            # 换一个全新的标签页，丢弃旧页面的 sessionStorage、内存状态和残留弹窗
+            old_handles = list(driver.window_handles)
+            driver.switch_to.new_window('tab')
+            new_handle = driver.current_window_handle
+            for handle in old_handles:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(new_handle)
+
+            for identifier in getattr(driver, "_rainyun_script_ids", []):
+                try:
+                    driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {
+                        "identifier": identifier
+                    })
+                except Exception:
+                    pass
+            driver._rainyun_script_ids = []
+
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in self.RESET_ORIGINS:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                    "origin": origin,
+                    "storageTypes": "local_storage,indexeddb,websql,service_workers,cache_storage",
+                })
+            driver.implicitly_wait(0)
+            return True
+        except Exception as e:
+            log.debug(f"重置浏览器会话失败: {e}")
+            return False
+
+
+def create_browser_pool(max_workers):
+    """根据环境变量创建浏览器池，BROWSER_POOL_SIZE=0 时禁用（每个账号独立冷启动浏览器）"""
+    pool_size = int(os.getenv("BROWSER_POOL_SIZE", str(max_workers)))
+    if pool_size <= 0:
+        return None
+    max_uses = int(os.getenv("BROWSER_POOL_MAX_USES", "10"))
+    logger.info(f"已启用浏览器池（最多空闲 {pool_size} 个，单个浏览器最多复用 {max_uses} 次）")
+    return BrowserPool(max_idle=pool_size, max_uses=max_uses)
+
+
+def download_image(url, user_agent=None):
+    """
+    下载图片并直接返回原始字节（不落盘）
+    :return: 图片字节，失败返回 None
+    """
+    headers = {}
+    if user_agent:
+        headers['User-Agent'] = user_agent
+        
+    try:
+        response = get_http_client().get(url, headers=headers, timeout=10)
+        if response.status_code == 200:
+            return response.content
+        else:
+            logger.error(f"下载图片失败！状态码: {response.status_code}")
+            return None
+    except Exception as e:
+        logger.error(f"下载图片异常: {e}")
+        return None
+
+
+# 在页面（当前 frame）内读取资源：优先命中浏览器 HTTP 缓存，走与页面相同的代理与连接
+_FETCH_RESOURCE_SCRIPT = """
+const url = arguments[0];
+const done = arguments[arguments.length - 1];
+const controller = new AbortController();
+const timer = setTimeout(() => controller.abort(), arguments[1]);
+fetch(url, {cache: 'force-cache', credentials: 'include', signal: controller.signal})
+    .then(resp => resp.ok ? resp.blob() : Promise.reject(resp.status))
+    .then(blob => {
+        const reader = new FileReader();
+        reader.onload = () => done(String(reader.result).split(',', 2)[1] || null);
+        reader.onerror = () => done(null);
+        reader.readAsDataURL(blob);
+    })
+    .catch(() => done(null))
+    .finally(() => clearTimeout(timer));
+"""
+
+
+def _find_frame_resource(frame_tree, url):
+    """在 Page.getResourceTree 返回的 frame 树中查找资源所在的 frameId"""
+    for resource in frame_tree.get("resources", []):
+        if resource.get("url") == url:
+            return frame_tree["frame"]["id"]
+    for child in frame_tree.get("childFrames", []):
+        frame_id = _find_frame_resource(child, url)
+        if frame_id:
+            return frame_id
+    return None
+
+
+def fetch_browser_resource(driver, url, timeout=5, log=None):
+    """
+    直接从浏览器取回已加载资源的字节，不额外发起网络请求：
+    1. CDP Page.getResourceContent（资源已在页面资源树中，零网络往返）
+    2. 在当前 frame 内 fetch（force-cache，命中 HTTP 缓存；未命中时也经由浏览器的代理）
+    :param timeout: 页面内 fetch 的超时时间（秒）
+    :return: 资源字节，均失败时返回 None
+    """
+    import base64
+
+    log = log or logger
+    try:
+        tree = driver.execute_cdp_cmd("Page.getResourceTree", {})
+        frame_id = _find_frame_resource(tree.get("frameTree", {}), url)
+        if frame_id:
+            content = driver.execute_cdp_cmd("Page.getResourceContent", {"frameId": frame_id, "url": url})
+            data = content.get("content") or ""
+            if data:
+                log.debug("验证码图片来源: CDP 资源缓存")
+                return base64.b64decode(data) if content.get("base64Encoded") else data.encode("latin-1")
+    except Exception as e:
+        log.debug(f"CDP 读取资源失败: {e}")
+
+    try:
+        data = driver.execute_async_script(_FETCH_RESOURCE_SCRIPT, url, int(timeout * 1000))
+        if data:
+            log.debug("验证码图片来源: 页面内 fetch")
+            return base64.b64decode(data)
+    except Exception as e:
+        log.debug(f"页面内 fetch 资源失败: {e}")
+    return None
+
+
+def get_url_from_style(style):
+    import re
+    return re.search(r'url\(["\']?(.*?)["\']?\)', style).group(1)
+
+
+def get_width_from_style(style):
+    import re
+    return re.search(r'width:\s*([\d.]+)px', style).group(1)
+
+
+def get_height_from_style(style):
+    import re
+    return re.search(r'height:\s*([\d.]+)px', style).group(1)
 
 
 
@@ -1897,9 +3687,6 @@ def get_height_from_style(style):
 _ocr_model = None
 _det_model = None
 _model_lock = threading.Lock()
-# 推理锁，防止多线程同时调用模型导致内部状态冲突
-_inference_lock = threading.Lock()
-
 def get_shared_ocr_models():
     """获取全局共享的 OCR 模型实例 (线程安全)"""
     global _ocr_model, _det_model
@@ -1913,6 +3700,504 @@ def get_shared_ocr_models():
                 _det_model = ddddocr.DdddOcr(det=True, show_ad=False)
     return _ocr_model, _det_model
 
+
+class OcrService:
+    """
+    OCR / 目标检测推理服务，替代全局推理锁。
+    OCR 模型按需扩容为一个小型实例池（首个实例即全局共享模型），每次调用租用一个实例，
+    并发求解的多个账号不再排队等同一把锁；检测模型仍为单实例，使用独立的锁。
+    ddddocr 本身不支持真正的批量推理，classify_batch 在一次租用内依次识别多张图，
+    图片编码在租用之外完成，从而缩短持有实例的时间。
+    """
+
+    def __init__(self, pool_size=2):
+        import queue
+
+        self.pool_size = max(1, pool_size)
+        self._idle = queue.Queue()
+        self._created = 0
+        self._create_lock = threading.Lock()
+        self._det_lock = threading.Lock()
+
+    def _lease(self):
+        """租用一个 OCR 实例，返回 (模型, 排队等待秒数)"""
+        import queue
+
+        try:
+            return self._idle.get_nowait(), 0.0
+        except queue.Empty:
+            pass
+
+        with self._create_lock:
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+                index = self._created
+        if create:
+            try:
+                if index == 1:
+                    ocr, _ = get_shared_ocr_models()
+                    return ocr, 0.0
+                import ddddocr
+                logger.info(f"OCR 推理存在并发等待，加载第 {index} 个 OCR 模型实例")
+                return ddddocr.DdddOcr(ocr=True, show_ad=False), 0.0
+            except Exception:
+                with self._create_lock:
+                    self._created -= 1
+                raise
+
+        start = time.monotonic()
+        model = self._idle.get()
+        return model, time.monotonic() - start
+
+    @staticmethod
+    def _record(stats, waited, images):
+        if stats is None:
+            return
+        stats['wait'] = stats.get('wait', 0.0) + waited
+        stats['calls'] = stats.get('calls', 0) + 1
+        stats['images'] = stats.get('images', 0) + images
+
+    def classify_batch(self, images, stats=None):
+        """
+        识别一批图片，返回与输入等长的文本列表（编码失败的图片结果为空字符串）
+        :param images: 图片字节或 NumPy 图像数组的列表
+        :param stats: 可选的统计字典，累加 wait（排队秒数）/calls/images
+        """
+        import cv2
+
+        payloads = []
+        for image in images:
+            if isinstance(image, (bytes, bytearray)):
+                payloads.append(bytes(image))
+                continue
+            success, encoded = cv2.imencode('.png', image)
+            payloads.append(encoded.tobytes() if success else None)
+
+        model, waited = self._lease()
+        try:
+            results = [
+                (model.classification(payload) or "").strip() if payload else ""
+                for payload in payloads
+            ]
+        finally:
+            self._idle.put(model)
+        self._record(stats, waited, len(payloads))
+        return results
+
+    def classify(self, image, stats=None):
+        return self.classify_batch([image], stats=stats)[0]
+
+    def detect(self, image_bytes, stats=None):
+        """目标检测，返回候选框列表"""
+        _, det = get_shared_ocr_models()
+        start = time.monotonic()
+        with self._det_lock:
+            waited = time.monotonic() - start
+            bboxes = det.detection(image_bytes)
+        self._record(stats, waited, 1)
+        return bboxes
+
+
+_ocr_service = None
+_ocr_service_lock = threading.Lock()
+
+
+def get_ocr_service():
+    """获取全局 OCR 推理服务（实例池大小由 OCR_POOL_SIZE 控制，默认 2）"""
+    global _ocr_service
+    if _ocr_service is None:
+        with _ocr_service_lock:
+            if _ocr_service is None:
+                _ocr_service = OcrService(pool_size=int(os.getenv("OCR_POOL_SIZE", "2")))
+    return _ocr_service
+
+# ==========================================
+# Captcha Worker Process
+# ==========================================
+
+class _CollectingHandler(logging.Handler):
+    """子进程中收集日志记录，随求解结果一并返回父进程输出"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+
+_captcha_worker_provider = None
+
+
+def _captcha_worker_init():
+    """验证码子进程初始化：每个进程只加载一次 ddddocr 模型"""
+    global _captcha_worker_provider
+    # 子进程内同一时刻只求解一个验证码，无需额外的 OCR 实例
+    os.environ["OCR_POOL_SIZE"] = "1"
+    get_shared_ocr_models()
+    _captcha_worker_provider = TencentCaptchaProvider()
+
+
+def _solve_captcha_in_worker(captcha_bytes, sprite_bytes, prefix):
+    """
+    在子进程中求解验证码
+    :return: (可序列化的求解结果, 日志记录列表)
+    """
+    handler = _CollectingHandler()
+    worker_logger = logging.getLogger(f"{__name__}.captcha_worker")
+    worker_logger.propagate = False
+    worker_logger.setLevel(logging.DEBUG)
+    worker_logger.addHandler(handler)
+    try:
+        provider = _captcha_worker_provider or TencentCaptchaProvider()
+        # 不在子进程中添加前缀，由父进程回放时通过账号日志适配器统一添加
+        solution = provider.solve_offline(
+            captcha_bytes, sprite_bytes, logging.LoggerAdapter(worker_logger, {'prefix': prefix}), keep_artifacts=True
+        )
+    finally:
+        worker_logger.removeHandler(handler)
+    # 闭包无法跨进程传递：原图由父进程自行解码，次优方案只传回原始候选，
+    # 只有首选方案提交失败时才由父进程计算坐标
+    solution.pop("captcha", None)
+    runner_up = solution.pop("runner_up", None)
+    runner_up_raw = solution.pop("runner_up_raw", None)
+    if runner_up is not None:
+        primary_total, ranked, _ = runner_up
+        solution["runner_up"] = (primary_total, {"total": ranked["total"]}, runner_up_raw)
+    return solution, handler.records
+
+
+_captcha_process_pool = None
+_captcha_process_pool_lock = threading.Lock()
+
+
+def get_captcha_worker_mode():
+    """验证码求解方式：thread（默认，在签到线程内求解）/ process（在独立子进程中求解，跨 CPU 核并行）"""
+    mode = os.getenv("CAPTCHA_WORKER_MODE", "thread").strip().lower()
+    return mode if mode in ("thread", "process") else "thread"
+
+
+def get_captcha_process_pool():
+    """获取全局验证码求解进程池（进程数由 CAPTCHA_WORKERS 控制，默认等于 MAX_WORKERS 与 CPU 核数的较小值）"""
+    global _captcha_process_pool
+    if _captcha_process_pool is None:
+        with _captcha_process_pool_lock:
+            if _captcha_process_pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                default_workers = min(int(os.getenv("MAX_WORKERS", "3")), os.cpu_count() or 1)
+                workers = max(1, int(os.getenv("CAPTCHA_WORKERS", str(default_workers))))
+                logger.info(f"启动验证码求解进程池（{workers} 个进程）")
+                # spawn：避免 fork 继承浏览器线程与锁的状态
+                _captcha_process_pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_captcha_worker_init,
+                )
+    return _captcha_process_pool
+
+
+def discard_captcha_process_pool(pool, log=None):
+    """
+    丢弃已损坏（BrokenProcessPool）或有子进程卡死的进程池，下次求解时重新创建。
+    仍在运行的子进程被强制结束，避免卡死的求解一直占用进程名额。
+    :param pool: 出问题的进程池；全局进程池已被其他线程替换时不影响新的进程池
+    """
+    global _captcha_process_pool
+    with _captcha_process_pool_lock:
+        if _captcha_process_pool is pool:
+            _captcha_process_pool = None
+    (log or logger).warning("验证码求解进程池异常，已丢弃，下次求解时重新创建")
+    pool.shutdown(wait=False, cancel_futures=True)
+    kill_workers = getattr(pool, "kill_workers", None)
+    if kill_workers is not None:
+        try:
+            kill_workers()
+        except Exception:
+            pass
+        return
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        try:
+            process.kill()
+        except Exception:
+            pass
+
+
+def shutdown_captcha_process_pool():
+    """关闭验证码求解进程池，释放子进程中的模型内存"""
+    global _captcha_process_pool
+    with _captcha_process_pool_lock:
+        pool, _captcha_process_pool = _captcha_process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ==========================================
+# Captcha Assignment
+# ==========================================
+
+def linear_sum_assignment_max(matrix):
+    """
+    匈牙利算法（带势函数的 O(n²m) 实现），求行数 ≤ 列数的矩阵上的最大权匹配
+    :param matrix: 二维列表，None 表示该行不能选该列
+    :return: (每行所选列下标列表, 总分)；无可行解时返回 (None, float('-inf'))
+    """
+    n = len(matrix)
+    if n == 0:
+        return [], 0.0
+    m = len(matrix[0])
+    if m < n:
+        return None, float('-inf')
+
+    forbidden = 1e9
+    finite = [value for row in matrix for value in row if value is not None]
+    offset = max(finite) if finite else 0.0
+    # 转为最小化代价，禁选位置给一个远大于任何合法代价的值
+    cost = [[(offset - value) if value is not None else forbidden for value in row] for row in matrix]
+
+    inf = float('inf')
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    match = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if used[j]:
+                    continue
+                cur = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                if cur < minv[j]:
+                    minv[j] = cur
+                    way[j] = j0
+                if minv[j] < delta:
+                    delta = minv[j]
+                    j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    assignment = [0] * n
+    for j in range(1, m + 1):
+        if match[j]:
+            assignment[match[j] - 1] = j - 1
+    if any(matrix[i][assignment[i]] is None for i in range(n)):
+        return None, float('-inf')
+    return assignment, sum(matrix[i][assignment[i]] for i in range(n))
+
+
+def rank_assignments(option_rows, top_k=2, min_distance=0):
+    """
+    目标分配求解：每行（一个待点击图案）从各自的候选中选一个，
+    同一列（同一个检测框）不能被两行同时选中，带坐标的候选之间距离不得小于 min_distance。
+    以匈牙利算法求得的无距离约束最优解作为上界做分支定界，返回前 top_k 个方案。
+    :param option_rows: 每行一个候选列表，候选为 dict，含 score，可选 column（列标识）与 coords
+    :return: 按总分降序的方案列表，每项 {"options": [...], "total": 总分, "margin": 与下一名的分差}
+    """
+    import heapq
+    import math
+
+    if not option_rows or any(not options for options in option_rows):
+        return []
+
+    rows = [sorted(options, key=lambda option: option["score"], reverse=True) for options in option_rows]
+    row_count = len(rows)
+
+    def column_of(row_index, option_index, option):
+        column = option.get("column")
+        return ("row", row_index, option_index) if column is None else column
+
+    def upper_bound(start, used_columns):
+        """剩余行在忽略距离约束时的最优分配得分（松弛上界）"""
+        remaining = range(start, row_count)
+        columns = []
+        for row_index in remaining:
+            for option_index, option in enumerate(rows[row_index]):
+                column = column_of(row_index, option_index, option)
+                if column not in used_columns and column not in columns:
+                    columns.append(column)
+        if not columns and start < row_count:
+            return float('-inf')
+        column_index = {column: idx for idx, column in enumerate(columns)}
+        matrix = []
+        for row_index in remaining:
+            row = [None] * len(columns)
+            for option_index, option in enumerate(rows[row_index]):
+                column = column_of(row_index, option_index, option)
+                if column in column_index:
+                    idx = column_index[column]
+                    if row[idx] is None or option["score"] > row[idx]:
+                        row[idx] = option["score"]
+            matrix.append(row)
+        _, total = linear_sum_assignment_max(matrix)
+        return total
+
+    best = []  # 小顶堆：(总分, 序号, 方案)
+    counter = [0]
+
+    def search(row_index, chosen, used_columns, partial):
+        if row_index == row_count:
+            counter[0] += 1
+            entry = (partial, -counter[0], list(chosen))
+            if len(best) < top_k:
+                heapq.heappush(best, entry)
+            elif partial > best[0][0]:
+                heapq.heapreplace(best, entry)
+            return
+
+        bound = partial + upper_bound(row_index, used_columns)
+        if len(best) >= top_k and bound <= best[0][0]:
+            return
+
+        for option_index, option in enumerate(rows[row_index]):
+            column = column_of(row_index, option_index, option)
+            if column in used_columns:
+                continue
+            coords = option.get("coords")
+            if min_distance and coords is not None and any(
+                other.get("coords") is not None and math.dist(coords, other["coords"]) < min_distance
+                for other in chosen
+            ):
+                continue
+            chosen.append(option)
+            used_columns.add(column)
+            search(row_index + 1, chosen, used_columns, partial + option["score"])
+            used_columns.discard(column)
+            chosen.pop()
+
+    search(0, [], set(), 0.0)
+
+    ranked = sorted(best, key=lambda entry: (entry[0], entry[1]), reverse=True)
+    results = []
+    for idx, (total, _, options) in enumerate(ranked):
+        margin = total - ranked[idx + 1][0] if idx + 1 < len(ranked) else None
+        results.append({"options": options, "total": total, "margin": margin})
+    return results
+
+
+class CaptchaWorkspace:
+    """
+    单次验证码求解的内存工作区，按账号 + 尝试次数隔离。
+    下载的原始图片字节、切分后的图块和检测裁剪都以内存对象保存，全流程不再读写磁盘，
+    只有在需要保存调试样本时才编码落盘；多账号并发求解时也不会互相覆盖。
+    """
+
+    def __init__(self, account_name, attempt):
+        self.account_name = account_name
+        self.attempt = attempt
+        self._artifacts = {}
+
+    def put(self, name, data):
+        """登记一个产物：bytes（原始图片）或 NumPy 图像数组"""
+        if data is not None:
+            self._artifacts[name] = data
+        return data
+
+    def get(self, name):
+        return self._artifacts.get(name)
+
+    def list_files(self):
+        return sorted(self._artifacts)
+
+    def write_to(self, target_dir):
+        """将产物写入目录（仅用于调试样本），返回成功写入的文件名列表"""
+        import cv2
+
+        written = []
+        for name in self.list_files():
+            data = self._artifacts[name]
+            path = os.path.join(target_dir, name)
+            try:
+                if isinstance(data, (bytes, bytearray)):
+                    with open(path, "wb") as f:
+                        f.write(data)
+                elif not cv2.imwrite(path, data):
+                    continue
+            except Exception:
+                continue
+            written.append(name)
+        return written
+
+    def cleanup(self):
+        self._artifacts.clear()
+
+
+class CaptchaFeatureCache:
+    """
+    单次求解内的图像特征缓存，以图像对象身份（id）为键。
+    同一个图块要与多个候选逐一比较、在降级阶段和连通域各阈值下还会再比较，
+    Otsu 掩码、前景度量、5 变体 OCR 结果和 SIFT 描述子都只需计算一次。
+    缓存会持有图像引用，保证求解期间 id 不会被其它对象复用。
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._pinned = {}
+        self._crops = {}
+        self._sift = None
+        self.hits = {}
+        self.misses = {}
+
+    def get_or_compute(self, kind, image, compute, *params):
+        if image is None:
+            return compute()
+        key = (kind, id(image)) + params
+        if key in self._entries:
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+            return self._entries[key]
+        value = compute()
+        self._entries[key] = value
+        self._pinned[id(image)] = image
+        self.misses[kind] = self.misses.get(kind, 0) + 1
+        return value
+
+    def crop(self, image, top, bottom, left, right):
+        """同一区域返回同一个裁剪视图，使不同阈值下重复出现的连通域共享特征缓存"""
+        key = (id(image), top, bottom, left, right)
+        cropped = self._crops.get(key)
+        if cropped is None:
+            cropped = image[top:bottom, left:right]
+            self._crops[key] = cropped
+            self._pinned[id(image)] = image
+        return cropped
+
+    def sift(self):
+        import cv2
+
+        if self._sift is None:
+            self._sift = cv2.SIFT_create(nfeatures=500, contrastThreshold=0.02, edgeThreshold=15)
+        return self._sift
+
+    def summary(self):
+        kinds = sorted(set(self.hits) | set(self.misses))
+        detail = ", ".join(f"{kind} {self.hits.get(kind, 0)}/{self.misses.get(kind, 0)}" for kind in kinds)
+        return (
+            f"命中 {sum(self.hits.values())} 次 / 计算 {sum(self.misses.values())} 次"
+            + (f"（命中/计算: {detail}）" if detail else "")
+        )
+
+
 class CaptchaProvider:
     """验证码提供者基类"""
     def solve(self, driver, timeout, retry_stats, logger_adapter):
@@ -1922,6 +4207,7 @@ class CaptchaProvider:
         :param timeout: 超时时间
         :param retry_stats: 重试统计字典 {'count': 0}
         :param logger_adapter: 日志记录器
+        :return: 验证码是否已通过（未检测到需要处理的验证码时视为通过）
         """
         raise NotImplementedError
 
@@ -1935,275 +4221,599 @@ class TencentCaptchaProvider(CaptchaProvider):
         WebDriverWait = modules['WebDriverWait']
         EC = modules['EC']
         By = modules['By']
-        ActionChains = modules['ActionChains']
         TimeoutException = modules['TimeoutException']
         
         if retry_stats is None:
             retry_stats = {'count': 0}
             
+        workspace = None
         try:
             wait = WebDriverWait(driver, min(timeout, 3))
             try:
                 wait.until(EC.presence_of_element_located((By.ID, "slideBg")))
             except TimeoutException:
                 logger_adapter.info("未检测到可处理验证码内容，跳过验证码处理")
-                return
+                return True
 
-            # 延迟导入，只在需要时加载
-            import cv2
-            
-            # 使用全局单例模型，避免重复加载导致 OOM
-            ocr, det = get_shared_ocr_models()
-            
             wait = WebDriverWait(driver, timeout)
-            self._download_captcha_img(driver, timeout, logger_adapter)
+            workspace = self._new_workspace(logger_adapter, retry_stats['count'])
+            self._begin_attempt()
+            captcha_url = self._download_captcha_img(driver, timeout, logger_adapter, workspace)
             
-            logger_adapter.info("开始处理验证码图片并识别")
-            
-            # 分割待选图块（sprite.jpg）
-            import cv2
-            import numpy as np
-            raw_sprite = cv2.imread("temp/sprite.jpg")
-            if raw_sprite is not None:
-                w_raw = raw_sprite.shape[1]
-                for i in range(3):
-                    temp = raw_sprite[:, w_raw // 3 * i: w_raw // 3 * (i + 1)]
-                    cv2.imwrite(f"temp/sprite_{i + 1}.jpg", temp)
-            
-            captcha = cv2.imread("temp/captcha.jpg")
-            with open("temp/captcha.jpg", 'rb') as f:
-                captcha_b = f.read()
+            solution = self._solve_attempt(workspace, logger_adapter)
+            captcha = solution["captcha"]
+            final_click_positions = solution["positions"]
+            use_fallback = solution["used_fallback"]
+            best_total_score = solution["best_total_score"]
+            runner_up = solution["runner_up"]
+            if solution["rejected_stage"]:
+                self._save_captcha_debug_bundle(
+                    logger_adapter,
+                    workspace,
+                    stage=solution["rejected_stage"],
+                    retry_count=retry_stats['count'],
+                    extra={
+                        "fallback_total_score": solution["fallback_total_score"],
+                        "click_positions": solution["rejected_positions"],
+                    },
+                )
             
-            # 目标检测（使用推理锁）
-            with _inference_lock:
-                bboxes = det.detection(captcha_b)
+            # --- 执行点击动作 ---
+            if len(final_click_positions) == 3:
+                if self._click_and_submit(driver, wait, final_click_positions, captcha, logger_adapter):
+                    return True
+                logger_adapter.error(f"验证码提交后未通过，匹配坐标可能存在偏移。")
+                self._save_captcha_debug_bundle(
+                    logger_adapter,
+                    workspace,
+                    stage="submit_failed",
+                    retry_count=retry_stats['count'],
+                    extra={
+                        "click_positions": final_click_positions,
+                        "used_fallback": use_fallback,
+                        "best_total_score": best_total_score,
+                    },
+                )
+                # 首选与次优方案得分接近且题目未被更换时，直接提交次优方案，省去一次换图
+                if runner_up is not None and self._current_captcha_url(driver) == captcha_url:
+                    primary_total, ranked, resolve_positions = runner_up
+                    runner_up_positions = resolve_positions()
+                    logger_adapter.info(
+                        f"首选方案与次优方案分差仅 {primary_total - ranked['total']:.2f}，"
+                        f"题目未更换，改为提交次优方案 (总分 {ranked['total']:.2f})"
+                    )
+                    if len(runner_up_positions) == 3 and self._click_and_submit(
+                        driver, wait, runner_up_positions, captcha, logger_adapter
+                    ):
+                        return True
+                    logger_adapter.error("次优方案提交后仍未通过")
+                retry_stats['count'] += 1
+            else:
+                retry_stats['count'] += 1
             
-            # 提取候选框图片和坐标信息
-            spec_infos = []
-            for i in range(len(bboxes)):
-                x1, y1, x2, y2 = bboxes[i]
-                spec = captcha[y1:y2, x1:x2]
-                if not self._is_meaningful_candidate_crop(spec):
-                    logger_adapter.info(f"候选框 {i + 1} 前景过弱，判定为空白/噪声，跳过")
-                    continue
-                spec_path = f"temp/spec_{i + 1}.jpg"
-                cv2.imwrite(spec_path, spec)
-                pos = f"{int((x1 + x2) / 2)},{int((y1 + y2) / 2)}"
-                spec_infos.append({
-                    "path": spec_path,
-                    "pos": pos,
-                    "index": i,
-                    "bbox": (x1, y1, x2, y2),
-                })
-                
-            # --- 阶段 1: 基于目标检测 + OCR/SIFT 的全局分配 ---
-            best_assignment = None
-            best_total_score = -1.0
-            sprite_profiles = []
+            # 执行提早换图逻辑（先释放本次尝试的工作区，再递归进入下一次尝试）
+            self._finish_attempt(workspace, logger_adapter)
+            reload_btn = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="reload"]')))
+            self._reload_challenge(driver, reload_btn)
+            logger_adapter.info(f"重新发起验证码挑战 (当前重试: {retry_stats['count']})")
+            return self.solve(driver, timeout, retry_stats, logger_adapter)
             
-            if len(spec_infos) >= 3:
-                import itertools
-                score_matrix = []
-                for j in range(3):
-                    sprite_path = f"temp/sprite_{j + 1}.jpg"
-                    sprite_profile = self._build_sprite_profile(sprite_path, ocr)
-                    sprite_profiles.append(sprite_profile)
-                    sprite_scores = []
-                    for k, spec in enumerate(spec_infos):
-                        score, is_semantic = self._compute_score(
-                            sprite_path,
-                            spec["path"],
-                            ocr,
-                            sprite_profile=sprite_profile,
-                        )
-                        sprite_scores.append(score)
-                        logger_adapter.debug(f"目标 {j + 1} -> 候选 {k + 1}: 得分 {score:.2f} (语义匹配: {is_semantic})")
-                    score_matrix.append(sprite_scores)
-                
-                all_spec_indices = list(range(len(spec_infos)))
-                for perm in itertools.permutations(all_spec_indices, 3):
-                    total_score = score_matrix[0][perm[0]] + score_matrix[1][perm[1]] + score_matrix[2][perm[2]]
-                    if total_score > best_total_score:
-                        best_total_score = total_score
-                        best_assignment = perm
+        except TimeoutException:
+            logger_adapter.error("获取验证码图片等元素超时")
+            return False
+        except Exception as e:
+            logger_adapter.error(f"验证码执行流程中发生未知错误: {e}")
+            import traceback
+            logger_adapter.debug(traceback.format_exc())
+            # 如果发生错误，不妨尝试重试
+            retry_stats['count'] += 1
+            self._finish_attempt(workspace, logger_adapter)
+            try:
+                reload_btn = driver.find_element(By.XPATH, '//*[@id="reload"]')
+                self._reload_challenge(driver, reload_btn)
+                return self.solve(driver, timeout, retry_stats, logger_adapter)
+            except:
+                return False
+        finally:
+            self._finish_attempt(workspace, logger_adapter)
+            logger_adapter.debug("验证码单次处理周期完毕")
+
+    def _solve_attempt(self, workspace, logger_adapter):
+        """按 CAPTCHA_WORKER_MODE 在本线程或子进程中求解当前工作区的验证码"""
+        if get_captcha_worker_mode() == "process":
+            try:
+                return self._solve_in_process(workspace, logger_adapter)
+            except Exception as e:
+                logger_adapter.warning(f"验证码子进程求解失败，改为在本进程求解: {e}")
+        # 使用全局 OCR 推理服务（模型实例池），避免重复加载导致 OOM
+        return self.solve_images(workspace, get_ocr_service(), logger_adapter)
+
+    def _solve_in_process(self, workspace, logger_adapter):
+        """将验证码图片交给进程池求解，回放子进程日志并还原父进程需要的结果"""
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        from concurrent.futures.process import BrokenProcessPool
+
+        prefix = getattr(logger_adapter, "extra", {}).get("prefix", "captcha")
+        # 子进程首次求解需加载模型，超时上限需留出余量
+        timeout = float(os.getenv("CAPTCHA_WORKER_TIMEOUT", "60"))
+        pool = get_captcha_process_pool()
+        try:
+            future = pool.submit(
+                _solve_captcha_in_worker, workspace.get("captcha.jpg"), workspace.get("sprite.jpg"), prefix
+            )
+            solution, records = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            discard_captcha_process_pool(pool, logger_adapter)
+            raise TimeoutError(f"子进程求解超过 {timeout:.0f} 秒")
+        except BrokenProcessPool:
+            discard_captcha_process_pool(pool, logger_adapter)
+            raise
+        for level, message in records:
+            logger_adapter.log(level, message)
+        self._stage_timings = dict(solution.get("timings", {}))
+        # 子进程的图块与检测裁剪放回本地工作区，调试样本与线程模式保持一致
+        for name, data in solution.pop("artifacts", {}).items():
+            if workspace.get(name) is None:
+                workspace.put(name, data)
+        captcha = self._decode_image(workspace.get("captcha.jpg"))
+        solution["captcha"] = captcha
+        runner_up = solution.get("runner_up")
+        if runner_up is not None:
+            primary_total, ranked, raw = runner_up
+            sprite_imgs = [workspace.get(f"sprite_{j + 1}.jpg") for j in range(3)]
+            solution["runner_up"] = (
+                primary_total,
+                ranked,
+                lambda: self._resolve_runner_up(raw, sprite_imgs, captcha, logger_adapter),
+            )
+        return solution
+
+    def _resolve_runner_up(self, raw, sprite_imgs, captcha, logger_adapter):
+        """根据子进程传回的原始候选（solve_images 的 runner_up_raw）计算次优方案的点击坐标"""
+        if "positions" in raw:
+            return raw["positions"]
+        return self._resolve_assignment_positions(
+            raw["assignment"], raw["spec_infos"], raw["score_matrix"], raw["sprite_profiles"],
+            sprite_imgs, captcha, logger_adapter,
+        )
+
+    def solve_offline(self, captcha_bytes, sprite_bytes, logger_adapter, keep_artifacts=False):
+        """
+        离线求解（基准测试与子进程求解用）：直接使用已保存的图片字节，不打开浏览器、不提交
+        :param keep_artifacts: 是否在结果的 artifacts 中附带工作区产物（图块与检测裁剪，供保存调试样本）
+        :return: solve_images 的结果，附加 timings（各阶段耗时，秒）与 elapsed（总耗时，秒）
+        """
+        workspace = self._new_workspace(logger_adapter, 0)
+        workspace.put("captcha.jpg", captcha_bytes)
+        workspace.put("sprite.jpg", sprite_bytes)
+        self._begin_attempt()
+        start = time.perf_counter()
+        try:
+            solution = self.solve_images(workspace, get_ocr_service(), logger_adapter)
+            solution["elapsed"] = time.perf_counter() - start
+            solution["timings"] = dict(self._stage_timings)
+            if keep_artifacts:
+                solution["artifacts"] = {
+                    name: workspace.get(name) for name in workspace.list_files()
+                    if name not in ("captcha.jpg", "sprite.jpg")
+                }
+            return solution
+        finally:
+            self._finish_attempt(workspace, logger_adapter)
+
+    def _begin_attempt(self):
+        """开始一次求解尝试：重置特征缓存、推理排队统计与阶段耗时"""
+        self._feature_cache = CaptchaFeatureCache()
+        self._ocr_stats = {}
+        self._stage_timings = {}
+
+    def _add_timing(self, stage, start):
+        timings = getattr(self, "_stage_timings", None)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+    def _features(self):
+        """当前求解尝试的特征缓存（未在 solve 中调用时按需创建）"""
+        cache = getattr(self, "_feature_cache", None)
+        if cache is None:
+            cache = CaptchaFeatureCache()
+            self._feature_cache = cache
+        return cache
+
+    def _finish_attempt(self, workspace, logger_adapter):
+        """结束一次求解尝试：释放工作区并输出特征缓存命中统计（可重复调用）"""
+        if workspace is not None:
+            workspace.cleanup()
+        cache = getattr(self, "_feature_cache", None)
+        if cache is not None:
+            logger_adapter.debug(f"验证码特征缓存: {cache.summary()}")
+            self._feature_cache = None
+        ocr_stats = getattr(self, "_ocr_stats", None)
+        if ocr_stats:
+            logger_adapter.info(
+                f"本次验证码推理排队等待 {ocr_stats.get('wait', 0.0):.3f} 秒"
+                f"（{ocr_stats.get('calls', 0)} 次调用 / {ocr_stats.get('images', 0)} 张图）"
+            )
+            self._ocr_stats = None
+        timings = getattr(self, "_stage_timings", None)
+        if timings:
+            logger_adapter.debug(
+                "验证码阶段耗时: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in timings.items())
+            )
+            self._stage_timings = None
+
+    def _new_workspace(self, logger_adapter, retry_count):
+        """为本次求解创建独立的内存工作区（账号 + 尝试次数）"""
+        account_name = self._make_safe_name(getattr(logger_adapter, "extra", {}).get("prefix", "unknown"))
+        return CaptchaWorkspace(account_name, retry_count)
+
+    def solve_images(self, workspace, ocr, logger_adapter):
+        """
+        不依赖浏览器的求解核心：从工作区读取 captcha.jpg / sprite.jpg，完成检测、分配与降级搜索。
+        :return: 结果字典，positions 为 3 个点击坐标（"x,y"，原图像素），为空表示放弃提交；
+                 rejected_stage 非空时表示因得分过低被拒绝的阶段，runner_up 为接近平局时的次优方案
+        """
+        logger_adapter.info("开始处理验证码图片并识别")
+        
+        # 分割待选图块（sprite.jpg），原始字节只解码一次
+        import cv2
+        import numpy as np
+        captcha_b = workspace.get("captcha.jpg")
+        sprite_b = workspace.get("sprite.jpg")
+        captcha = self._decode_image(captcha_b)
+        raw_sprite = self._decode_image(sprite_b)
+        sprite_imgs = [None, None, None]
+        if raw_sprite is not None:
+            w_raw = raw_sprite.shape[1]
+            for i in range(3):
+                sprite_imgs[i] = workspace.put(
+                    f"sprite_{i + 1}.jpg",
+                    np.ascontiguousarray(raw_sprite[:, w_raw // 3 * i: w_raw // 3 * (i + 1)]),
+                )
+        if captcha is None or not captcha_b:
+            raise ValueError("验证码背景图下载或解码失败")
+        
+        # 目标检测（检测模型单实例，由推理服务加锁）
+        start = time.perf_counter()
+        bboxes = ocr.detect(captcha_b, stats=self._ocr_stats)
+        self._add_timing("detection", start)
+        
+        # 提取候选框图片和坐标信息
+        spec_infos = []
+        for i in range(len(bboxes)):
+            x1, y1, x2, y2 = bboxes[i]
+            spec = np.ascontiguousarray(captcha[y1:y2, x1:x2])
+            if not self._is_meaningful_candidate_crop(spec):
+                logger_adapter.info(f"候选框 {i + 1} 前景过弱，判定为空白/噪声，跳过")
+                continue
+            workspace.put(f"spec_{i + 1}.jpg", spec)
+            pos = f"{int((x1 + x2) / 2)},{int((y1 + y2) / 2)}"
+            spec_infos.append({
+                "image": spec,
+                "pos": pos,
+                "index": i,
+                "bbox": (x1, y1, x2, y2),
+            })
             
-            MIN_ACCEPTABLE_TOTAL_SCORE = 2.0
-            final_click_positions = []
-            use_fallback = False
-            assigned_scores = []
+        # --- 阶段 1: 基于目标检测 + OCR/SIFT 的全局分配 ---
+        best_assignment = None
+        best_total_score = -1.0
+        sprite_profiles = []
+        stage1_ranking = []
+        
+        if len(spec_infos) >= 3:
+            for j in range(3):
+                sprite_profiles.append(self._build_sprite_profile(sprite_imgs[j], ocr))
+            # 次优方案与平局判断需要前两名分配，剪枝以第 2 名为准
+            score_matrix = self._score_candidates_lazily(
+                sprite_imgs, sprite_profiles, spec_infos, ocr, logger_adapter, top_k=2
+            )
             
-            if best_assignment is not None and best_total_score >= MIN_ACCEPTABLE_TOTAL_SCORE:
-                assigned_scores = [score_matrix[j][best_assignment[j]] for j in range(3)]
-                min_assigned_score = min(assigned_scores)
-                glyph_low_confidence = False
-                if sprite_profiles:
-                    for j, score in enumerate(assigned_scores):
-                        profile = sprite_profiles[j] if j < len(sprite_profiles) else None
-                        if profile and profile.get("is_glyph") and score < 4.0:
-                            glyph_low_confidence = True
-                            logger_adapter.warning(
-                                f"图案 {j + 1} 被识别为字形，但局部候选最高分仅 {score:.2f}，"
-                                "怀疑正确字符未被候选框截到，降级使用全图搜索..."
-                            )
-                            break
-
-                if min_assigned_score <= 0 or glyph_low_confidence:
-                    logger_adapter.warning(
-                        f"一阶段存在低可信目标（最低单项得分 {min_assigned_score:.2f}），"
-                        "放弃直接提交，降级使用全图边缘模板匹配..."
-                    )
-                    use_fallback = True
-                else:
-                    logger_adapter.info(f"成功找到全局最优组合，验证码一阶段置信分: {best_total_score:.2f}")
-                    for j in range(3):
-                        sprite_path = f"temp/sprite_{j + 1}.jpg"
-                        spec_idx = best_assignment[j]
-                        spec_info = spec_infos[spec_idx]
-                        positon = spec_info["pos"]
-                        score = score_matrix[j][spec_idx]
-                        profile = sprite_profiles[j] if j < len(sprite_profiles) else None
-                        if profile and profile.get("is_glyph"):
-                            logger_adapter.info(
-                                f"--> 图案 {j + 1} 选择候选框 {spec_idx + 1} 位于 ({positon})，"
-                                f"单项得分：{score:.2f}，字形目标使用候选框中心，跳过局部精修"
-                            )
-                        else:
-                            refined_pos, refined_score = self._find_sprite_by_template(
-                                sprite_path,
-                                "temp/captcha.jpg",
-                                search_box=spec_info["bbox"],
-                                padding=12,
-                                target_profile=profile,
-                            )
-                            if refined_pos:
-                                positon = refined_pos
-                                logger_adapter.info(
-                                    f"--> 图案 {j + 1} 选择候选框 {spec_idx + 1}，候选框中心 ({spec_info['pos']}) -> "
-                                    f"局部精修坐标 ({positon})，单项得分：{score:.2f}，精修边缘分：{refined_score:.2f}"
-                                )
-                            else:
-                                logger_adapter.info(
-                                    f"--> 图案 {j + 1} 选择候选框 {spec_idx + 1} 位于 ({positon})，"
-                                    f"单项得分：{score:.2f}，局部精修失败，回退候选框中心"
-                                )
-                        final_click_positions.append(positon)
-            else:
-                score_info = f"{best_total_score:.2f}" if best_assignment is not None else "候选框不足3个"
-                logger_adapter.warning(f"局部目标检测不佳（得分 {score_info} < {MIN_ACCEPTABLE_TOTAL_SCORE}），降级使用全图边缘模板匹配...")
-                use_fallback = True
-                
-            # --- 阶段 2: 全图边缘模板匹配搜索 ---
-            if use_fallback:
-                fallback_candidates = []
-                for j in range(3):
-                    sprite_path = f"temp/sprite_{j + 1}.jpg"
-                    candidates = self._find_template_candidates(
-                        sprite_path,
-                        "temp/captcha.jpg",
-                        top_k=5,
-                        min_distance=24,
-                        target_profile=sprite_profiles[j] if j < len(sprite_profiles) else None,
-                    )
-                    fallback_candidates.append(candidates)
-                    if candidates:
-                        top_candidate = candidates[0]
-                        logger_adapter.info(
-                            f"--> [全图匹配] 图案 {j + 1} 首选坐标 ({top_candidate['pos']})，"
-                            f"候选数：{len(candidates)}，边缘响应分：{top_candidate['score']:.2f}"
+            # 每个候选框只能分配给一个图案
+            stage1_ranking = rank_assignments(
+                [
+                    [{"column": k, "spec": k, "score": score} for k, score in enumerate(sprite_scores)]
+                    for sprite_scores in score_matrix
+                ],
+                top_k=2,
+            )
+            if stage1_ranking:
+                best_assignment = tuple(option["spec"] for option in stage1_ranking[0]["options"])
+                best_total_score = stage1_ranking[0]["total"]
+        
+        MIN_ACCEPTABLE_TOTAL_SCORE = 2.0
+        final_click_positions = []
+        use_fallback = False
+        assigned_scores = []
+        runner_up = None
+        # 次优方案的原始候选（可跨进程传递），子进程求解时由父进程据此计算坐标
+        runner_up_raw = None
+        
+        if best_assignment is not None and best_total_score >= MIN_ACCEPTABLE_TOTAL_SCORE:
+            assigned_scores = [score_matrix[j][best_assignment[j]] for j in range(3)]
+            min_assigned_score = min(assigned_scores)
+            glyph_low_confidence = False
+            if sprite_profiles:
+                for j, score in enumerate(assigned_scores):
+                    profile = sprite_profiles[j] if j < len(sprite_profiles) else None
+                    if profile and profile.get("is_glyph") and score < 4.0:
+                        glyph_low_confidence = True
+                        logger_adapter.warning(
+                            f"图案 {j + 1} 被识别为字形，但局部候选最高分仅 {score:.2f}，"
+                            "怀疑正确字符未被候选框截到，降级使用全图搜索..."
                         )
-                    else:
-                        logger_adapter.info(f"--> [全图匹配] 图案 {j + 1} 未找到候选坐标")
+                        break
 
-                selected_candidates, fallback_total_score = self._select_best_candidate_combo(
-                    fallback_candidates,
+            if min_assigned_score <= 0 or glyph_low_confidence:
+                logger_adapter.warning(
+                    f"一阶段存在低可信目标（最低单项得分 {min_assigned_score:.2f}），"
+                    "放弃直接提交，降级使用全图边缘模板匹配..."
+                )
+                use_fallback = True
+            else:
+                logger_adapter.info(f"成功找到全局最优组合，验证码一阶段置信分: {best_total_score:.2f}")
+                final_click_positions = self._resolve_assignment_positions(
+                    best_assignment, spec_infos, score_matrix, sprite_profiles, sprite_imgs, captcha, logger_adapter
+                )
+                if self._is_near_tie(stage1_ranking):
+                    runner_up_assignment = tuple(option["spec"] for option in stage1_ranking[1]["options"])
+                    if min(score_matrix[j][runner_up_assignment[j]] for j in range(3)) > 0:
+                        runner_up_raw = {
+                            "assignment": runner_up_assignment,
+                            "spec_infos": [{"pos": spec["pos"], "bbox": spec["bbox"]} for spec in spec_infos],
+                            "score_matrix": score_matrix,
+                            "sprite_profiles": sprite_profiles,
+                        }
+                        runner_up = (
+                            best_total_score,
+                            stage1_ranking[1],
+                            lambda: self._resolve_assignment_positions(
+                                runner_up_assignment, spec_infos, score_matrix, sprite_profiles,
+                                sprite_imgs, captcha, logger_adapter
+                            ),
+                        )
+        else:
+            score_info = f"{best_total_score:.2f}" if best_assignment is not None else "候选框不足3个"
+            logger_adapter.warning(f"局部目标检测不佳（得分 {score_info} < {MIN_ACCEPTABLE_TOTAL_SCORE}），降级使用全图边缘模板匹配...")
+            use_fallback = True
+            
+        # --- 阶段 2: 全图边缘模板匹配搜索 ---
+        fallback_total_score = None
+        rejected_stage = None
+        rejected_positions = []
+        if use_fallback:
+            start = time.perf_counter()
+            fallback_candidates = []
+            for j in range(3):
+                candidates = self._find_template_candidates(
+                    sprite_imgs[j],
+                    captcha,
+                    top_k=5,
                     min_distance=24,
+                    target_profile=sprite_profiles[j] if j < len(sprite_profiles) else None,
                 )
-                final_click_positions = [candidate["pos"] for candidate in selected_candidates]
-                
-                # Canny 响应度如果在 0.15 以下，说明可能图太花导致边缘都消失
-                MIN_FALLBACK_TOTAL_SCORE = 0.75
-                if fallback_total_score < MIN_FALLBACK_TOTAL_SCORE or len(final_click_positions) < 3:
-                    logger_adapter.error(
-                        f"全图匹配响应度过低 ({fallback_total_score:.2f} < {MIN_FALLBACK_TOTAL_SCORE:.2f})，放弃提交并刷新"
+                fallback_candidates.append(candidates)
+                if candidates:
+                    top_candidate = candidates[0]
+                    logger_adapter.info(
+                        f"--> [全图匹配] 图案 {j + 1} 首选坐标 ({top_candidate['pos']})，"
+                        f"候选数：{len(candidates)}，边缘响应分：{top_candidate['score']:.2f}"
                     )
-                    self._save_captcha_debug_bundle(
-                        logger_adapter,
-                        stage="fallback_low_score",
-                        retry_count=retry_stats['count'],
-                        extra={
-                            "fallback_total_score": fallback_total_score,
-                            "click_positions": final_click_positions,
-                        },
-                    )
-                    final_click_positions = []  # 触发失败换图逻辑
+                else:
+                    logger_adapter.info(f"--> [全图匹配] 图案 {j + 1} 未找到候选坐标")
+
+            # 与一阶段共用分配求解，候选点之间需保持最小间距
+            fallback_ranking = rank_assignments(fallback_candidates, top_k=2, min_distance=24)
+            fallback_total_score = fallback_ranking[0]["total"] if fallback_ranking else 0.0
+            final_click_positions = (
+                [candidate["pos"] for candidate in fallback_ranking[0]["options"]] if fallback_ranking else []
+            )
             
-            # --- 执行点击动作 ---
-            if len(final_click_positions) == 3:
-                for positon in final_click_positions:
-                    slideBg = wait.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="slideBg"]')))
-                    style = slideBg.get_attribute("style")
-                    x, y = int(positon.split(",")[0]), int(positon.split(",")[1])
-                    width_raw, height_raw = captcha.shape[1], captcha.shape[0]
-                    width, height = float(get_width_from_style(style)), float(get_height_from_style(style))
-                    x_offset, y_offset = float(-width / 2), float(-height / 2)
-                    final_x, final_y = int(x_offset + x / width_raw * width), int(y_offset + y / height_raw * height)
-                    ActionChains(driver).move_to_element_with_offset(slideBg, final_x, final_y).click().perform()
-                    time.sleep(0.3)
-                    
-                confirm = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="tcStatus"]/div[2]/div[2]/div/div')))
-                logger_adapter.info("提交验证码")
-                time.sleep(0.5)
-                confirm.click()
-                time.sleep(3)
-                
-                # 检查是否通过
-                result_elem = wait.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="tcOperation"]')))
-                if result_elem.get_attribute("class") == 'tc-opera pointer show-success':
-                    logger_adapter.info("验证码通过 🎉")
-                    return
+            # Canny 响应度如果在 0.15 以下，说明可能图太花导致边缘都消失
+            MIN_FALLBACK_TOTAL_SCORE = 0.75
+            if fallback_total_score < MIN_FALLBACK_TOTAL_SCORE or len(final_click_positions) < 3:
+                logger_adapter.error(
+                    f"全图匹配响应度过低 ({fallback_total_score:.2f} < {MIN_FALLBACK_TOTAL_SCORE:.2f})，放弃提交并刷新"
+                )
+                rejected_stage = "fallback_low_score"
+                rejected_positions = final_click_positions
+                final_click_positions = []  # 触发失败换图逻辑
+            elif self._is_near_tie(fallback_ranking) and fallback_ranking[1]["total"] >= MIN_FALLBACK_TOTAL_SCORE:
+                runner_up_positions = [candidate["pos"] for candidate in fallback_ranking[1]["options"]]
+                runner_up = (fallback_total_score, fallback_ranking[1], lambda: runner_up_positions)
+                runner_up_raw = {"positions": runner_up_positions}
+            self._add_timing("template_fallback", start)
+
+        return {
+            "captcha": captcha,
+            "positions": final_click_positions,
+            "used_fallback": use_fallback,
+            "best_total_score": best_total_score,
+            "fallback_total_score": fallback_total_score,
+            "runner_up": runner_up,
+            "runner_up_raw": runner_up_raw,
+            "rejected_stage": rejected_stage,
+            "rejected_positions": rejected_positions,
+        }
+        
+
+    def _score_candidates_lazily(self, sprite_imgs, sprite_profiles, spec_infos, ocr, logger_adapter, top_k=2):
+        """
+        惰性计算一阶段得分矩阵：先完成所有配对的廉价阶段（形状/OCR），得到得分区间；
+        再每次把上界最高的配对推进一个阶段（特征匹配 → RANSAC），并重新估计：若强制选中某配对时
+        整体分配的上界仍低于当前下界第 top_k 名分配，该配对不可能进入前 top_k 名分配，直接剪枝（按下界计分）。
+        前 top_k 名分配（含次优方案）中的配对都已完整计算，得分与平局判断不受剪枝影响。
+        """
+        evaluators = {}
+        lower = []
+        upper = []
+        for j in range(3):
+            lower.append([0.0] * len(spec_infos))
+            upper.append([0.0] * len(spec_infos))
+            for k, spec in enumerate(spec_infos):
+                evaluator = self._iter_score_bounds(sprite_imgs[j], spec["image"], ocr, sprite_profile=sprite_profiles[j])
+                lb, ub, result = next(evaluator, (0.0, 0.0, (0.0, False)))
+                lower[j][k], upper[j][k] = lb, ub
+                if result is None:
+                    evaluators[(j, k)] = evaluator
                 else:
-                    logger_adapter.error(f"验证码提交后未通过，匹配坐标可能存在偏移。")
-                    self._save_captcha_debug_bundle(
-                        logger_adapter,
-                        stage="submit_failed",
-                        retry_count=retry_stats['count'],
-                        extra={
-                            "click_positions": final_click_positions,
-                            "used_fallback": use_fallback,
-                            "best_total_score": best_total_score,
-                        },
-                    )
-                    retry_stats['count'] += 1
+                    logger_adapter.debug(f"目标 {j + 1} -> 候选 {k + 1}: 得分 {result[0]:.2f} (语义匹配: {result[1]})")
+
+        def kth_lower_total():
+            ranking = rank_assignments(
+                [[{"column": k, "score": score} for k, score in enumerate(row)] for row in lower],
+                top_k=top_k,
+            )
+            return ranking[top_k - 1]["total"] if len(ranking) >= top_k else float('-inf')
+
+        def forced_upper_total(j, k):
+            rest = [
+                [None if col == k else score for col, score in enumerate(upper[row])]
+                for row in range(3) if row != j
+            ]
+            _, total = linear_sum_assignment_max(rest)
+            return upper[j][k] + total
+
+        evaluated = 0
+        pruned = 0
+        while evaluators:
+            threshold = kth_lower_total()
+            for key in [key for key in evaluators if forced_upper_total(*key) < threshold]:
+                j, k = key
+                logger_adapter.debug(
+                    f"目标 {j + 1} -> 候选 {k + 1}: 强制选中时分配上界 {forced_upper_total(j, k):.2f} "
+                    f"低于当前第 {top_k} 名 {threshold:.2f}，跳过剩余 SIFT 阶段"
+                )
+                evaluators.pop(key).close()
+                upper[j][k] = lower[j][k]
+                pruned += 1
+            if not evaluators:
+                break
+
+            j, k = max(evaluators, key=lambda key: upper[key[0]][key[1]])
+            lb, ub, result = next(evaluators[(j, k)], (0.0, 0.0, (0.0, False)))
+            if result is None:
+                lower[j][k], upper[j][k] = lb, ub
+                continue
+            evaluators.pop((j, k))
+            score, is_semantic = result
+            lower[j][k] = upper[j][k] = score
+            evaluated += 1
+            logger_adapter.debug(f"目标 {j + 1} -> 候选 {k + 1}: 得分 {score:.2f} (语义匹配: {is_semantic})")
+
+        logger_adapter.info(f"一阶段评分：SIFT 几何校验完整计算 {evaluated} 对，剪枝跳过 {pruned} 对")
+        return lower
+
+    # 次优方案总分达到首选方案的该比例时视为接近平局，提交失败后可直接改交次优方案
+    RUNNER_UP_TIE_RATIO = 0.9
+
+    def _is_near_tie(self, ranking):
+        if len(ranking) < 2 or ranking[0]["total"] <= 0:
+            return False
+        return ranking[1]["total"] >= ranking[0]["total"] * self.RUNNER_UP_TIE_RATIO
+
+    def _resolve_assignment_positions(self, assignment, spec_infos, score_matrix, sprite_profiles, sprite_imgs, captcha, logger_adapter):
+        """将一阶段分配结果转为点击坐标，非字形目标在候选框附近做局部精修"""
+        positions = []
+        for j in range(3):
+            spec_idx = assignment[j]
+            spec_info = spec_infos[spec_idx]
+            positon = spec_info["pos"]
+            score = score_matrix[j][spec_idx]
+            profile = sprite_profiles[j] if j < len(sprite_profiles) else None
+            if profile and profile.get("is_glyph"):
+                logger_adapter.info(
+                    f"--> 图案 {j + 1} 选择候选框 {spec_idx + 1} 位于 ({positon})，"
+                    f"单项得分：{score:.2f}，字形目标使用候选框中心，跳过局部精修"
+                )
             else:
-                retry_stats['count'] += 1
-            
-            # 执行提早换图逻辑
-            reload_btn = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="reload"]')))
-            time.sleep(1)
-            reload_btn.click()
-            time.sleep(3)
-            logger_adapter.info(f"重新发起验证码挑战 (当前重试: {retry_stats['count']})")
-            return self.solve(driver, timeout, retry_stats, logger_adapter)
+                refined_pos, refined_score = self._find_sprite_by_template(
+                    sprite_imgs[j],
+                    captcha,
+                    search_box=spec_info["bbox"],
+                    padding=12,
+                    target_profile=profile,
+                )
+                if refined_pos:
+                    positon = refined_pos
+                    logger_adapter.info(
+                        f"--> 图案 {j + 1} 选择候选框 {spec_idx + 1}，候选框中心 ({spec_info['pos']}) -> "
+                        f"局部精修坐标 ({positon})，单项得分：{score:.2f}，精修边缘分：{refined_score:.2f}"
+                    )
+                else:
+                    logger_adapter.info(
+                        f"--> 图案 {j + 1} 选择候选框 {spec_idx + 1} 位于 ({positon})，"
+                        f"单项得分：{score:.2f}，局部精修失败，回退候选框中心"
+                    )
+            positions.append(positon)
+        return positions
+
+    def _click_and_submit(self, driver, wait, positions, captcha, logger_adapter):
+        """依次点击坐标并提交，返回是否通过"""
+        modules = import_selenium_modules()
+        EC = modules['EC']
+        By = modules['By']
+        ActionChains = modules['ActionChains']
+
+        for positon in positions:
+            slideBg = wait.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="slideBg"]')))
+            style = slideBg.get_attribute("style")
+            x, y = int(positon.split(",")[0]), int(positon.split(",")[1])
+            width_raw, height_raw = captcha.shape[1], captcha.shape[0]
+            width, height = float(get_width_from_style(style)), float(get_height_from_style(style))
+            x_offset, y_offset = float(-width / 2), float(-height / 2)
+            final_x, final_y = int(x_offset + x / width_raw * width), int(y_offset + y / height_raw * height)
+            ActionChains(driver).move_to_element_with_offset(slideBg, final_x, final_y).click().perform()
+            # 点击间隔模拟真人操作节奏（行为风控依据），并非等待页面状态，保留固定间隔
+            time.sleep(0.3)
             
-        except TimeoutException:
-            logger_adapter.error("获取验证码图片等元素超时")
-        except Exception as e:
-            logger_adapter.error(f"验证码执行流程中发生未知错误: {e}")
-            import traceback
-            logger_adapter.debug(traceback.format_exc())
-            # 如果发生错误，不妨尝试重试
-            retry_stats['count'] += 1
+        confirm = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="tcStatus"]/div[2]/div[2]/div/div')))
+        logger_adapter.info("提交验证码")
+
+        def operation_class(d):
             try:
-                reload_btn = driver.find_element(By.XPATH, '//*[@id="reload"]')
-                reload_btn.click()
-                time.sleep(3)
-                return self.solve(driver, timeout, retry_stats, logger_adapter)
-            except:
-                pass
-        finally:
-            logger_adapter.debug("验证码单次处理周期完毕")
+                return d.find_element(By.XPATH, '//*[@id="tcOperation"]').get_attribute("class") or ""
+            except Exception:
+                return ""
+
+        class_before = operation_class(driver)
+        confirm.click()
+        # 等待结果提示出现（tcOperation 切换为 show-success / show-fail 等状态）
+        smart_wait(
+            driver,
+            lambda d: operation_class(d) != class_before and "show-" in operation_class(d),
+            "captcha",
+            budget=3.5,
+        )
+        
+        # 检查是否通过
+        result_elem = wait.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="tcOperation"]')))
+        if result_elem.get_attribute("class") == 'tc-opera pointer show-success':
+            logger_adapter.info("验证码通过 🎉")
+            return True
+        return False
+
+    def _reload_challenge(self, driver, reload_btn):
+        """点击换图，并等待新题目的背景图地址出现"""
+        previous_url = self._current_captcha_url(driver)
+        reload_btn.click()
+
+        def challenge_changed(d):
+            current_url = self._current_captcha_url(d)
+            return current_url is not None and current_url != previous_url
+
+        smart_wait(driver, challenge_changed, "captcha", budget=3)
+
+    def _current_captcha_url(self, driver):
+        """读取当前题目背景图地址，用于判断提交失败后题目是否已被更换"""
+        modules = import_selenium_modules()
+        By = modules['By']
+        try:
+            return get_url_from_style(driver.find_element(By.ID, "slideBg").get_attribute("style"))
+        except Exception:
+            return None
 
-    def _download_captcha_img(self, driver, timeout, logger_adapter):
+    def _download_captcha_img(self, driver, timeout, logger_adapter, workspace):
         # 导入Selenium模块
         modules = import_selenium_modules()
         WebDriverWait = modules['WebDriverWait']
@@ -2211,11 +4821,6 @@ class TencentCaptchaProvider(CaptchaProvider):
         By = modules['By']
         
         wait = WebDriverWait(driver, timeout)
-        if os.path.exists("temp"):
-            for filename in os.listdir("temp"):
-                file_path = os.path.join("temp", filename)
-                if os.path.isfile(file_path) or os.path.islink(file_path):
-                    os.remove(file_path)
                     
         # 获取当前浏览器的 User-Agent
         try:
@@ -2227,13 +4832,35 @@ class TencentCaptchaProvider(CaptchaProvider):
         slideBg = wait.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="slideBg"]')))
         img1_style = slideBg.get_attribute("style")
         img1_url = get_url_from_style(img1_style)
-        logger_adapter.info("开始下载验证码图片(1): " + img1_url)
-        download_image(img1_url, "captcha.jpg", user_agent=current_ua)
+        logger_adapter.info("开始获取验证码图片(1): " + img1_url)
+        workspace.put("captcha.jpg", self._fetch_captcha_image(driver, img1_url, current_ua, logger_adapter))
         
         sprite = wait.until(EC.visibility_of_element_located((By.XPATH, '//*[@id="instruction"]/div/img')))
         img2_url = sprite.get_attribute("src")
-        logger_adapter.info("开始下载验证码图片(2): " + img2_url)
-        download_image(img2_url, "sprite.jpg", user_agent=current_ua)
+        logger_adapter.info("开始获取验证码图片(2): " + img2_url)
+        workspace.put("sprite.jpg", self._fetch_captcha_image(driver, img2_url, current_ua, logger_adapter))
+        return img1_url
+
+    def _fetch_captcha_image(self, driver, url, user_agent, logger_adapter):
+        """
+        获取验证码图片字节：CAPTCHA_IMAGE_SOURCE=browser（默认）时先从浏览器取（CDP 资源缓存 / 页面内 fetch），
+        与页面走同一代理且无需重新下载；取不到或设为 http 时回退到独立 HTTP 下载
+        """
+        if os.getenv("CAPTCHA_IMAGE_SOURCE", "browser").strip().lower() != "http":
+            data = fetch_browser_resource(driver, url, log=logger_adapter)
+            if data:
+                return data
+            logger_adapter.info("未能从浏览器取得验证码图片，改用 HTTP 下载")
+        return download_image(url, user_agent=user_agent)
+
+    def _decode_image(self, data):
+        """将下载得到的图片字节解码为 BGR 数组，失败返回 None"""
+        import cv2
+        import numpy as np
+
+        if not data:
+            return None
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
 
     def _distance(self, point_a, point_b):
         import math
@@ -2248,43 +4875,8 @@ class TencentCaptchaProvider(CaptchaProvider):
         if sprite_img is None or spec_img is None:
             return 0.0
 
-        if len(sprite_img.shape) == 3:
-            sprite_img = cv2.cvtColor(sprite_img, cv2.COLOR_BGR2GRAY)
-        if len(spec_img.shape) == 3:
-            spec_img = cv2.cvtColor(spec_img, cv2.COLOR_BGR2GRAY)
-
-        def normalize_mask(img):
-            blurred = cv2.GaussianBlur(img, (3, 3), 0)
-            _, binary = cv2.threshold(
-                blurred,
-                0,
-                255,
-                cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU,
-            )
-            coords = cv2.findNonZero(binary)
-            if coords is None:
-                return None
-
-            x, y, w, h = cv2.boundingRect(coords)
-            crop = binary[y:y + h, x:x + w]
-            if crop.size == 0:
-                return None
-
-            canvas_size = 64
-            usable_size = canvas_size - 8
-            scale = min(usable_size / max(w, 1), usable_size / max(h, 1))
-            resized_w = max(1, int(round(w * scale)))
-            resized_h = max(1, int(round(h * scale)))
-            resized = cv2.resize(crop, (resized_w, resized_h), interpolation=cv2.INTER_AREA)
-
-            canvas = np.zeros((canvas_size, canvas_size), dtype=np.uint8)
-            offset_x = (canvas_size - resized_w) // 2
-            offset_y = (canvas_size - resized_h) // 2
-            canvas[offset_y:offset_y + resized_h, offset_x:offset_x + resized_w] = resized
-            return canvas
-
-        sprite_mask = normalize_mask(sprite_img)
-        spec_mask = normalize_mask(spec_img)
+        sprite_mask, c1 = self._shape_descriptor(sprite_img)
+        spec_mask, c2 = self._shape_descriptor(spec_img)
         if sprite_mask is None or spec_mask is None:
             return 0.0
 
@@ -2292,12 +4884,8 @@ class TencentCaptchaProvider(CaptchaProvider):
         union = np.logical_or(sprite_mask > 0, spec_mask > 0).sum()
         iou_score = intersection / union if union else 0.0
 
-        contours_1, _ = cv2.findContours(sprite_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        contours_2, _ = cv2.findContours(spec_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         contour_score = 0.0
-        if contours_1 and contours_2:
-            c1 = max(contours_1, key=cv2.contourArea)
-            c2 = max(contours_2, key=cv2.contourArea)
+        if c1 is not None and c2 is not None:
             try:
                 shape_distance = cv2.matchShapes(c1, c2, cv2.CONTOURS_MATCH_I1, 0.0)
                 contour_score = 1.0 / (1.0 + shape_distance * 8.0)
@@ -2306,14 +4894,60 @@ class TencentCaptchaProvider(CaptchaProvider):
 
         return max(iou_score, contour_score, (iou_score + contour_score) / 2.0)
 
-    def _compute_binary_shape_score(self, sprite_path, spec_path):
+    def _shape_descriptor(self, image):
+        """归一化到 64x64 画布的 Otsu 前景掩码及其最大外轮廓（按图像缓存）"""
+        return self._features().get_or_compute(
+            "shape", image, lambda: self._compute_shape_descriptor(image)
+        )
+
+    def _compute_shape_descriptor(self, image):
         import cv2
+        import numpy as np
+
+        if image is None:
+            return None, None
+
+        if len(image.shape) == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        blurred = cv2.GaussianBlur(image, (3, 3), 0)
+        _, binary = cv2.threshold(
+            blurred,
+            0,
+            255,
+            cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU,
+        )
+        coords = cv2.findNonZero(binary)
+        if coords is None:
+            return None, None
 
-        sprite_img = cv2.imread(sprite_path, cv2.IMREAD_GRAYSCALE)
-        spec_img = cv2.imread(spec_path, cv2.IMREAD_GRAYSCALE)
-        return self._compute_binary_shape_score_images(sprite_img, spec_img)
+        x, y, w, h = cv2.boundingRect(coords)
+        crop = binary[y:y + h, x:x + w]
+        if crop.size == 0:
+            return None, None
+
+        canvas_size = 64
+        usable_size = canvas_size - 8
+        scale = min(usable_size / max(w, 1), usable_size / max(h, 1))
+        resized_w = max(1, int(round(w * scale)))
+        resized_h = max(1, int(round(h * scale)))
+        resized = cv2.resize(crop, (resized_w, resized_h), interpolation=cv2.INTER_AREA)
+
+        canvas = np.zeros((canvas_size, canvas_size), dtype=np.uint8)
+        offset_x = (canvas_size - resized_w) // 2
+        offset_y = (canvas_size - resized_h) // 2
+        canvas[offset_y:offset_y + resized_h, offset_x:offset_x + resized_w] = resized
+
+        contours, _ = cv2.findContours(canvas, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contour = max(contours, key=cv2.contourArea) if contours else None
+        return canvas, contour
 
     def _measure_foreground_shape(self, image):
+        return self._features().get_or_compute(
+            "foreground", image, lambda: self._compute_foreground_shape(image)
+        )
+
+    def _compute_foreground_shape(self, image):
         import cv2
 
         if image is None:
@@ -2394,6 +5028,11 @@ class TencentCaptchaProvider(CaptchaProvider):
         return ""
 
     def _classify_glyph_char(self, image, ocr):
+        return self._features().get_or_compute(
+            "ocr", image, lambda: self._compute_glyph_char(image, ocr)
+        )
+
+    def _compute_glyph_char(self, image, ocr):
         import cv2
 
         if image is None:
@@ -2430,17 +5069,14 @@ class TencentCaptchaProvider(CaptchaProvider):
             "inv_up2": cv2.resize(255 - binary, None, fx=2, fy=2, interpolation=cv2.INTER_NEAREST),
         }
 
-        variant_texts = {}
+        start = time.perf_counter()
         try:
-            with _inference_lock:
-                for name, variant in variants.items():
-                    success, encoded = cv2.imencode('.png', variant)
-                    if not success:
-                        variant_texts[name] = ""
-                        continue
-                    variant_texts[name] = (ocr.classification(encoded.tobytes()) or "").strip()
+            texts = ocr.classify_batch(list(variants.values()), stats=getattr(self, "_ocr_stats", None))
         except Exception:
             return "", {}
+        finally:
+            self._add_timing("ocr", start)
+        variant_texts = dict(zip(variants, texts))
 
         orig_char = self._normalize_ocr_char(variant_texts.get("orig"))
         th_char = self._normalize_ocr_char(variant_texts.get("th"))
@@ -2462,14 +5098,11 @@ class TencentCaptchaProvider(CaptchaProvider):
     def _is_likely_glyph_text(self, text):
         return bool(self._normalize_ocr_char(text))
 
-    def _build_sprite_profile(self, sprite_path, ocr):
-        import cv2
-
+    def _build_sprite_profile(self, sprite_img, ocr):
         sprite_text = ""
         raw_texts = {}
         foreground_metrics = {}
         try:
-            sprite_img = cv2.imread(sprite_path)
             foreground_metrics = self._measure_foreground_shape(sprite_img)
             sprite_text, raw_texts = self._classify_glyph_char(sprite_img, ocr)
         except Exception:
@@ -2518,6 +5151,15 @@ class TencentCaptchaProvider(CaptchaProvider):
         return max(0.22, hole_factor * (0.7 + 0.3 * aspect_similarity))
 
     def _extract_binary_mask(self, image, crop_foreground=False, padding=2):
+        return self._features().get_or_compute(
+            "mask",
+            image,
+            lambda: self._compute_binary_mask(image, crop_foreground, padding),
+            crop_foreground,
+            padding,
+        )
+
+    def _compute_binary_mask(self, image, crop_foreground=False, padding=2):
         import cv2
         import numpy as np
 
@@ -2556,9 +5198,8 @@ class TencentCaptchaProvider(CaptchaProvider):
         safe_name = re.sub(r'[^0-9A-Za-z._-]+', '_', raw_name or "unknown")
         return safe_name.strip("._") or "unknown"
 
-    def _save_captcha_debug_bundle(self, logger_adapter, stage, retry_count, extra=None):
+    def _save_captcha_debug_bundle(self, logger_adapter, workspace, stage, retry_count, extra=None):
         import json
-        import shutil
         from datetime import datetime
 
         account_prefix = self._make_safe_name(getattr(logger_adapter, "extra", {}).get("prefix", "unknown"))
@@ -2566,21 +5207,8 @@ class TencentCaptchaProvider(CaptchaProvider):
         bundle_dir = os.path.join("logs", "captcha_debug", account_prefix, bundle_name)
         os.makedirs(bundle_dir, exist_ok=True)
 
-        temp_dir = "temp"
-        copied_files = []
-        if os.path.isdir(temp_dir):
-            for filename in sorted(os.listdir(temp_dir)):
-                if not (
-                    filename in {"captcha.jpg", "sprite.jpg"}
-                    or filename.startswith("sprite_")
-                    or filename.startswith("spec_")
-                ):
-                    continue
-                source_path = os.path.join(temp_dir, filename)
-                if not os.path.isfile(source_path):
-                    continue
-                shutil.copy2(source_path, os.path.join(bundle_dir, filename))
-                copied_files.append(filename)
+        # 仅在保存调试样本时才把内存中的图片编码落盘
+        copied_files = workspace.write_to(bundle_dir)
 
         metadata = {
             "stage": stage,
@@ -2609,11 +5237,9 @@ class TencentCaptchaProvider(CaptchaProvider):
                 break
         return deduped_candidates
 
-    def _find_glyph_candidates(self, sprite_path, captcha_path, search_box=None, top_k=5, min_distance=24, padding=0):
+    def _find_glyph_candidates(self, sprite_img, captcha_img, search_box=None, top_k=5, min_distance=24, padding=0):
         import cv2
 
-        sprite_img = cv2.imread(sprite_path)
-        captcha_img = cv2.imread(captcha_path)
         if sprite_img is None or captcha_img is None:
             return []
 
@@ -2689,12 +5315,10 @@ class TencentCaptchaProvider(CaptchaProvider):
 
         return self._dedupe_candidates(candidates, min_distance=min_distance, top_k=top_k)
 
-    def _find_component_candidates(self, sprite_path, captcha_path, search_box=None, top_k=5, min_distance=24, padding=0, target_profile=None):
+    def _find_component_candidates(self, sprite_img, captcha_img, search_box=None, top_k=5, min_distance=24, padding=0, target_profile=None):
         import cv2
 
-        ocr, _ = get_shared_ocr_models()
-        sprite_img = cv2.imread(sprite_path)
-        captcha_img = cv2.imread(captcha_path)
+        ocr = get_ocr_service()
         if sprite_img is None or captcha_img is None:
             return []
 
@@ -2756,7 +5380,14 @@ class TencentCaptchaProvider(CaptchaProvider):
                 top = max(0, y - crop_padding)
                 right = min(captcha_view.shape[1], x + w + crop_padding)
                 bottom = min(captcha_view.shape[0], y + h + crop_padding)
-                component_crop = captcha_view[top:bottom, left:right]
+                # 以整图绝对坐标取裁剪，不同阈值得到的同一连通域复用同一视图及其特征缓存
+                component_crop = self._features().crop(
+                    captcha_img,
+                    origin_y + top,
+                    origin_y + bottom,
+                    origin_x + left,
+                    origin_x + right,
+                )
                 if component_crop.size == 0:
                     continue
 
@@ -2798,12 +5429,10 @@ class TencentCaptchaProvider(CaptchaProvider):
 
         return self._dedupe_candidates(candidates, min_distance=min_distance, top_k=top_k)
 
-    def _find_edge_template_candidates(self, sprite_path, captcha_path, search_box=None, top_k=5, min_distance=24, padding=0):
+    def _find_edge_template_candidates(self, sprite_img, captcha_img, search_box=None, top_k=5, min_distance=24, padding=0):
         import cv2
         import numpy as np
         
-        sprite_img = cv2.imread(sprite_path)
-        captcha_img = cv2.imread(captcha_path)
         if sprite_img is None or captcha_img is None:
             return []
             
@@ -2893,11 +5522,11 @@ class TencentCaptchaProvider(CaptchaProvider):
 
         return self._dedupe_candidates(candidates, min_distance=min_distance, top_k=top_k)
 
-    def _find_template_candidates(self, sprite_path, captcha_path, search_box=None, top_k=5, min_distance=24, padding=0, target_profile=None):
+    def _find_template_candidates(self, sprite_img, captcha_img, search_box=None, top_k=5, min_distance=24, padding=0, target_profile=None):
         """返回模板匹配候选点，用于局部精修和全图降级搜索"""
         candidates = self._find_component_candidates(
-            sprite_path,
-            captcha_path,
+            sprite_img,
+            captcha_img,
             search_box=search_box,
             top_k=top_k,
             min_distance=min_distance,
@@ -2908,8 +5537,8 @@ class TencentCaptchaProvider(CaptchaProvider):
         if target_profile and target_profile.get("is_glyph"):
             candidates.extend(
                 self._find_glyph_candidates(
-                    sprite_path,
-                    captcha_path,
+                    sprite_img,
+                    captcha_img,
                     search_box=search_box,
                     top_k=top_k,
                     min_distance=min_distance,
@@ -2919,8 +5548,8 @@ class TencentCaptchaProvider(CaptchaProvider):
         else:
             candidates.extend(
                 self._find_edge_template_candidates(
-                    sprite_path,
-                    captcha_path,
+                    sprite_img,
+                    captcha_img,
                     search_box=search_box,
                     top_k=top_k,
                     min_distance=min_distance,
@@ -2930,11 +5559,11 @@ class TencentCaptchaProvider(CaptchaProvider):
 
         return self._dedupe_candidates(candidates, min_distance=min_distance, top_k=top_k)
 
-    def _find_sprite_by_template(self, sprite_path, captcha_path, search_box=None, padding=0, target_profile=None):
+    def _find_sprite_by_template(self, sprite_img, captcha_img, search_box=None, padding=0, target_profile=None):
         """当目标检测由于背景干扰失败时，采用 Canny 边缘及多角度模板匹配进行搜索"""
         candidates = self._find_template_candidates(
-            sprite_path,
-            captcha_path,
+            sprite_img,
+            captcha_img,
             search_box=search_box,
             top_k=1,
             min_distance=24,
@@ -2945,42 +5574,31 @@ class TencentCaptchaProvider(CaptchaProvider):
             return None, 0.0
         return candidates[0]["pos"], candidates[0]["score"]
 
-    def _select_best_candidate_combo(self, candidate_groups, min_distance=24):
-        import itertools
-
-        if not candidate_groups or any(not candidates for candidates in candidate_groups):
-            return [], 0.0
-
-        best_combo = None
-        best_total_score = -1.0
-
-        for combo in itertools.product(*candidate_groups):
-            coords = [candidate["coords"] for candidate in combo]
-            has_overlap = False
-            for i in range(len(coords)):
-                for j in range(i + 1, len(coords)):
-                    if self._distance(coords[i], coords[j]) < min_distance:
-                        has_overlap = True
-                        break
-                if has_overlap:
-                    break
-            if has_overlap:
-                continue
-
-            total_score = sum(candidate["score"] for candidate in combo)
-            if total_score > best_total_score:
-                best_total_score = total_score
-                best_combo = combo
-
-        if best_combo is None:
-            return [], 0.0
-
-        return list(best_combo), best_total_score
+    def _sift_features(self, image, gray):
+        """SIFT 关键点与描述子（按原图缓存，gray 为其灰度版本）"""
+        features = self._features()
+        return features.get_or_compute(
+            "sift", image, lambda: features.sift().detectAndCompute(gray, None)
+        )
 
     def _compute_score_from_images(self, sprite_img, spec_img, ocr, sprite_profile=None):
         """混合评分器：OCR 语义相似度 + SIFT 几何一致性内点评分"""
+        for _, _, result in self._iter_score_bounds(sprite_img, spec_img, ocr, sprite_profile=sprite_profile):
+            if result is not None:
+                return result
+        return 0.0, False
+
+    def _iter_score_bounds(self, sprite_img, spec_img, ocr, sprite_profile=None):
+        """
+        分阶段评分：形状 → OCR → SIFT+RANSAC，逐阶段产出 (下界, 上界, 结果)。
+        结果不为 None 时即最终的 (得分, 是否语义匹配)；SIFT 特征匹配与 RANSAC 校验前各产出一次得分区间，
+        调用方据此判断该配对已不可能进入前几名分配时，可直接停止迭代以跳过剩余阶段。
+        """
         import cv2
         import numpy as np
+
+        def final(score, is_semantic):
+            return score, score, (score, is_semantic)
         
         shape_score = self._compute_binary_shape_score_images(sprite_img, spec_img)
         sprite_foreground = (sprite_profile or {}).get("foreground", {})
@@ -3010,79 +5628,108 @@ class TencentCaptchaProvider(CaptchaProvider):
                 if len(sprite_char) > 0 and len(spec_char) > 0 and sprite_char == spec_char:
                     threshold = 0.45 if sprite_char in ["0", "1"] else 0.35
                     if shape_score >= threshold:
-                        return 75.0 + shape_score * 25.0, True
-                    return 60.0 + shape_score * 10.0, True
+                        yield final(75.0 + shape_score * 25.0, True)
+                        return
+                    yield final(60.0 + shape_score * 10.0, True)
+                    return
                 if len(sprite_char) > 0 and len(spec_char) > 0 and sprite_char != spec_char:
-                    return shape_score * 1.5, False
+                    yield final(shape_score * 1.5, False)
+                    return
         except Exception:
             pass
 
         # 1.5 字形目标优先依赖形状，不再强行交给 SIFT
         if is_glyph_target:
             if shape_score >= 0.75:
-                return shape_score * 28.0, False
-            if shape_score >= 0.55:
-                return shape_score * 16.0, False
-            return shape_score * 4.0, False
+                yield final(shape_score * 28.0, False)
+            elif shape_score >= 0.55:
+                yield final(shape_score * 16.0, False)
+            else:
+                yield final(shape_score * 4.0, False)
+            return
 
         # 非字形目标的纯形状兜底，避免极少特征点时全盘 0 分
         if shape_score >= 0.55:
-            return shape_score * 20.0, False
+            yield final(shape_score * 20.0, False)
+            return
 
         # 2. SIFT + RANSAC 单应性几何校验 (用于解决无规则图形和图标)
         if sprite_img is None or spec_img is None:
-            return 0.0, False
+            yield final(0.0, False)
+            return
 
         img1 = cv2.cvtColor(sprite_img, cv2.COLOR_BGR2GRAY) if len(sprite_img.shape) == 3 else sprite_img
         img2 = cv2.cvtColor(spec_img, cv2.COLOR_BGR2GRAY) if len(spec_img.shape) == 3 else spec_img
         
         if img1 is None or img2 is None:
-            return 0.0, False
-            
-        sift = cv2.SIFT_create(nfeatures=500, contrastThreshold=0.02, edgeThreshold=15)
-        kp1, des1 = sift.detectAndCompute(img1, None)
-        kp2, des2 = sift.detectAndCompute(img2, None)
-        
-        if des1 is None or des2 is None or len(kp1) < 4 or len(kp2) < 4:
-            return 0.0, False
+            yield final(0.0, False)
+            return
             
+        start = time.perf_counter()
+        kp1, des1 = self._sift_features(sprite_img, img1)
+        self._add_timing("sift", start)
+        if des1 is None or len(kp1) < 4:
+            yield final(0.0, False)
+            return
+
+        # 内点数 ≤ 好匹配数 ≤ 目标图特征点数，低保分不超过 max(1, 形状分 × 8)。
+        # 该上界较松，剪枝主要发生在下一阶段得到好匹配数之后
+        yield 0.0, max(float(len(kp1)), 1.0, shape_score * 8.0), None
+
+        start = time.perf_counter()
+        kp2, good = self._good_sift_matches(spec_img, img2, des1)
+        self._add_timing("sift", start)
+        if kp2 is None:
+            yield final(0.0, False)
+            return
+        # 低保得分（如果只有可怜的特征点，且无法构成面）。避免遇到极少特征点的时候全盘 0 分。
+        floor_score = max(len(good) / len(des1), shape_score * 8.0) if len(des1) > 0 else shape_score * 5.0
+        if len(good) < 4:
+            yield final(floor_score, False)
+            return
+
+        # RANSAC 内点数不超过好匹配数，单应性求解失败时取低保分
+        yield 0.0, max(float(len(good)), floor_score), None
+
+        start = time.perf_counter()
+        inliers = self._ransac_inliers(kp1, kp2, good)
+        self._add_timing("sift", start)
+        yield final(float(inliers) if inliers is not None else floor_score, False)
+
+    def _good_sift_matches(self, spec_img, img2, des1):
+        """SIFT 特征匹配（比率测试），返回 (候选图关键点, 好匹配)；候选图特征点不足时返回 (None, [])"""
+        import cv2
+
+        kp2, des2 = self._sift_features(spec_img, img2)
+        if des2 is None or len(kp2) < 4:
+            return None, []
+
         bf = cv2.BFMatcher()
         matches = bf.knnMatch(des1, des2, k=2)
-        
+
         good = []
         for m_n in matches:
             if len(m_n) == 2:
                 m, n = m_n
                 if m.distance < 0.8 * n.distance:
                     good.append(m)
-                    
-        # 当至少有 4 个好匹配点时，才能构成平面几何校验
-        if len(good) >= 4:
-            src_pts = np.float32([kp1[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
-            dst_pts = np.float32([kp2[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
-            
-            try:
-                # 使用 RANSAC 进行单应性空间一致校验
-                M, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
-                if mask is not None:
-                    inliers = np.sum(mask)
-                    # 每 1 个合规内点计 1 分，满 4 个就能突破提早刷新底线
-                    return float(inliers), False
-            except Exception:
-                pass
-                
-        # 低保得分（如果只有可怜的特征点，且无法构成面）。避免遇到极少特征点的时候全盘 0 分。
-        if len(des1) > 0:
-            return max(len(good) / len(des1), shape_score * 8.0), False
-            
-        return shape_score * 5.0, False
+        return kp2, good
 
-    def _compute_score(self, sprite_path, spec_path, ocr, sprite_profile=None):
+    @staticmethod
+    def _ransac_inliers(kp1, kp2, good):
+        """RANSAC 单应性空间一致校验，返回内点数（每 1 个合规内点计 1 分，满 4 个就能突破提早刷新底线），失败时返回 None"""
         import cv2
+        import numpy as np
 
-        sprite_img = cv2.imread(sprite_path)
-        spec_img = cv2.imread(spec_path)
-        return self._compute_score_from_images(sprite_img, spec_img, ocr, sprite_profile=sprite_profile)
+        src_pts = np.float32([kp1[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
+        dst_pts = np.float32([kp2[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+        try:
+            M, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
+        except Exception:
+            return None
+        if mask is None:
+            return None
+        return int(np.sum(mask))
 
 
 class CaptchaFactory:
@@ -3094,6 +5741,10 @@ class CaptchaFactory:
         raise ValueError(f"Unknown captcha type: {captcha_type}")
 
 
+# 确认弹窗的按钮
+MODAL_CONFIRM_XPATH = "//footer[contains(@id,'modal') and contains(@id,'footer')]//button[contains(normalize-space(.), '确认')]"
+
+
 def dismiss_modal_confirm(driver, timeout):
     modules = import_selenium_modules()
     WebDriverWait = modules['WebDriverWait']
@@ -3105,17 +5756,17 @@ def dismiss_modal_confirm(driver, timeout):
     try:
         confirm = wait.until(
             EC.element_to_be_clickable(
-                (By.XPATH, "//footer[contains(@id,'modal') and contains(@id,'footer')]//button[contains(normalize-space(.), '确认')]")
+                (By.XPATH, MODAL_CONFIRM_XPATH)
             )
         )
         try:
             driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", confirm)
         except Exception:
             pass
-        time.sleep(0.2)
         confirm.click()
         logger.info("已关闭弹窗：确认")
-        time.sleep(0.5)
+        # 等待弹窗消失（确认按钮被移除或隐藏）
+        smart_wait(driver, element_gone(confirm), "modal", budget=0.7)
         return True
     except TimeoutException:
         return False
@@ -3124,7 +5775,7 @@ def dismiss_modal_confirm(driver, timeout):
             confirm = driver.find_element(By.XPATH, "//button[contains(normalize-space(.), '确认') and contains(@class,'btn')]")
             driver.execute_script("arguments[0].click();", confirm)
             logger.info("已关闭弹窗：确认")
-            time.sleep(0.5)
+            smart_wait(driver, element_gone(confirm), "modal", budget=0.5)
             return True
         except Exception:
             return False
@@ -3150,65 +5801,242 @@ def wait_captcha_or_modal(driver, timeout):
                 continue
         return None
 
-    end_time = time.time() + min(timeout, 8)
-    while time.time() < end_time:
-        if dismiss_modal_confirm(driver, timeout):
-            return "modal"
+    def detect_state(d):
+        # 弹窗与验证码在同一次轮询中检测，任一出现立即返回（不再先为弹窗单独等待数秒）
         try:
-            iframe = find_visible_tcaptcha_iframe()
-            if iframe:
-                return "captcha"
+            for button in d.find_elements(By.XPATH, MODAL_CONFIRM_XPATH):
+                if button.is_displayed() and button.is_enabled():
+                    return "modal"
         except Exception:
             pass
-        time.sleep(0.3)
-    return "none"
+        if find_visible_tcaptcha_iframe():
+            return "captcha"
+        return False
+
+    try:
+        state = WebDriverWait(driver, min(timeout, 8), poll_frequency=0.2).until(detect_state)
+    except TimeoutException:
+        return "none"
+    if state == "modal":
+        dismiss_modal_confirm(driver, timeout)
+    return state
+
+
+class CookieStore:
+    """
+    账号 Cookie 存储（SQLite，temp/cookies/cookies.db），按账号 Hash 索引。
+    每条记录保存 Cookie 列表、其中最早的过期时间、保存与最近验证时间，
+    加载前先做预检：会话已过期或已被接口判定失效的账号直接走密码登录，省去一次积分页加载与重定向。
+    兼容旧版每账号一个 JSON 文件的存储，首次读取时自动迁移。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, "cookies.db")
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @staticmethod
+    def account_key(account_id):
+        import hashlib
+
+        return hashlib.md5(account_id.encode()).hexdigest()[:16]
+
+    def _connect(self):
+        import sqlite3
+
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "account_hash TEXT PRIMARY KEY, cookies TEXT NOT NULL, earliest_expiry REAL, "
+                "saved_at REAL NOT NULL, verified_at REAL, invalid INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    @staticmethod
+    def _earliest_expiry(cookies):
+        """雨云域名下带过期时间的 Cookie 中最早的过期时间，全部为会话 Cookie 时返回 None"""
+        expiries = [
+            float(cookie["expiry"]) for cookie in cookies
+            if cookie.get("expiry") and "rainyun.com" in (cookie.get("domain") or "rainyun.com")
+        ]
+        return min(expiries) if expiries else None
+
+    def _write(self, key, cookies, saved_at=None):
+        import json
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (account_hash, cookies, earliest_expiry, saved_at, verified_at, invalid) "
+                    "VALUES (?, ?, ?, ?, ?, 0)",
+                    (key, json.dumps(cookies, ensure_ascii=False), self._earliest_expiry(cookies),
+                     saved_at or time.time(), time.time()),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _migrate_legacy(self, key):
+        """迁移旧版 temp/cookies/<hash>.json"""
+        import json
+
+        legacy_path = os.path.join(self.directory, f"{key}.json")
+        if not os.path.exists(legacy_path):
+            return False
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                cookies = json.load(f)
+            # 旧文件未记录验证时间，以文件修改时间作为保存时间
+            self._write(key, cookies, saved_at=os.path.getmtime(legacy_path))
+            os.remove(legacy_path)
+            logger.info("已将本地 Cookie 迁移到 Cookie 数据库")
+            return True
+        except Exception as e:
+            logger.warning(f"迁移旧版 Cookie 文件失败: {e}")
+            return False
+
+    def get(self, account_id):
+        """
+        :return: {"cookies", "earliest_expiry", "saved_at", "verified_at", "invalid"}，不存在时返回 None
+        """
+        import json
+
+        key = self.account_key(account_id)
+        for _ in range(2):
+            with self._lock:
+                conn = self._connect()
+                try:
+                    row = conn.execute(
+                        "SELECT cookies, earliest_expiry, saved_at, verified_at, invalid FROM sessions WHERE account_hash = ?",
+                        (key,),
+                    ).fetchone()
+                finally:
+                    conn.close()
+            if row is not None:
+                return {
+                    "cookies": json.loads(row[0]),
+                    "earliest_expiry": row[1],
+                    "saved_at": row[2],
+                    "verified_at": row[3],
+                    "invalid": bool(row[4]),
+                }
+            if not self._migrate_legacy(key):
+                return None
+        return None
+
+    def save(self, account_id, cookies):
+        self._write(self.account_key(account_id), cookies)
+
+    def _update(self, account_id, sql, params=()):
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(sql, params + (self.account_key(account_id),))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def mark_verified(self, account_id):
+        """接口确认会话有效"""
+        self._update(account_id, "UPDATE sessions SET verified_at = ?, invalid = 0 WHERE account_hash = ?", (time.time(),))
+
+    def mark_invalid(self, account_id):
+        """接口确认会话已失效，下次直接走密码登录"""
+        self._update(account_id, "UPDATE sessions SET invalid = 1 WHERE account_hash = ?")
+
+    def preflight(self, account_id):
+        """
+        低成本判断本地会话是否可用（不发起网络请求）
+        :return: (Cookie 列表或 None, 不可用原因)
+        """
+        record = self.get(account_id)
+        if record is None or not record["cookies"]:
+            return None, "未找到本地 Cookie"
+        if record["invalid"]:
+            return None, "本地 Cookie 已被接口判定失效"
+        if record["earliest_expiry"] is not None and record["earliest_expiry"] <= time.time():
+            return None, "本地 Cookie 已过期"
+        return record["cookies"], None
+
+
+_cookie_store = None
+_cookie_store_lock = threading.Lock()
+
+
+def get_cookie_store():
+    """获取全局 Cookie 存储"""
+    global _cookie_store
+    if _cookie_store is None:
+        with _cookie_store_lock:
+            if _cookie_store is None:
+                _cookie_store = CookieStore(os.path.join("temp", "cookies"))
+    return _cookie_store
 
 
 def save_cookies(driver, account_id):
-    """保存当前账号的 Cookie 到本地文件"""
-    import json
-    import hashlib
-    
+    """保存当前账号的 Cookie 到本地 Cookie 存储"""
     if not account_id:
         return
-        
-    os.makedirs("temp/cookies", exist_ok=True)
-    # 使用账号 Hash 作为文件名，避免特殊字符问题
-    account_hash = hashlib.md5(account_id.encode()).hexdigest()[:16]
-    cookie_path = os.path.join("temp", "cookies", f"{account_hash}.json")
-    
     try:
-        cookies = driver.get_cookies()
-        with open(cookie_path, 'w', encoding='utf-8') as f:
-            json.dump(cookies, f, ensure_ascii=False)
+        get_cookie_store().save(account_id, driver.get_cookies())
         logger.info(f"Cookie 已保存到本地")
     except Exception as e:
         logger.warning(f"保存 Cookie 失败: {e}")
 
 
-def load_cookies(driver, account_id):
-    """加载账号 Cookie 到浏览器，返回是否成功加载"""
-    import json
-    import hashlib
-    
+def read_saved_cookies(account_id, log=None):
+    """读取账号保存在本地且通过预检的 Cookie 列表，不存在、已过期或已失效时返回 None"""
     if not account_id:
-        return False
-        
-    account_hash = hashlib.md5(account_id.encode()).hexdigest()[:16]
-    cookie_path = os.path.join("temp", "cookies", f"{account_hash}.json")
-    
-    if not os.path.exists(cookie_path):
-        logger.info("未找到本地 Cookie，将使用账号密码登录")
-        return False
-        
+        return None
+    try:
+        cookies, reason = get_cookie_store().preflight(account_id)
+    except Exception as e:
+        logger.warning(f"读取本地 Cookie 失败: {e}")
+        return None
+    if cookies is None:
+        (log or logger).info(f"{reason}，将使用账号密码登录")
+    return cookies
+
+
+def _to_cdp_cookie(cookie):
+    """将 Selenium 格式的 Cookie 转换为 CDP Network.CookieParam"""
+    param = {
+        "name": cookie["name"],
+        "value": cookie["value"],
+        "path": cookie.get("path") or "/",
+        "secure": bool(cookie.get("secure", False)),
+        "httpOnly": bool(cookie.get("httpOnly", False)),
+    }
+    domain = cookie.get("domain")
+    if domain:
+        param["domain"] = domain
+    else:
+        # 无域名的 Cookie 需要通过 url 指定归属
+        param["url"] = "https://app.rainyun.com/"
+    if cookie.get("expiry"):
+        param["expires"] = float(cookie["expiry"])
+    if cookie.get("sameSite") in ("Strict", "Lax", "None"):
+        param["sameSite"] = cookie["sameSite"]
+    return param
+
+
+def _add_cookies_via_webdriver(driver, cookies):
+    """逐个 add_cookie 加载（CDP 不可用时的回退路径，需先访问域名）"""
     try:
-        with open(cookie_path, 'r', encoding='utf-8') as f:
-            cookies = json.load(f)
-            
-        # 必须先访问域名才能设置 Cookie
         driver.get("https://app.rainyun.com/")
-        time.sleep(1)
-        
+        smart_wait(
+            driver,
+            lambda d: d.execute_script("return document.readyState") in ("interactive", "complete"),
+            "page",
+            budget=1,
+        )
+
         for cookie in cookies:
             # 处理 expiry 字段（某些 Selenium 版本要求为整型）
             if 'expiry' in cookie:
@@ -3217,8 +6045,6 @@ def load_cookies(driver, account_id):
                 driver.add_cookie(cookie)
             except Exception:
                 pass  # 忽略单个 cookie 添加失败
-                
-        logger.info(f"已加载本地 Cookie")
         return True
     except Exception as e:
         # 代理异常（ERR_PROXY_CONNECTION_FAILED、ERR_CONNECTION_RESET、renderer 超时等）
@@ -3234,8 +6060,749 @@ def load_cookies(driver, account_id):
         return False
 
 
-def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
-    """执行签到任务"""
+def load_cookies(driver, account_id):
+    """
+    加载账号 Cookie 到浏览器，返回是否成功加载。
+    优先通过一次 CDP Network.setCookies 批量写入，无需先打开页面，
+    代理问题会在随后的首次导航中暴露并按原有规则归类为代理失败。
+    """
+    if not account_id:
+        return False
+        
+    cookies = read_saved_cookies(account_id)
+    if not cookies:
+        return False
+
+    try:
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": [_to_cdp_cookie(c) for c in cookies]})
+        logger.info(f"已加载本地 Cookie（{len(cookies)} 个）")
+        return True
+    except Exception as e:
+        logger.debug(f"CDP 批量设置 Cookie 失败，回退到逐个添加: {e}")
+
+    if not _add_cookies_via_webdriver(driver, cookies):
+        return False
+    logger.info(f"已加载本地 Cookie")
+    return True
+
+
+# 接口快速路径依赖的雨云后端约定：用户信息 /user/（data.Points 为积分）、积分任务 /user/reward/tasks
+#（按任务名 Name 匹配每日签到，Status 为完成状态），请求头 X-CSRF-Token 取自同名 Cookie。
+# 这些约定按雨云控制台网页端的请求格式编写，没有公开文档可确认，接口变化时可能失效，
+# 因此快速路径默认关闭（API_FAST_PATH=true 开启）；任何一项不符时都返回 None 回退浏览器流程。
+RAINYUN_API_BASE = "https://api.v2.rainyun.com"
+DAILY_CHECKIN_TASK = "每日签到"
+# 积分任务列表中表示"已完成"的状态值
+TASK_STATUS_DONE = 2
+
+
+def fetch_checkin_status(account_id, proxy=None, log=None):
+    """
+    免浏览器读取签到状态：用本地保存的 Cookie 直接调用积分页所用的后端接口
+    :param proxy: 代理地址，与浏览器会话使用同一代理
+    :return: {"done": 今日是否已签到, "points": 当前积分}；无 Cookie、Cookie 失效或返回格式不符时返回 None
+    """
+    log = log or logger
+    cookies = read_saved_cookies(account_id, log)
+    if not cookies:
+        return None
+    jar = {
+        cookie["name"]: cookie["value"]
+        for cookie in cookies
+        if cookie.get("name") and "rainyun.com" in (cookie.get("domain") or "rainyun.com")
+    }
+    headers = {"Origin": "https://app.rainyun.com", "Referer": "https://app.rainyun.com/"}
+    if jar.get("X-CSRF-Token"):
+        headers["X-CSRF-Token"] = jar["X-CSRF-Token"]
+
+    http = get_http_client()
+    try:
+        user_resp = http.get(f"{RAINYUN_API_BASE}/user/", proxy=proxy, cookies=jar, headers=headers, timeout=8)
+        user_data = user_resp.json() if user_resp.status_code == 200 else {}
+        if user_resp.status_code in (401, 403) or user_data.get("code") in (401, 403):
+            # 会话明确失效：记录下来，浏览器阶段跳过加载 Cookie 直接走密码登录
+            get_cookie_store().mark_invalid(account_id)
+            log.info("接口检查: Cookie 已失效，将直接使用账号密码登录")
+            return None
+        if user_data.get("code") != 200 or not isinstance(user_data.get("data"), dict):
+            log.info(f"接口检查: 未能确认 Cookie 状态（状态码 {user_resp.status_code}），交由浏览器处理")
+            return None
+        get_cookie_store().mark_verified(account_id)
+        points = int(user_data["data"].get("Points"))
+
+        tasks_resp = http.get(
+            f"{RAINYUN_API_BASE}/user/reward/tasks", proxy=proxy, cookies=jar, headers=headers, timeout=8
+        )
+        tasks_data = tasks_resp.json() if tasks_resp.status_code == 200 else {}
+        tasks = tasks_data.get("data") if tasks_data.get("code") == 200 else None
+        task = next(
+            (item for item in tasks or [] if isinstance(item, dict) and item.get("Name") == DAILY_CHECKIN_TASK),
+            None,
+        )
+        if task is None:
+            log.info("接口检查: 未读取到每日签到任务状态，交由浏览器处理")
+            return None
+        return {"done": task.get("Status") == TASK_STATUS_DONE, "points": points}
+    except Exception as e:
+        log.info(f"接口检查失败，交由浏览器处理: {e}")
+        return None
+
+
+def api_fast_path(account_id, proxy, logger_adapter, timeline):
+    """
+    签到快速路径：Cookie 有效且今日已签到时直接返回结果，不启动浏览器。
+    未签到（领取奖励需要完成验证码）或接口不可用时返回 None，继续走浏览器流程。
+    由 API_FAST_PATH 控制（默认关闭，依赖的接口约定见 RAINYUN_API_BASE 处说明）。
+    :return: 签到结果（尚未附加阶段耗时，由调用方 finalize_checkin_result），或 None
+    """
+    if os.getenv("API_FAST_PATH", "false").strip().lower() != "true":
+        return None
+    status = timeline.timed("api_check", fetch_checkin_status, account_id, proxy, logger_adapter)
+    if status is None:
+        return None
+    if not status["done"]:
+        logger_adapter.info("接口检查: 今日尚未签到，启动浏览器完成签到与验证码")
+        return None
+    logger_adapter.info(f"接口检查: 今日已签到，当前剩余积分 {status['points']}，无需启动浏览器")
+    result = {
+        'status': True,
+        'msg': '今日已签到（接口确认）',
+        'points': status['points'],
+        'username': f"{account_id[:3]}***{account_id[-3:] if len(account_id) > 6 else account_id}",
+        'retries': 0,
+        'screenshot': None,
+        'proxy': proxy,
+        'fast_path': True,
+    }
+    return result
+
+
+class PrefixAdapter(logging.LoggerAdapter):
+    """在日志前加上账号前缀（脱敏后的用户名）"""
+
+    def process(self, msg, kwargs):
+        return '[%s] %s' % (self.extra['prefix'], msg), kwargs
+
+
+def make_account_logger(username):
+    masked_user = f"{username[:3]}***{username[-3:] if len(username) > 6 else username}"
+    return PrefixAdapter(logger, {'prefix': masked_user})
+
+
+class PreparedCheckin:
+    """流水线预处理阶段的产物：已就绪的代理与预热好的浏览器"""
+
+    def __init__(self, username, password, reuse_proxy, timeline, cancel_lock=None):
+        """
+        :param cancel_lock: 保护 driver 与 cancelled 的锁，由调度引擎传入以便与取消操作互斥
+        """
+        self.username = username
+        self.password = password
+        self.reuse_proxy = reuse_proxy
+        self.timeline = timeline
+        self.proxy = None
+        # 预取代理失败时置位：不预热浏览器，由签到阶段重新获取代理后再启动
+        self.proxy_pending = False
+        self.driver = None
+        self.queue_span = None
+        self.cancelled = False
+        self.cancel_lock = cancel_lock or threading.Lock()
+
+    def attach_driver(self, driver):
+        """登记该账号正在使用的浏览器，使取消时能强制关闭；账号已被取消时返回 False，由调用方自行关闭"""
+        with self.cancel_lock:
+            if self.cancelled:
+                return False
+            self.driver = driver
+            return True
+
+    def detach_driver(self, driver):
+        """签到结束时注销浏览器；返回 False 表示浏览器已在取消时被关闭，调用方不应再归还或关闭"""
+        with self.cancel_lock:
+            if self.driver is driver:
+                self.driver = None
+                return True
+            return False
+
+    def attach_proxy(self, proxy):
+        """登记该账号租用的代理；账号已被取消时返回 False，由调用方归还"""
+        with self.cancel_lock:
+            if self.cancelled:
+                return False
+            self.proxy = proxy
+            return True
+
+    def cancel(self):
+        """标记账号已取消，取走已登记的浏览器（由调用方关闭）并归还租用的代理"""
+        with self.cancel_lock:
+            self.cancelled = True
+            driver, self.driver = self.driver, None
+            proxy, self.proxy = self.proxy, None
+        release_proxy_lease(proxy)
+        return driver
+
+
+def acquire_proxy(reuse_proxy, logger_adapter, timeline):
+    """
+    为单个账号获取代理：优先使用 PROXY_API_URL，海外环境自动抓取国内免费代理
+    :param reuse_proxy: 重试时复用的上次代理
+    :return: 代理地址，不使用代理时返回 None
+    """
+    proxy = None
+    proxy_api_url = os.getenv("PROXY_API_URL", "").strip()
+    if proxy_api_url:
+        # 优先使用配置的代理接口（付费/自建）
+        candidates = max(1, int(os.getenv("PROXY_API_CANDIDATES", "1")))
+        if candidates == 1:
+            proxy = timeline.timed("proxy_fetch", get_proxy_ip)
+            if not proxy:
+                logger_adapter.warning("获取代理失败，将使用本地IP继续")
+                return None
+            latency = timeline.timed("proxy_validate", measure_proxy, proxy)
+            if latency is None:
+                logger_adapter.warning(f"代理 {proxy} 验证失败，将使用本地IP继续")
+                return None
+            logger_adapter.info(f"代理 {proxy} 验证通过（响应时间 {latency:.1f}s），将使用此代理")
+            return proxy
+        # 显式开启后并发拉取多个候选并验证，取最先通过的（每个候选都会消耗一次接口调用）
+        proxy, latency = timeline.timed("proxy_fetch", race_proxies, [get_proxy_ip] * candidates)
+        if proxy:
+            logger_adapter.info(f"代理 {proxy} 验证通过（响应时间 {latency:.1f}s），将使用此代理")
+        else:
+            logger_adapter.warning(f"{candidates} 个候选代理均获取或验证失败，将使用本地IP继续")
+    elif _IN_ACTIONS or timeline.timed("reachability", get_reachability_service().is_blocked):
+        # 海外 IP 会被雨云拒绝连接（浏览器显示 This site can't be reached），
+        # 自动抓取国内免费代理绕过拦截。
+        # 覆盖 GitHub Actions、海外 VPS、Docker 等所有海外环境。
+        # 重试时优先复用上次的代理：换 IP 会导致服务器 Cookie 失效，
+        # 进而被迫走密码登录，而慢代理下密码登录容易超时失败。
+        # 国内代理来自进程级代理池：整个运行只抓取一次，多个账号与重试轮次共享
+        if reuse_proxy:
+            if timeline.timed("proxy_validate", get_proxy_pool().check, reuse_proxy):
+                proxy = reuse_proxy
+                logger_adapter.info(f"复用上次代理: {proxy}（避免换 IP 导致 Cookie 失效）")
+            else:
+                logger_adapter.warning(f"上次代理 {reuse_proxy} 已失效，改从代理池租用国内代理")
+                proxy = timeline.timed("proxy_fetch", get_freeproxy_ip)
+        else:
+            proxy = timeline.timed("proxy_fetch", get_freeproxy_ip)
+        if proxy:
+            logger_adapter.info(f"国内代理 {proxy} 已就绪，用于绕过海外 IP 拦截")
+        else:
+            logger_adapter.warning("未获取到可用国内代理，直连可能被拒绝连接")
+    return proxy
+
+
+def warm_up_browser(username, proxy, browser_pool, logger_adapter, timeline):
+    """启动（或从浏览器池取出）浏览器并注入反检测与指纹脚本"""
+    logger_adapter.info("初始化 Selenium（账号专属配置）")
+    with timeline.span("browser_init", pooled=browser_pool is not None):
+        if browser_pool is not None:
+            driver = browser_pool.acquire(username, proxy=proxy, log=logger_adapter)
+        else:
+            driver = init_selenium(username, proxy=proxy)
+        try:
+            apply_browser_timezone(driver)
+        except Exception:
+            release_browser(driver, browser_pool, logger_adapter)
+            raise
+
+    try:
+        with timeline.span("stealth_inject"):
+            # 过 Selenium 检测 + 浏览器指纹随机化（基于账号生成确定性指纹），合并为一次注入
+            add_script_on_new_document(driver, get_injection_bundle(username))
+    except Exception:
+        release_browser(driver, browser_pool, logger_adapter)
+        raise
+    logger_adapter.info("已注入浏览器指纹脚本（账号专属指纹）")
+    if apply_resource_blocking(driver, logger_adapter):
+        logger_adapter.info(f"已启用资源拦截（{get_resource_block_profile()}）")
+    return driver
+
+
+def release_browser(driver, browser_pool, logger_adapter):
+    """归还浏览器到池中，未启用浏览器池时直接关闭"""
+    if browser_pool is not None:
+        browser_pool.release(driver, log=logger_adapter)
+    else:
+        quit_driver(driver, logger_adapter)
+
+
+class StartRateLimiter:
+    """
+    签到阶段的启动限速：相邻两个账号开始签到的间隔为 [min_interval, max_interval] 内的随机值。
+    由签到工作线程自行等待，不阻塞任务提交，也不影响代理获取与浏览器预热。
+    """
+
+    def __init__(self, min_interval, max_interval):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self._lock = threading.Lock()
+        self._next_slot = None
+
+    def reserve(self, log=None):
+        """预约下一个启动时间，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            slot = now if self._next_slot is None else max(now, self._next_slot)
+            self._next_slot = slot + random.uniform(self.min_interval, self.max_interval)
+        delay = slot - now
+        if delay >= 1:
+            (log or logger).info(f"错峰启动：{delay:.1f} 秒后开始签到")
+        return max(0.0, delay)
+
+    def acquire(self, log=None):
+        delay = self.reserve(log)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, log=None):
+        import asyncio
+
+        delay = self.reserve(log)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class CheckinPipeline:
+    """
+    流水线调度：代理获取 → 浏览器预热 → 签到，三个阶段之间用有界队列连接。
+    前面的账号签到时，后续账号的代理和浏览器已在准备，工作线程一空出来即可开始；
+    就绪队列容量（PIPELINE_PREFETCH）限制了提前启动的浏览器数量，避免内存占用过高。
+    """
+
+    def __init__(self, max_workers, browser_pool=None, stagger_delay=0, prefetch=1, warm_workers=1):
+        self.max_workers = max(1, max_workers)
+        self.browser_pool = browser_pool
+        self.prefetch = max(1, prefetch)
+        self.warm_workers = max(1, warm_workers)
+        # 同时持有代理的最大账号数：代理阶段线程 + 代理队列 + 预热线程 + 就绪队列 + 签到线程
+        self.max_leases = 2 * self.max_workers + 2 * self.prefetch + self.warm_workers
+        self.limiter = StartRateLimiter(5, max(5, stagger_delay)) if stagger_delay > 0 else None
+        self._job_queue = None
+        self._outstanding = 0
+        self._outstanding_lock = threading.Lock()
+
+    def requeue(self, job, delay=0):
+        """
+        在 run() 迭代期间重新排入一个账号（失败重试），delay 秒后进入代理获取阶段
+        :param job: (username, password, reuse_proxy)
+        """
+        with self._outstanding_lock:
+            self._outstanding += 1
+        if delay > 0:
+            timer = threading.Timer(delay, self._job_queue.put, args=(job,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._job_queue.put(job)
+
+    def run(self, jobs):
+        """
+        执行一批账号；迭代期间可通过 requeue() 追加重试，全部完成后结束
+        :param jobs: [(username, password, reuse_proxy), ...]
+        :return: 生成器，按完成顺序产出 (username, result, error)
+        """
+        import queue
+
+        if not jobs:
+            return
+
+        job_queue = queue.Queue()
+        for job in jobs:
+            job_queue.put(job)
+        self._job_queue = job_queue
+        self._outstanding = len(jobs)
+        proxy_queue = queue.Queue(maxsize=self.prefetch)
+        ready_queue = queue.Queue(maxsize=self.prefetch)
+        done_queue = queue.Queue()
+
+        proxy_workers = min(self.max_workers, len(jobs))
+        warm_workers = min(self.warm_workers, len(jobs))
+        checkin_workers = min(self.max_workers, len(jobs))
+        remaining = {'proxy': proxy_workers, 'warm': warm_workers}
+        remaining_lock = threading.Lock()
+
+        def stage_finished(stage, downstream, count):
+            # 某阶段最后一个线程退出时，向下游放入结束标记
+            with remaining_lock:
+                remaining[stage] -= 1
+                last = remaining[stage] == 0
+            if last:
+                for _ in range(count):
+                    downstream.put(None)
+
+        def proxy_stage():
+            try:
+                while True:
+                    job = job_queue.get()
+                    if job is None:
+                        break
+                    username, password, reuse_proxy = job
+                    log = make_account_logger(username)
+                    prepared = PreparedCheckin(username, password, reuse_proxy, Timeline(log.extra['prefix']))
+                    try:
+                        prepared.proxy = acquire_proxy(reuse_proxy, log, prepared.timeline)
+                    except Exception as e:
+                        log.warning(f"预取代理失败，将在签到时重新获取: {e}")
+                        prepared.proxy = None
+                        prepared.proxy_pending = True
+                    # 今日已签到的账号由接口确认后直接完成，不占用浏览器
+                    try:
+                        result = api_fast_path(username, prepared.proxy, log, prepared.timeline)
+                    except Exception as e:
+                        log.warning(f"接口检查异常，交由浏览器处理: {e}")
+                        result = None
+                    if result is not None:
+                        done_queue.put((username, finalize_checkin_result(result, prepared.timeline), None))
+                        continue
+                    proxy_queue.put(prepared)
+            finally:
+                stage_finished('proxy', proxy_queue, warm_workers)
+
+        def warm_stage():
+            try:
+                while True:
+                    prepared = proxy_queue.get()
+                    if prepared is None:
+                        break
+                    log = make_account_logger(prepared.username)
+                    if prepared.proxy_pending:
+                        prepared.queue_span = prepared.timeline.span("queued")
+                        ready_queue.put(prepared)
+                        continue
+                    try:
+                        prepared.driver = warm_up_browser(
+                            prepared.username, prepared.proxy, self.browser_pool, log, prepared.timeline
+                        )
+                    except Exception as e:
+                        # 预热失败不影响签到，签到阶段会重新启动浏览器并走正常的失败处理
+                        log.warning(f"浏览器预热失败，将在签到时重新启动: {e}")
+                        prepared.driver = None
+                    prepared.queue_span = prepared.timeline.span("queued")
+                    ready_queue.put(prepared)
+            finally:
+                stage_finished('warm', ready_queue, checkin_workers)
+
+        def checkin_stage():
+            while True:
+                prepared = ready_queue.get()
+                if prepared is None:
+                    break
+                log = make_account_logger(prepared.username)
+                if self.limiter is not None:
+                    self.limiter.acquire(log)
+                try:
+                    result = run_checkin(
+                        prepared.username,
+                        prepared.password,
+                        prepared.reuse_proxy,
+                        self.browser_pool,
+                        prepared=prepared,
+                    )
+                    done_queue.put((prepared.username, result, None))
+                except Exception as e:
+                    # 没有签到结果可反馈给代理池，直接归还占用
+                    release_proxy_lease(prepared.proxy)
+                    done_queue.put((prepared.username, None, e))
+
+        threads = (
+            [threading.Thread(target=proxy_stage, name=f"proxy-{i}", daemon=True) for i in range(proxy_workers)]
+            + [threading.Thread(target=warm_stage, name=f"warm-{i}", daemon=True) for i in range(warm_workers)]
+            + [threading.Thread(target=checkin_stage, name=f"checkin-{i}", daemon=True) for i in range(checkin_workers)]
+        )
+        for thread in threads:
+            thread.start()
+
+        while True:
+            with self._outstanding_lock:
+                if self._outstanding == 0:
+                    break
+                self._outstanding -= 1
+            yield done_queue.get()
+
+        # 没有待执行和待重试的账号后，通知代理阶段的线程退出，结束标记沿流水线向下传递
+        for _ in range(proxy_workers):
+            job_queue.put(None)
+        for thread in threads:
+            thread.join()
+
+
+class AsyncCheckinPipeline:
+    """
+    asyncio 调度引擎（RUN_ENGINE=asyncio），与 CheckinPipeline 接口一致。
+    每个账号是一个协程：代理获取与验证等网络阶段在默认线程池中并发，互不占用浏览器名额；
+    阻塞的 Selenium 调用（浏览器预热、签到）放入有界线程池执行。
+    设置单账号截止时间（ACCOUNT_DEADLINE）后，超时的账号被取消并强制关闭其浏览器。
+    """
+
+    def __init__(self, max_workers, browser_pool=None, stagger_delay=0, prefetch=1, deadline=0):
+        """
+        :param deadline: 单个账号实际执行（获取代理、预热浏览器与签到）的最长时间（秒），排队等待名额的时间不计入，0 表示不限
+        """
+        self.max_workers = max(1, max_workers)
+        self.browser_pool = browser_pool
+        self.prefetch = max(1, prefetch)
+        self.deadline = deadline
+        # 只有拿到浏览器名额的账号才租用代理
+        self.max_leases = self.max_workers + self.prefetch
+        self.limiter = StartRateLimiter(5, max(5, stagger_delay)) if stagger_delay > 0 else None
+        self._cancel_lock = threading.Lock()
+        self._loop = None
+        self._spawn = None
+        self._outstanding = 0
+
+    def requeue(self, job, delay=0):
+        """
+        在 run() 迭代期间重新排入一个账号（失败重试），delay 秒后开始
+        :param job: (username, password, reuse_proxy)
+        """
+        self._outstanding += 1
+        self._loop.call_soon_threadsafe(self._spawn, job, delay)
+
+    def run(self, jobs):
+        """
+        执行一批账号（事件循环运行在独立线程中）；迭代期间可通过 requeue() 追加重试，全部完成后结束
+        :param jobs: [(username, password, reuse_proxy), ...]
+        :return: 生成器，按完成顺序产出 (username, result, error)
+        """
+        import asyncio
+        import queue
+
+        if not jobs:
+            return
+
+        done_queue = queue.Queue()
+        ready = threading.Event()
+        finished = {}
+        self._outstanding = len(jobs)
+        loop_thread = threading.Thread(
+            target=lambda: asyncio.run(self._run_all(jobs, done_queue.put, ready, finished)),
+            name="checkin-loop",
+            daemon=True,
+        )
+        loop_thread.start()
+        ready.wait()
+        while self._outstanding > 0:
+            self._outstanding -= 1
+            yield done_queue.get()
+        self._loop.call_soon_threadsafe(finished['event'].set)
+        loop_thread.join()
+
+    async def _run_all(self, jobs, emit, ready, finished):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        # 同时存在的浏览器数 = 签到并发数 + 提前预热数，Selenium 线程池与之等大
+        browser_slots = self.max_workers + self.prefetch
+        executor = ThreadPoolExecutor(max_workers=browser_slots, thread_name_prefix="selenium")
+        browsers = asyncio.Semaphore(browser_slots)
+        checkin_slots = asyncio.Semaphore(self.max_workers)
+        tasks = set()
+
+        async def delayed(job, delay):
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._account(job, emit, executor, browsers, checkin_slots)
+
+        def spawn(job, delay=0):
+            task = asyncio.ensure_future(delayed(job, delay))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        self._loop = asyncio.get_running_loop()
+        self._spawn = spawn
+        finished['event'] = asyncio.Event()
+        ready.set()
+        try:
+            for job in jobs:
+                spawn(job)
+            # 由 run() 在所有账号（含重试）完成后通知结束
+            await finished['event'].wait()
+        finally:
+            # 被取消账号的线程在浏览器关闭后会自行结束，这里不再等待
+            executor.shutdown(wait=False)
+
+    async def _account(self, job, emit, executor, browsers, checkin_slots):
+        import asyncio
+
+        username, password, reuse_proxy = job
+        log = make_account_logger(username)
+        prepared = PreparedCheckin(
+            username, password, reuse_proxy, Timeline(log.extra['prefix']), cancel_lock=self._cancel_lock
+        )
+        try:
+            result = await self._checkin(prepared, log, executor, browsers, checkin_slots)
+            emit((username, result, None))
+        except asyncio.TimeoutError:
+            log.error(f"签到超过截止时间 {self.deadline} 秒，已取消")
+            await self._abort(prepared, log)
+            emit((username, None, TimeoutError(f"超过截止时间 {self.deadline} 秒")))
+        except Exception as e:
+            release_proxy_lease(prepared.proxy)
+            emit((username, None, e))
+
+    async def _checkin(self, prepared, log, executor, browsers, checkin_slots):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        spent = 0.0
+
+        async def within_deadline(awaitable):
+            # 截止时间只计算实际执行的时间，排队等待浏览器名额、签到名额与限速的时间不计入
+            nonlocal spent
+            start = loop.time()
+            try:
+                if self.deadline > 0:
+                    return await asyncio.wait_for(awaitable, max(0.0, self.deadline - spent))
+                return await awaitable
+            finally:
+                spent += loop.time() - start
+
+        def lease():
+            # 在线程内写回代理：协程被取消后才租到的代理直接归还
+            proxy = acquire_proxy(prepared.reuse_proxy, log, prepared.timeline)
+            if not prepared.attach_proxy(proxy):
+                release_proxy_lease(proxy)
+
+        def warm():
+            # 在线程内写回 driver：协程被取消后，预热完成的浏览器仍能被找到并关闭
+            try:
+                driver = warm_up_browser(
+                    prepared.username, prepared.proxy, self.browser_pool, log, prepared.timeline
+                )
+            except Exception as e:
+                # 预热失败不影响签到，签到阶段会重新启动浏览器并走正常的失败处理
+                log.warning(f"浏览器预热失败，将在签到时重新启动: {e}")
+                return
+            if not prepared.attach_driver(driver):
+                release_browser(driver, self.browser_pool, log)
+
+        # 拿到浏览器名额后才租用代理：排队中的账号不占用代理，避免代理在等待期间过期
+        async with browsers:
+            try:
+                await within_deadline(asyncio.to_thread(lease))
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                log.warning(f"预取代理失败，将在签到时重新获取: {e}")
+                prepared.proxy = None
+                prepared.proxy_pending = True
+            # 今日已签到的账号由接口确认后直接完成，不再启动浏览器
+            try:
+                result = await within_deadline(asyncio.to_thread(
+                    api_fast_path, prepared.username, prepared.proxy, log, prepared.timeline
+                ))
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                log.warning(f"接口检查异常，交由浏览器处理: {e}")
+                result = None
+            if result is not None:
+                return finalize_checkin_result(result, prepared.timeline)
+
+            if not prepared.proxy_pending:
+                await within_deadline(loop.run_in_executor(executor, warm))
+            prepared.queue_span = prepared.timeline.span("queued")
+            async with checkin_slots:
+                if self.limiter is not None:
+                    await self.limiter.acquire_async(log)
+                return await within_deadline(loop.run_in_executor(
+                    executor,
+                    lambda: run_checkin(
+                        prepared.username,
+                        prepared.password,
+                        prepared.reuse_proxy,
+                        self.browser_pool,
+                        prepared=prepared,
+                    ),
+                ))
+
+    async def _abort(self, prepared, log):
+        """强制关闭被取消账号的浏览器，使阻塞在 Selenium 调用中的线程尽快出错返回"""
+        import asyncio
+
+        # 预热的浏览器或签到阶段重新启动的浏览器都登记在 prepared.driver 上
+        driver = prepared.cancel()
+        if driver is None:
+            return
+        try:
+            await asyncio.to_thread(quit_driver, driver, log)
+        except Exception as e:
+            log.warning(f"关闭超时账号的浏览器失败: {e}")
+
+
+def create_checkin_pipeline(max_workers, browser_pool, stagger_delay):
+    """按 RUN_ENGINE（thread / asyncio，默认 thread）创建签到调度引擎"""
+    prefetch = int(os.getenv("PIPELINE_PREFETCH", "1"))
+    engine = os.getenv("RUN_ENGINE", "thread").strip().lower()
+    if engine == "asyncio":
+        deadline = int(os.getenv("ACCOUNT_DEADLINE", "0"))
+        logger.info(f"使用 asyncio 调度引擎（单账号截止时间: {f'{deadline} 秒' if deadline > 0 else '不限'}）")
+        return AsyncCheckinPipeline(
+            max_workers,
+            browser_pool=browser_pool,
+            stagger_delay=stagger_delay,
+            prefetch=prefetch,
+            deadline=deadline,
+        )
+    if engine != "thread":
+        logger.warning(f"无效的 RUN_ENGINE '{engine}'，使用默认的 thread 引擎")
+    return CheckinPipeline(
+        max_workers,
+        browser_pool=browser_pool,
+        stagger_delay=stagger_delay,
+        prefetch=prefetch,
+    )
+
+
+def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None, browser_pool=None, prepared=None):
+    """
+    执行签到任务，并记录各阶段耗时（result['timeline']，同时写入 logs/timeline_<日期>.jsonl）
+    :param reuse_proxy: 重试时复用的上次代理
+    :param browser_pool: 浏览器池，为 None 时每次冷启动浏览器并在结束时关闭
+    :param prepared: 流水线预处理阶段已就绪的代理与浏览器（PreparedCheckin），为 None 时在本函数内获取
+    """
+    current_user = account_user or user
+    if prepared is not None:
+        timeline = prepared.timeline
+        if prepared.queue_span is not None:
+            prepared.queue_span.end()
+    else:
+        timeline = Timeline(f"{current_user[:3]}***{current_user[-3:] if len(current_user) > 6 else current_user}")
+    result = _run_checkin(account_user, account_pwd, reuse_proxy, browser_pool, timeline, prepared)
+    return finalize_checkin_result(result, timeline)
+
+
+def finalize_checkin_result(result, timeline):
+    """结束计时并把阶段耗时与网络探测结果附加到签到结果上"""
+    timeline.finish()
+    result['timeline'] = timeline.write_trace(result)
+    network = get_reachability_service().snapshot()
+    if network is not None:
+        result['network'] = network
+    if timeline.resources is not None:
+        result['resources'] = timeline.resources
+        resources = timeline.resources
+        logger.info(
+            f"[{timeline.account}] 资源拦截（{resources['profile']}"
+            + ("，采样未拦截" if resources['sampled'] else "")
+            + f"）: {'可拦截' if resources['sampled'] else '拦截'} {resources['blocked']} 个请求，"
+            f"{'共' if resources['sampled'] else '节省约'} {resources['saved_bytes'] / 1024:.1f} KB"
+            + (f"（另有 {resources['unmeasured']} 个未知大小）" if resources['unmeasured'] else "")
+            + f"，实际加载 {resources['loaded_bytes'] / 1024:.1f} KB"
+        )
+    logger.info(
+        f"[{timeline.account}] 阶段耗时: 合计 {timeline.total:.1f}s | "
+        + ", ".join(
+            f"{TIMELINE_PHASES.get(name, name)} {seconds:.1f}s"
+            for name, seconds in timeline.phase_totals().items()
+        )
+    )
+    return result
+
+
+def _run_checkin(account_user, account_pwd, reuse_proxy, browser_pool, timeline, prepared=None):
     # 导入Selenium模块
     modules = import_selenium_modules()
     webdriver = modules['webdriver']
@@ -3248,78 +6815,46 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
     WebDriverWait = modules['WebDriverWait']
     TimeoutException = modules['TimeoutException']
     WebDriverException = modules['WebDriverException']
-    import subprocess
     
     current_user = account_user or user
     current_pwd = account_pwd or pwd
     driver = None  # 初始化为 None，确保在任何情况下都能安全清理
     retry_stats = {'count': 0}
+    # 最近一次验证码处理是否未通过，用于把之后的失败归类为验证码失败（而非按消息文字或重试次数推测）
+    captcha_failed = False
 
     # 创建带前缀的 Log Adapter
-    masked_user = f"{current_user[:3]}***{current_user[-3:] if len(current_user) > 6 else current_user}"
-    
-    class PrefixAdapter(logging.LoggerAdapter):
-        def process(self, msg, kwargs):
-            return '[%s] %s' % (self.extra['prefix'], msg), kwargs
-
-    # 使用 Adapter 替换原有的 logger
-    logger_adapter = PrefixAdapter(logger, {'prefix': masked_user})
+    logger_adapter = make_account_logger(current_user)
     
     proxy = None  # 提前初始化，确保异常处理中可安全引用
     try:
         logger_adapter.info(f"开始执行签到任务...")
         
-        # 获取代理IP（每个账号单独获取）
-        proxy_api_url = os.getenv("PROXY_API_URL", "").strip()
-        if proxy_api_url:
-            # 优先使用配置的代理接口（付费/自建）
-            proxy = get_proxy_ip()
-            if proxy:
-                # 验证代理可用性
-                if validate_proxy(proxy):
-                    logger_adapter.info(f"代理 {proxy} 验证通过，将使用此代理")
-                else:
-                    logger_adapter.warning(f"代理 {proxy} 验证失败，将使用本地IP继续")
+        if prepared is not None:
+            # 代理与浏览器已由流水线预处理阶段准备好
+            proxy = prepared.proxy
+            driver = prepared.driver
+            if prepared.proxy_pending:
+                # 预取阶段获取代理出错，浏览器未预热，在此重新获取后再启动浏览器
+                proxy = acquire_proxy(reuse_proxy, logger_adapter, timeline)
+                if not prepared.attach_proxy(proxy):
+                    release_proxy_lease(proxy)
                     proxy = None
-            else:
-                logger_adapter.warning("获取代理失败，将使用本地IP继续")
-        elif _IN_ACTIONS or check_rainyun_blocked():
-            # 海外 IP 会被雨云拒绝连接（浏览器显示 This site can't be reached），
-            # 自动抓取国内免费代理绕过拦截。
-            # 覆盖 GitHub Actions、海外 VPS、Docker 等所有海外环境。
-            # 重试时优先复用上次的代理：换 IP 会导致服务器 Cookie 失效，
-            # 进而被迫走密码登录，而慢代理下密码登录容易超时失败。
-            if reuse_proxy:
-                if validate_proxy(reuse_proxy):
-                    proxy = reuse_proxy
-                    logger_adapter.info(f"复用上次代理: {proxy}（避免换 IP 导致 Cookie 失效）")
-                else:
-                    logger_adapter.warning(f"上次代理 {reuse_proxy} 已失效，重新抓取国内代理")
-                    proxy = get_freeproxy_ip()
-            else:
-                proxy = get_freeproxy_ip()
-            if proxy:
-                logger_adapter.info(f"国内代理 {proxy} 已就绪，用于绕过海外 IP 拦截")
-            else:
-                logger_adapter.warning("未获取到可用国内代理，直连可能被拒绝连接")
-        
-        logger_adapter.info("初始化 Selenium（账号专属配置）")
-        driver = init_selenium(current_user, proxy=proxy)
-        apply_browser_timezone(driver)
-        
-        # 过 Selenium 检测
-        with open("stealth.min.js", mode="r") as f:
-            js = f.read()
-        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-            "source": js
-        })
-        
-        # 注入浏览器指纹随机化脚本（基于账号生成确定性指纹）
-        fingerprint_js = generate_fingerprint_script(current_user)
-        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-            "source": fingerprint_js
-        })
-        logger_adapter.info("已注入浏览器指纹脚本（账号专属指纹）")
+                    raise RuntimeError("账号已被取消")
+                prepared.proxy_pending = False
+        else:
+            # 获取代理IP（每个账号单独获取）
+            proxy = acquire_proxy(reuse_proxy, logger_adapter, timeline)
+            fast_result = api_fast_path(current_user, proxy, logger_adapter, timeline)
+            if fast_result is not None:
+                return fast_result
+        if driver is None:
+            driver = warm_up_browser(current_user, proxy, browser_pool, logger_adapter, timeline)
+            if prepared is not None and not prepared.attach_driver(driver):
+                # 启动浏览器期间账号已超过截止时间被取消
+                release_browser(driver, browser_pool, logger_adapter)
+                driver = None
+                raise RuntimeError("账号已被取消")
         
         wait = WebDriverWait(driver, timeout)
         
@@ -3328,15 +6863,22 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
         # 需要捕获并标记为代理失败，让重试机制换新代理而非复用旧代理。
         proxy_failed = False
         try:
-            load_cookies(driver, current_user)
-            logger_adapter.info("正在跳转积分页...")
-            driver.get("https://app.rainyun.com/account/reward/earn")
-            time.sleep(3)
+            if timeline.timed("load_cookies", load_cookies, driver, current_user):
+                logger_adapter.info("正在跳转积分页...")
+                with timeline.span("earn_page"):
+                    driver.get("https://app.rainyun.com/account/reward/earn")
+                    wait_page_settled(driver, budget=3)
+            else:
+                # 无可用 Cookie：直接打开登录页，省去积分页加载与重定向
+                logger_adapter.info("正在打开登录页...")
+                with timeline.span("earn_page", redirect="login"):
+                    driver.get("https://app.rainyun.com/auth/login")
+                    wait_page_settled(driver, budget=3)
         except WebDriverException as e:
             error_msg = str(e)
             if any(kw in error_msg for kw in ("ERR_PROXY", "ERR_INTERNET_DISCONNECTED", "ERR_NAME_NOT_RESOLVED", "ERR_TIMED_OUT", "ERR_CONNECTION", "Timed out receiving message from renderer")):
                 logger_adapter.error(f"代理连接失败，页面无法加载: {error_msg[:200]}")
-                screenshot_path = save_screenshot(driver, current_user, status="failure")
+                screenshot_path = timeline.timed("screenshot", save_screenshot, driver, current_user, status="failure")
                 return {
                     'status': False, 'msg': '代理连接失败，页面无法加载', 'points': 0,
                     'username': f"{current_user[:3]}***{current_user[-3:] if len(current_user) > 6 else current_user}",
@@ -3352,7 +6894,7 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
             page_src = driver.page_source or ""
             if len(page_src) < 500:
                 logger_adapter.error(f"页面加载不完整（源码仅 {len(page_src)} 字符），疑似代理过慢")
-                screenshot_path = save_screenshot(driver, current_user, status="failure")
+                screenshot_path = timeline.timed("screenshot", save_screenshot, driver, current_user, status="failure")
                 return {
                     'status': False, 'msg': '代理过慢导致页面加载不完整', 'points': 0,
                     'username': f"{current_user[:3]}***{current_user[-3:] if len(current_user) > 6 else current_user}",
@@ -3360,6 +6902,7 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
                     'proxy': proxy, 'proxy_failed': True
                 }
             logger_adapter.info("Cookie 已失效，使用账号密码登录")
+            login_span = timeline.span("login")
             
             try:
                 username = wait.until(EC.visibility_of_element_located((By.NAME, 'login-field')))
@@ -3372,7 +6915,7 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
             except TimeoutException:
                 # 登录表单元素超时未找到：通常是代理太慢导致 JS bundle 没下载完，页面没渲染
                 logger_adapter.error("登录表单加载超时，疑似代理过慢导致页面未渲染完成")
-                screenshot_path = save_screenshot(driver, current_user, status="failure")
+                screenshot_path = timeline.timed("screenshot", save_screenshot, driver, current_user, status="failure")
                 return {
                     'status': False, 'msg': '代理过慢导致登录表单加载超时', 'points': 0,
                     'username': f"{current_user[:3]}***{current_user[-3:] if len(current_user) > 6 else current_user}",
@@ -3401,12 +6944,12 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
                         if any(kw in toast_text for kw in _login_error_keywords):
                             fail_reason = f"账号或密码错误（{toast_text}），请检查环境变量/GitHub Secrets 中的 RAINYUN_USERNAME / RAINYUN_PASSWORD"
                             logger_adapter.error(f"登录失败: {fail_reason}")
-                            screenshot_path = save_screenshot(driver, current_user, status="failure")
+                            screenshot_path = timeline.timed("screenshot", save_screenshot, driver, current_user, status="failure")
                             return {
                                 'status': False, 'msg': fail_reason, 'points': 0,
                                 'username': f"{current_user[:3]}***{current_user[-3:] if len(current_user) > 6 else current_user}",
                                 'retries': retry_stats['count'], 'screenshot': screenshot_path,
-                                'proxy': proxy, 'proxy_failed': False
+                                'proxy': proxy, 'proxy_failed': False, 'failure': 'credentials'
                             }
                 except Exception:
                     pass
@@ -3417,7 +6960,8 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
                         logger_adapter.warning("触发验证码！")
                         driver.switch_to.frame("tcaptcha_iframe_dy")
                         captcha_provider = CaptchaFactory.create_provider("tencent")
-                        captcha_provider.solve(driver, timeout, retry_stats, logger_adapter)
+                        with timeline.span("captcha", context="login"):
+                            captcha_failed = not captcha_provider.solve(driver, timeout, retry_stats, logger_adapter)
                         captcha_handled = True
                         break
                 except Exception:
@@ -3449,28 +6993,36 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
             try:
                 login_outcome = WebDriverWait(driver, 30).until(_check_login_result)
                 if login_outcome == "success":
+                    login_span.end()
                     logger_adapter.info("登录成功！")
                     save_cookies(driver, current_user)
-                    driver.get("https://app.rainyun.com/account/reward/earn")
-                    time.sleep(2)
+                    with timeline.span("earn_page"):
+                        driver.get("https://app.rainyun.com/account/reward/earn")
+                        wait_page_settled(driver, budget=2)
                 else:
                     # 页面显示了 toast 错误提示 → 账号密码错误，非代理问题
                     toast_msg = login_outcome[1] if isinstance(login_outcome, tuple) else ""
                     fail_reason = f"账号或密码错误（{toast_msg}），请检查环境变量/GitHub Secrets 中的 RAINYUN_USERNAME / RAINYUN_PASSWORD"
                     logger_adapter.error(f"登录失败: {fail_reason}")
-                    screenshot_path = save_screenshot(driver, current_user, status="failure")
+                    screenshot_path = timeline.timed("screenshot", save_screenshot, driver, current_user, status="failure")
                     return {
                         'status': False, 'msg': fail_reason, 'points': 0,
                         'username': f"{current_user[:3]}***{current_user[-3:] if len(current_user) > 6 else current_user}",
                         'retries': retry_stats['count'], 'screenshot': screenshot_path,
-                        'proxy': proxy, 'proxy_failed': False
+                        'proxy': proxy, 'proxy_failed': False, 'failure': 'credentials'
                     }
             except TimeoutException:
                 # 30秒内既没有跳转也没有 toast 错误 → 登录请求未完成 → 代理过慢
+                failure_class = None
                 if "/auth/login" in driver.current_url:
                     if current_user in ("username", "") or current_pwd in ("password", ""):
                         fail_reason = "未配置雨云账号密码（请检查环境变量/GitHub Secrets: RAINYUN_USERNAME / RAINYUN_PASSWORD）"
                         is_proxy_fail = False
+                        failure_class = "credentials"
+                    elif captcha_failed:
+                        fail_reason = "登录验证码未通过，30秒内无跳转"
+                        is_proxy_fail = False
+                        failure_class = "captcha"
                     elif proxy:
                         fail_reason = "代理过慢导致登录超时（30秒内无跳转且无错误提示），已标记代理失败将换新代理重试"
                         is_proxy_fail = True
@@ -3481,12 +7033,12 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
                     fail_reason = f"登录后跳转异常（当前页面: {driver.current_url}）"
                     is_proxy_fail = False
                 logger_adapter.error(f"登录失败: {fail_reason}")
-                screenshot_path = save_screenshot(driver, current_user, status="failure")
+                screenshot_path = timeline.timed("screenshot", save_screenshot, driver, current_user, status="failure")
                 return {
                     'status': False, 'msg': fail_reason, 'points': 0,
                     'username': f"{current_user[:3]}***{current_user[-3:] if len(current_user) > 6 else current_user}",
                     'retries': retry_stats['count'], 'screenshot': screenshot_path,
-                    'proxy': proxy, 'proxy_failed': is_proxy_fail
+                    'proxy': proxy, 'proxy_failed': is_proxy_fail, 'failure': failure_class
                 }
         else:
             logger_adapter.info("Cookie 有效，免密登录成功！🎉")
@@ -3496,7 +7048,7 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
             driver.get("https://app.rainyun.com/account/reward/earn")
 
         driver.implicitly_wait(5)
-        time.sleep(1)
+        wait_page_settled(driver, budget=1)
         dismiss_modal_confirm(driver, timeout)
         dismiss_modal_confirm(driver, timeout)
         
@@ -3521,11 +7073,13 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
             state = wait_captcha_or_modal(driver, timeout)
             if state == "captcha":
                 logger_adapter.info("处理验证码")
+                captcha_failed = True
                 try:
                     captcha_iframe = wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, "iframe[id^='tcaptcha_iframe']")))
                     driver.switch_to.frame(captcha_iframe)
                     captcha_provider = CaptchaFactory.create_provider("tencent")
-                    captcha_provider.solve(driver, timeout, retry_stats, logger_adapter)
+                    with timeline.span("captcha", context="checkin"):
+                        captcha_failed = not captcha_provider.solve(driver, timeout, retry_stats, logger_adapter)
                 finally:
                     driver.switch_to.default_content()
                 driver.implicitly_wait(5)
@@ -3535,9 +7089,20 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
             # 轮询等待按钮变为"已完成"：点击后可能因网络问题导致验证码弹窗（t_verify 三个点加载框）
             # 迟迟未加载出 tcaptcha_iframe，wait_captcha_or_modal 误判为"未触发验证码"。
             # 此时按钮仍为"领取奖励"，需检测 t_verify 加载框并等待真正的验证码弹窗出现后处理。
+            poll_span = timeline.span("button_poll")
+            def checkin_state_changed(d):
+                # 用 JS 一次性检查按钮文字和验证码加载框，避免 find_element 受隐式等待拖慢
+                return d.execute_script(
+                    "const node = document.evaluate(arguments[0], document, null, "
+                    "XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;"
+                    "const text = node ? node.textContent.trim() : '';"
+                    "return text !== '领取奖励' || !!document.querySelector('div#t_verify');",
+                    CHECKIN_BTN_XPATH,
+                )
+
             poll_deadline = time.time() + 60
             while time.time() < poll_deadline:
-                time.sleep(3)
+                smart_wait(driver, checkin_state_changed, "button", budget=3, poll=0.25)
                 try:
                     earn = driver.find_element(By.XPATH, CHECKIN_BTN_XPATH)
                     btn_text = earn.text.strip()
@@ -3555,12 +7120,14 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
                 t_verify_elems = driver.find_elements(By.CSS_SELECTOR, "div#t_verify")
                 if t_verify_elems:
                     logger_adapter.info("检测到验证码加载框（三个点）仍在加载，等待验证码弹窗出现...")
+                    captcha_failed = True
                     try:
                         captcha_iframe = wait.until(EC.visibility_of_element_located(
                             (By.CSS_SELECTOR, "iframe[id^='tcaptcha_iframe']")))
                         driver.switch_to.frame(captcha_iframe)
                         captcha_provider = CaptchaFactory.create_provider("tencent")
-                        captcha_provider.solve(driver, timeout, retry_stats, logger_adapter)
+                        with timeline.span("captcha", context="checkin_delayed"):
+                            captcha_failed = not captcha_provider.solve(driver, timeout, retry_stats, logger_adapter)
                     except TimeoutException:
                         logger_adapter.warning("等待验证码弹窗超时，验证码可能已消失")
                     finally:
@@ -3571,6 +7138,7 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
                     logger_adapter.warning("按钮仍为「领取奖励」且无验证码加载框，继续等待...")
             else:
                 logger_adapter.warning("轮询等待签到完成超时（60秒），继续后续流程")
+            poll_span.end()
         else:
             logger_adapter.info(f"今日已签到（按钮显示: {btn_text}）")
 
@@ -3584,7 +7152,7 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
             logger_adapter.info(f"当前剩余积分: {current_points} | 约为 {current_points / 2000:.2f} 元")
         logger_adapter.info("签到任务执行成功！")
         # 保存成功截图
-        screenshot_path = save_screenshot(driver, current_user, status="success")
+        screenshot_path = timeline.timed("screenshot", save_screenshot, driver, current_user, status="success")
         return {
             'status': True,
             'msg': '签到成功',
@@ -3611,7 +7179,7 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
         # 保存失败截图
         screenshot_path = None
         if driver is not None:
-            screenshot_path = save_screenshot(driver, current_user, status="failure")
+            screenshot_path = timeline.timed("screenshot", save_screenshot, driver, current_user, status="failure")
         return {
             'status': False,
             'msg': f'执行异常: {str(e)[:50]}...',
@@ -3620,64 +7188,23 @@ def run_checkin(account_user=None, account_pwd=None, reuse_proxy=None):
             'retries': retry_stats['count'],
             'screenshot': screenshot_path,
             'proxy': proxy,
-            'proxy_failed': is_proxy_error
+            'proxy_failed': is_proxy_error,
+            'failure': "captcha" if captcha_failed and not is_proxy_error else None
         }
     finally:
-        # 确保在任何情况下都关闭 WebDriver
-        if driver is not None:
-            try:
-                logger_adapter.info("正在关闭 WebDriver...")
-                
-                # 首先尝试正常关闭
-                try:
-                    driver.quit()
-                    logger_adapter.info("WebDriver 已安全关闭")
-                except Exception as e:
-                    logger_adapter.error(f"关闭 WebDriver 时出错: {e}")
-                
-                # 等待一小段时间让进程完全退出
-                time.sleep(1)
-                
-                # 强制终止 ChromeDriver 进程及其子进程
-                try:
-                    if hasattr(driver, 'service') and driver.service.process:
-                        process = driver.service.process
-                        pid = process.pid
-                        
-                        # 1. 先尝试杀掉该 ChromeDriver 衍生的子进程 (Chrome 浏览器)
-                        # 避免僵尸 Chrome 进程残留
-                        if os.name == 'posix' and pid:
-                            try:
-                                # pkill -P <pid> 仅杀掉指定父进程的子进程
-                                logger_adapter.info(f"正在清理 PID {pid} 的衍生进程...")
-                                subprocess.run(['pkill', '-9', '-P', str(pid)], 
-                                             stderr=subprocess.DEVNULL)
-                            except Exception:
-                                pass
-
-                        # 2. 再杀掉 ChromeDriver 本身
-                        if process.poll() is None:  # 进程仍在运行
-                            process.terminate()
-                            try:
-                                process.wait(timeout=2)
-                            except subprocess.TimeoutExpired:
-                                process.kill()
-                                process.wait()
-                            logger_adapter.info(f"已终止 ChromeDriver 进程 (PID: {pid})")
-                except Exception as e:
-                    logger_adapter.debug(f"清理 ChromeDriver 进程时出错: {e}")
-                
-
-                        
-            except Exception as e:
-                logger_adapter.error(f"WebDriver 清理过程出现异常: {e}")
+        # 确保在任何情况下都关闭（或归还）WebDriver；已在取消时被强制关闭的浏览器不再处理
+        if driver is not None and (prepared is None or prepared.detach_driver(driver)):
+            timeline.resources = collect_resource_stats(driver)
+            with timeline.span("teardown", pooled=browser_pool is not None):
+                release_browser(driver, browser_pool, logger_adapter)
         
-        # 卸载Selenium模块，释放内存
-        try:
-            unload_selenium_modules()
-            logger.debug("已卸载Selenium模块")
-        except:
-            pass
+        # 卸载Selenium模块，释放内存（使用浏览器池时由 run_all_accounts 在关闭池后统一卸载）
+        if browser_pool is None:
+            try:
+                unload_selenium_modules()
+                logger.debug("已卸载Selenium模块")
+            except:
+                pass
 
 
 def scheduled_checkin():
@@ -3760,6 +7287,8 @@ if __name__ == "__main__":
     cleanup_zombie_processes()
     
     if run_mode == "schedule":
+        import schedule
+
         # 定时模式
         logger.info(f"启动定时模式，每天 {schedule_time} 自动执行签到")
         logger.info("程序将持续运行，按 Ctrl+C 退出")
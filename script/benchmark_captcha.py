@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+验证码离线基准测试：回放 logs/captcha_debug 下保存的调试样本，统计求解耗时与准确率。
+
+用法：
+    python script/benchmark_captcha.py [样本目录] [--labels labels.json] [--output result.json]
+
+样本目录下每个包含 captcha.jpg 与 sprite.jpg 的子目录视为一个样本。
+标注（可选）为 3 个点击点的原图像素坐标，顺序与 sprite 中的 3 个图案一致，来源：
+    1. --labels 指定的 JSON 文件：{"<样本相对路径>": [[x1, y1], [x2, y2], [x3, y3]], ...}
+    2. 样本目录内的 labels.json：[[x1, y1], [x2, y2], [x3, y3]] 或 {"points": [...]}
+未标注的样本只统计耗时。结果写入 JSON，便于不同版本之间对比速度与准确率的回归。
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import rainyun  # noqa: E402
+
+STAGES = ("detection", "ocr", "sift", "template_fallback")
+
+
+class PrefixAdapter(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        return '[%s] %s' % (self.extra['prefix'], msg), kwargs
+
+
+def find_bundles(root):
+    """查找所有包含 captcha.jpg 与 sprite.jpg 的样本目录"""
+    bundles = []
+    for dirpath, _, filenames in os.walk(root):
+        if "captcha.jpg" in filenames and "sprite.jpg" in filenames:
+            bundles.append(dirpath)
+    return sorted(bundles)
+
+
+def normalize_points(value):
+    if isinstance(value, dict):
+        value = value.get("points")
+    if not isinstance(value, list) or len(value) != 3:
+        return None
+    try:
+        return [(float(point[0]), float(point[1])) for point in value]
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def load_labels(labels_path):
+    if not labels_path:
+        return {}
+    with open(labels_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {key.replace("\\", "/").strip("/"): normalize_points(value) for key, value in raw.items()}
+
+
+def bundle_label(bundle_dir, relative_path, labels):
+    if labels.get(relative_path):
+        return labels[relative_path]
+    label_path = os.path.join(bundle_dir, "labels.json")
+    if os.path.exists(label_path):
+        with open(label_path, "r", encoding="utf-8") as f:
+            return normalize_points(json.load(f))
+    return None
+
+
+def parse_position(position):
+    x, y = position.split(",")
+    return float(x), float(y)
+
+
+def percentile(values, pct):
+    """最近秩法百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def describe(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": max(values),
+    }
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run_bundle(provider, bundle_dir, relative_path, label, tolerance, log):
+    captcha_bytes = read_bytes(os.path.join(bundle_dir, "captcha.jpg"))
+    sprite_bytes = read_bytes(os.path.join(bundle_dir, "sprite.jpg"))
+
+    record = {"bundle": relative_path, "labelled": label is not None}
+    try:
+        solution = provider.solve_offline(captcha_bytes, sprite_bytes, log)
+    except Exception as e:
+        record.update({"error": str(e), "solved": False, "correct": False if label else None})
+        return record
+
+    positions = solution["positions"]
+    record.update({
+        "elapsed": solution["elapsed"],
+        "timings": solution["timings"],
+        "positions": positions,
+        "used_fallback": solution["used_fallback"],
+        "best_total_score": solution["best_total_score"],
+        "fallback_total_score": solution["fallback_total_score"],
+        "solved": len(positions) == 3,
+    })
+    if label is not None:
+        distances = []
+        for position, expected in zip(positions, label):
+            distances.append(math.dist(parse_position(position), expected))
+        hits = [distance <= tolerance for distance in distances]
+        record["distances"] = distances
+        record["point_hits"] = sum(hits)
+        record["correct"] = len(positions) == 3 and all(hits)
+    return record
+
+
+def summarize(records):
+    labelled = [record for record in records if record["labelled"]]
+    timed = [record for record in records if "elapsed" in record]
+    summary = {
+        "bundles": len(records),
+        "errors": sum(1 for record in records if "error" in record),
+        "solved": sum(1 for record in records if record.get("solved")),
+        "used_fallback": sum(1 for record in timed if record["used_fallback"]),
+        "labelled": len(labelled),
+        "accuracy": None,
+        "point_accuracy": None,
+        "solve_time": describe([record["elapsed"] for record in timed]),
+        "stages": {
+            stage: describe([record["timings"][stage] for record in timed if stage in record["timings"]])
+            for stage in STAGES
+        },
+    }
+    if labelled:
+        summary["accuracy"] = sum(1 for record in labelled if record.get("correct")) / len(labelled)
+        summary["point_accuracy"] = sum(record.get("point_hits", 0) for record in labelled) / (3 * len(labelled))
+    return summary
+
+
+def format_seconds(stats, key):
+    value = stats.get(key)
+    return "-" if value is None else f"{value * 1000:.0f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放验证码调试样本，统计求解耗时与准确率")
+    parser.add_argument("root", nargs="?", default=os.path.join("logs", "captcha_debug"), help="样本目录")
+    parser.add_argument("--labels", help="标注文件（样本相对路径 -> 3 个点击点）")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="点击点允许的像素误差（默认20）")
+    parser.add_argument("--output", help="结果 JSON 路径（默认 logs/captcha_benchmark/<时间>.json）")
+    parser.add_argument("--limit", type=int, default=0, help="最多回放的样本数（0 为不限）")
+    parser.add_argument("--verbose", action="store_true", help="输出求解器详细日志")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    bundles = find_bundles(args.root)
+    if args.limit > 0:
+        bundles = bundles[:args.limit]
+    if not bundles:
+        print(f"未在 {args.root} 下找到验证码样本")
+        return 1
+    labels = load_labels(args.labels)
+
+    # 预热：加载模型，避免首个样本的耗时包含模型加载
+    rainyun.get_shared_ocr_models()
+
+    provider = rainyun.TencentCaptchaProvider()
+    records = []
+    for index, bundle_dir in enumerate(bundles, start=1):
+        relative_path = os.path.relpath(bundle_dir, args.root).replace(os.sep, "/")
+        log = PrefixAdapter(rainyun.logger, {'prefix': f"bench-{index}"})
+        label = bundle_label(bundle_dir, relative_path, labels)
+        record = run_bundle(provider, bundle_dir, relative_path, label, args.tolerance, log)
+        records.append(record)
+        if "error" in record:
+            verdict = f"出错 ({record['error']})"
+        elif not record["labelled"]:
+            verdict = "未标注"
+        else:
+            verdict = "正确" if record["correct"] else "错误"
+        elapsed = f"{record['elapsed'] * 1000:.0f}ms" if "elapsed" in record else "-"
+        print(f"[{index}/{len(bundles)}] {relative_path}: {verdict}，耗时 {elapsed}")
+
+    summary = summarize(records)
+    result = {
+        "generated_at": rainyun.now_local().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "root": os.path.abspath(args.root),
+        "tolerance": args.tolerance,
+        "summary": summary,
+        "records": records,
+    }
+
+    output = args.output or os.path.join(
+        "logs", "captcha_benchmark", f"{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print("")
+    print(f"样本数: {summary['bundles']}，出错: {summary['errors']}，给出坐标: {summary['solved']}，"
+          f"降级全图匹配: {summary['used_fallback']}")
+    if summary["accuracy"] is not None:
+        print(f"准确率: {summary['accuracy']:.1%}（{summary['labelled']} 个已标注样本），"
+              f"单点准确率: {summary['point_accuracy']:.1%}")
+    solve_time = summary["solve_time"]
+    print(f"求解耗时: p50 {format_seconds(solve_time, 'p50')}，p95 {format_seconds(solve_time, 'p95')}")
+    for stage, stats in summary["stages"].items():
+        print(f"  {stage:<18} p50 {format_seconds(stats, 'p50'):>8}  p95 {format_seconds(stats, 'p95'):>8}  "
+              f"({stats['count']} 个样本)")
+    print(f"结果已写入 {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rainyun  # noqa: E402
+
+
+@pytest.fixture
+def timeline():
+    return rainyun.Timeline("tes***ser")
+
+
+def test_fast_path_returns_result_when_already_checked_in(monkeypatch, timeline):
+    monkeypatch.setenv("API_FAST_PATH", "true")
+    monkeypatch.setattr(rainyun, "fetch_checkin_status", lambda *args, **kwargs: {"done": True, "points": 5})
+
+    result = rainyun.api_fast_path("test_user", None, rainyun.logger, timeline)
+
+    assert result is not None
+    assert result["fast_path"] is True
+    assert result["status"] is True
+    assert result["points"] == 5
+
+
+def test_fast_path_falls_through_when_not_checked_in(monkeypatch, timeline):
+    monkeypatch.setenv("API_FAST_PATH", "true")
+    monkeypatch.setattr(rainyun, "fetch_checkin_status", lambda *args, **kwargs: {"done": False, "points": 5})
+
+    assert rainyun.api_fast_path("test_user", None, rainyun.logger, timeline) is None
+
+
+def test_fast_path_disabled(monkeypatch, timeline):
+    monkeypatch.setenv("API_FAST_PATH", "false")
+    monkeypatch.setattr(rainyun, "fetch_checkin_status", lambda *args, **kwargs: pytest.fail("接口不应被调用"))
+
+    assert rainyun.api_fast_path("test_user", None, rainyun.logger, timeline) is None
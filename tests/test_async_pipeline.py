@@ -0,0 +1,99 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rainyun  # noqa: E402
+
+CHECKIN_SECONDS = 0.2
+
+
+@pytest.fixture
+def fake_checkin(monkeypatch):
+    """替换网络与浏览器阶段：每个账号签到固定耗时 CHECKIN_SECONDS，并记录代理租用时刻"""
+    leases = []
+    lock = threading.Lock()
+
+    def acquire_proxy(reuse_proxy, log, timeline):
+        with lock:
+            leases.append(time.monotonic())
+        return None
+
+    def run_checkin(username, password, reuse_proxy, browser_pool, prepared=None):
+        time.sleep(CHECKIN_SECONDS)
+        return {"status": True, "msg": "ok", "points": 0, "username": username, "retries": 0}
+
+    monkeypatch.setattr(rainyun, "acquire_proxy", acquire_proxy)
+    monkeypatch.setattr(rainyun, "api_fast_path", lambda *args, **kwargs: None)
+    monkeypatch.setattr(rainyun, "warm_up_browser", lambda *args, **kwargs: object())
+    monkeypatch.setattr(rainyun, "release_browser", lambda *args, **kwargs: None)
+    monkeypatch.setattr(rainyun, "quit_driver", lambda *args, **kwargs: None)
+    monkeypatch.setattr(rainyun, "run_checkin", run_checkin)
+    return leases
+
+
+def run_accounts(pipeline, count):
+    jobs = [(f"user{i:02d}", "pwd", None) for i in range(count)]
+    return list(pipeline.run(jobs))
+
+
+def test_deadline_does_not_cover_queueing(fake_checkin):
+    # 5 个账号串行签到共需约 1 秒，远超截止时间，但每个账号自身只需 0.2 秒
+    pipeline = rainyun.AsyncCheckinPipeline(max_workers=1, prefetch=1, deadline=CHECKIN_SECONDS * 2.5)
+
+    outcomes = run_accounts(pipeline, 5)
+
+    assert len(outcomes) == 5
+    assert [error for _, _, error in outcomes if error is not None] == []
+    assert all(result["status"] for _, result, _ in outcomes)
+
+
+def test_deadline_cancels_slow_account(fake_checkin, monkeypatch):
+    monkeypatch.setattr(
+        rainyun, "run_checkin", lambda *args, **kwargs: time.sleep(CHECKIN_SECONDS * 3) or {"status": True}
+    )
+    pipeline = rainyun.AsyncCheckinPipeline(max_workers=1, prefetch=1, deadline=CHECKIN_SECONDS)
+
+    (_, result, error), = run_accounts(pipeline, 1)
+
+    assert result is None
+    assert isinstance(error, TimeoutError)
+
+
+def test_proxies_are_leased_only_with_a_browser_slot(fake_checkin):
+    pipeline = rainyun.AsyncCheckinPipeline(max_workers=1, prefetch=1)
+    started = time.monotonic()
+
+    run_accounts(pipeline, 6)
+
+    # 浏览器名额为 max_workers + prefetch = 2，排队的账号不会提前租用代理
+    early = [lease for lease in fake_checkin if lease - started < CHECKIN_SECONDS / 2]
+    assert len(early) <= 2
+    assert len(fake_checkin) == 6
+
+
+def test_failed_proxy_prefetch_defers_browser_to_checkin(fake_checkin, monkeypatch):
+    def acquire_proxy(reuse_proxy, log, timeline):
+        raise RuntimeError("代理接口异常")
+
+    warmed = []
+    pending = []
+    monkeypatch.setattr(rainyun, "acquire_proxy", acquire_proxy)
+    monkeypatch.setattr(rainyun, "warm_up_browser", lambda *args, **kwargs: warmed.append(args) or object())
+    monkeypatch.setattr(
+        rainyun,
+        "run_checkin",
+        lambda *args, prepared=None, **kwargs: pending.append(prepared.proxy_pending) or {"status": True},
+    )
+    pipeline = rainyun.AsyncCheckinPipeline(max_workers=1, prefetch=1)
+
+    (_, result, error), = run_accounts(pipeline, 1)
+
+    # 代理未就绪时不预热浏览器，签到阶段会先重新获取代理
+    assert error is None
+    assert warmed == []
+    assert pending == [True]
@@ -0,0 +1,59 @@
+import os
+import sys
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rainyun  # noqa: E402
+
+
+class FakeProvider:
+    """子进程中的求解器：返回带次优方案闭包的结果，并记录闭包是否被调用"""
+
+    def __init__(self):
+        self.resolved = 0
+
+    def solve_offline(self, captcha_bytes, sprite_bytes, logger_adapter, keep_artifacts=False):
+        def resolve():
+            self.resolved += 1
+            return ["1,1", "2,2", "3,3"]
+
+        logger_adapter.info("worker solved")
+        return {
+            "captcha": object(),
+            "positions": ["4,4", "5,5", "6,6"],
+            "runner_up": (3.0, {"total": 2.9, "options": []}, resolve),
+            "runner_up_raw": {"positions": ["7,7", "8,8", "9,9"]},
+            "artifacts": {"sprite_1.jpg": b"s1", "spec_1.jpg": b"c1"} if keep_artifacts else {},
+            "timings": {"detection": 0.1},
+        }
+
+
+class InlinePool:
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_worker_returns_raw_runner_up_and_debug_artifacts(monkeypatch):
+    worker = FakeProvider()
+    monkeypatch.setattr(rainyun, "_captcha_worker_provider", worker)
+    monkeypatch.setattr(rainyun, "get_captcha_process_pool", lambda: InlinePool())
+    provider = rainyun.TencentCaptchaProvider()
+    monkeypatch.setattr(provider, "_decode_image", lambda data: "decoded")
+    workspace = rainyun.CaptchaWorkspace("tes_ser", 0)
+    workspace.put("captcha.jpg", b"captcha")
+    workspace.put("sprite.jpg", b"sprite")
+
+    solution = provider._solve_in_process(workspace, rainyun.make_account_logger("test_user"))
+
+    # 子进程不计算次优方案坐标，由父进程在需要时计算
+    assert worker.resolved == 0
+    primary_total, ranked, resolve_positions = solution["runner_up"]
+    assert (primary_total, ranked) == (3.0, {"total": 2.9})
+    assert resolve_positions() == ["7,7", "8,8", "9,9"]
+    # 子进程的中间产物回到父进程工作区，调试样本与线程模式一致
+    assert workspace.list_files() == ["captcha.jpg", "spec_1.jpg", "sprite.jpg", "sprite_1.jpg"]
+    assert solution["captcha"] == "decoded"
+    assert "artifacts" not in solution
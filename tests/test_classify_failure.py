@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rainyun  # noqa: E402
+
+
+def test_failure_stage_decides_captcha():
+    result = {"status": False, "msg": "执行异常: no such element...", "retries": 0, "failure": "captcha"}
+
+    assert rainyun.classify_failure(result) == "captcha"
+
+
+def test_captcha_retries_or_wording_do_not_imply_captcha_failure():
+    # 验证码重试后已通过，随后的失败与验证码无关
+    after_retries = {"status": False, "msg": "执行异常: stale element...", "retries": 2, "failure": None}
+    wording = {"status": False, "msg": "登录后跳转异常（当前页面: 验证码说明页）", "retries": 0}
+
+    assert rainyun.classify_failure(after_retries) == "other"
+    assert rainyun.classify_failure(wording) == "other"
+    assert rainyun.classify_failure({"status": False, "msg": "", "proxy_failed": True}) == "proxy"
+    assert rainyun.classify_failure(None) == "other"
@@ -0,0 +1,65 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rainyun  # noqa: E402
+
+
+def test_race_proxies_skips_queued_candidates_after_a_winner(monkeypatch):
+    monkeypatch.setattr(rainyun, "measure_proxy", lambda proxy, **kwargs: time.sleep(0.05) or 0.1)
+    started = []
+    lock = threading.Lock()
+
+    def candidate(index):
+        def fetch():
+            with lock:
+                started.append(index)
+            return f"10.0.0.{index}:8080"
+        return fetch
+
+    proxy, latency = rainyun.race_proxies([candidate(i) for i in range(6)], max_workers=1)
+
+    assert proxy == "10.0.0.0:8080"
+    assert latency == 0.1
+    # 只有一个工作线程，找到可用代理后排队中的候选不会再开始
+    assert len(started) < 6
+
+
+def test_concurrent_accounts_share_a_single_crawl(monkeypatch):
+    crawls = []
+
+    def crawl_freeproxies(need=1):
+        crawls.append(need)
+        return [f"10.0.1.{i}:8080" for i in range(need)]
+
+    monkeypatch.setattr(rainyun, "crawl_freeproxies", crawl_freeproxies)
+    # 池大小小于同时签到的账号数：占满后应等待归还或共用，而不是再次抓取
+    pool = rainyun.ProxyPool(size=2, store=None)
+
+    def account(_):
+        proxy = pool.lease()
+        time.sleep(0.05)
+        pool.report_success(proxy)
+        return proxy
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        proxies = list(executor.map(account, range(20)))
+
+    assert all(proxies)
+    assert len(crawls) == 1
+    assert pool.stats()["crawls"] == 1
+
+
+def test_pipeline_concurrency_sizes_the_crawl(monkeypatch):
+    crawls = []
+    monkeypatch.setattr(rainyun, "crawl_freeproxies", lambda need=1: crawls.append(need) or [])
+    pool = rainyun.ProxyPool(size=4, store=None)
+
+    pool.reserve(rainyun.CheckinPipeline(max_workers=3, prefetch=1).max_leases)
+    pool.lease()
+
+    assert crawls == [2 * 3 + 2 * 1 + 1]
@@ -0,0 +1,40 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rainyun  # noqa: E402
+
+
+def test_snapshot_does_not_wait_for_probe_and_probes_are_shared(monkeypatch):
+    probing = threading.Event()
+    release = threading.Event()
+
+    def check_rainyun_blocked():
+        probing.set()
+        release.wait(5)
+        return True
+
+    monkeypatch.setattr(rainyun, "check_rainyun_blocked", check_rainyun_blocked)
+    service = rainyun.ReachabilityService(ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.is_blocked())) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    assert probing.wait(5)
+
+    # 探测进行中，snapshot() 立即返回而不是等待探测结束
+    start = time.monotonic()
+    assert service.snapshot() is None
+    assert time.monotonic() - start < 0.5
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [True, True, True]
+    assert service.probes == 1
+    assert service.hits == 2
+    assert service.snapshot()["blocked"] is True
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rainyun  # noqa: E402
+
+RESULTS = [{"status": True, "msg": "ok", "points": 100, "username": "tes***ser", "retries": 0}]
+POOL_STATS = {"hits": 3, "misses": 1, "recycled": 2}
+
+
+def test_reports_include_browser_pool_stats():
+    markdown = rainyun.generate_markdown_report(RESULTS, compact=True, pool_stats=POOL_STATS)
+    html = rainyun.generate_html_report(RESULTS, screenshot_mode='none', pool_stats=POOL_STATS)
+
+    for report in (markdown, html):
+        assert "浏览器池" in report
+        assert "命中 3 次" in report
+        assert "冷启动） 1 次" in report
+
+
+def test_reports_omit_browser_pool_without_stats():
+    assert "浏览器池" not in rainyun.generate_markdown_report(RESULTS)
+    assert "浏览器池" not in rainyun.generate_html_report(RESULTS, pool_stats={"hits": 0, "misses": 0, "recycled": 0})
@@ -0,0 +1,33 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rainyun  # noqa: E402
+
+
+class FakeDriver:
+    def __init__(self):
+        self.timeouts = SimpleNamespace(script=30)
+        self.script_timeouts = []
+        self.ceilings = []
+
+    def set_script_timeout(self, seconds):
+        self.script_timeouts.append(seconds)
+        self.timeouts.script = seconds
+
+    def execute_async_script(self, script, quiet_ms, ceiling_ms):
+        self.ceilings.append(ceiling_ms)
+        return True
+
+
+def test_wait_page_settled_restores_script_timeout_and_caps_ceiling(monkeypatch):
+    monkeypatch.setenv("WAIT_PAGE_MAX", "6")
+    driver = FakeDriver()
+
+    assert rainyun.wait_page_settled(driver, budget=2) is True
+
+    # 上限不超过被替换的固定等待，结束后恢复原脚本超时
+    assert driver.ceilings == [2000]
+    assert driver.timeouts.script == 30